@@ -0,0 +1,45 @@
+from typing import Sequence
+
+BLUE_TEAM = 0
+ORANGE_TEAM = 1
+
+# The human player is always the first car in the match
+HUMAN_INDEX = 0
+
+
+class CarLayout:
+    '''
+    Maps each team to the car indices it has in the current match.
+    Built from the packet whenever the number of cars changes, so 2v2 and 3v3 matches against bots
+    get every car placed without hard-coding the human and bot indices.
+    '''
+    __slots__ = ('teams', 'team_indices')
+
+    def __init__(self, teams: Sequence[int]):
+        self.teams = tuple(teams)
+        self.team_indices = (
+            tuple(index for index, team in enumerate(self.teams) if team == BLUE_TEAM),
+            tuple(index for index, team in enumerate(self.teams) if team == ORANGE_TEAM),
+        )
+
+    @staticmethod
+    def from_packet(packet):
+        return CarLayout([packet.game_cars[index].team for index in range(packet.num_cars)])
+
+    @property
+    def num_cars(self):
+        return len(self.teams)
+
+    @property
+    def human_team(self):
+        return self.teams[HUMAN_INDEX] if self.teams else BLUE_TEAM
+
+    def team_size(self, team):
+        return len(self.team_indices[team])
+
+    def bot_indices(self):
+        return [index for index in range(len(self.teams)) if index != HUMAN_INDEX]
+
+
+# A 1v1 with the human on blue, which is what Dojo was originally built around
+DEFAULT_LAYOUT = CarLayout((BLUE_TEAM, ORANGE_TEAM))
@@ -0,0 +1,269 @@
+"""
+Overlap tests and resolution for spawned cars and balls.
+
+Cars are Octane hitboxes turned by their yaw, the ball is a sphere. Every test
+runs over a batch of scenarios at once: ball locations are (N, 3), car
+locations (N, C, 3) and car yaws (N, C). Overlapping objects are pushed apart
+along the axis that needs the smallest displacement, then moved back inside
+the arena, for a few passes in case one push creates another overlap.
+"""
+
+import math
+
+import numpy as np
+
+from constants import (
+    CAR_HITBOX_LENGTH, CAR_HITBOX_WIDTH, CAR_HITBOX_HEIGHT, CAR_HITBOX_FORWARD_OFFSET, CAR_HITBOX_UP_OFFSET,
+    BALL_RADIUS, SPAWN_CLEARANCE
+)
+import utils
+
+RESOLVE_ITERATIONS = 4
+# Overlaps shallower than this are rounding error left by a previous push
+TOLERANCE = 0.01
+
+# Both shapes grow by half the clearance, so resolved objects end up SPAWN_CLEARANCE apart
+_HALF_EXTENTS = np.array([CAR_HITBOX_LENGTH, CAR_HITBOX_WIDTH, CAR_HITBOX_HEIGHT]) / 2 + SPAWN_CLEARANCE / 2
+_BALL_RADIUS = BALL_RADIUS + SPAWN_CLEARANCE / 2
+# Radius of a sphere around a car's origin that holds its whole hitbox
+_CAR_BOUND = np.hypot(CAR_HITBOX_FORWARD_OFFSET, CAR_HITBOX_UP_OFFSET) + np.linalg.norm(_HALF_EXTENTS)
+
+
+def hitbox_centers(car_location, car_yaw):
+    """Get the hitbox centers of cars, along with the cosine and sine of their yaw"""
+    cos_yaw = np.cos(car_yaw)
+    sin_yaw = np.sin(car_yaw)
+    center = np.array(car_location, dtype=np.float64)
+    center[..., 0] += cos_yaw * CAR_HITBOX_FORWARD_OFFSET
+    center[..., 1] += sin_yaw * CAR_HITBOX_FORWARD_OFFSET
+    center[..., 2] += CAR_HITBOX_UP_OFFSET
+    return center, cos_yaw, sin_yaw
+
+
+def ball_overlaps(ball_location, car_location, car_yaw):
+    """
+    Get how deep the ball is in each car's hitbox, (N, C) and positive when they overlap,
+    and the (N, C, 3) directions that push the ball out
+    """
+    center, cos_yaw, sin_yaw = hitbox_centers(car_location, car_yaw)
+    offset = np.asarray(ball_location)[:, np.newaxis, :] - center
+    # Ball offset in the car's frame: forward, left, up
+    local = np.stack([offset[..., 0] * cos_yaw + offset[..., 1] * sin_yaw,
+                      offset[..., 1] * cos_yaw - offset[..., 0] * sin_yaw,
+                      offset[..., 2]], axis=-1)
+    outside = local - np.clip(local, -_HALF_EXTENTS, _HALF_EXTENTS)
+    distance = np.sqrt((outside * outside).sum(axis=-1))
+
+    # A ball centered inside the box leaves through the nearest face
+    face_depth = _HALF_EXTENTS - np.abs(local)
+    face = face_depth.argmin(axis=-1)[..., np.newaxis]
+    inside_normal = np.zeros_like(local)
+    np.put_along_axis(inside_normal, face, np.where(np.take_along_axis(local, face, axis=-1) < 0, -1.0, 1.0), axis=-1)
+
+    inside = distance == 0
+    normal = np.where(inside[..., np.newaxis], inside_normal, outside / np.maximum(distance, 1e-9)[..., np.newaxis])
+    depth = np.where(inside, _BALL_RADIUS + face_depth.min(axis=-1), _BALL_RADIUS - distance)
+
+    # Back to world space
+    world_normal = np.stack([normal[..., 0] * cos_yaw - normal[..., 1] * sin_yaw,
+                             normal[..., 0] * sin_yaw + normal[..., 1] * cos_yaw,
+                             normal[..., 2]], axis=-1)
+    return depth, world_normal
+
+
+def car_overlaps(location_a, yaw_a, location_b, yaw_b):
+    """
+    Get how deep two batches of car hitboxes overlap, positive when they do,
+    and the (..., 3) horizontal directions that push car b away from car a
+    Cars are only separated sideways, so the candidate axes are the four box edges in the XY plane
+    """
+    center_a, cos_a, sin_a = hitbox_centers(location_a, yaw_a)
+    center_b, cos_b, sin_b = hitbox_centers(location_b, yaw_b)
+    offset_x, offset_y, offset_z = np.moveaxis(center_b - center_a, -1, 0)
+    half_length, half_width, half_height = _HALF_EXTENTS
+
+    # Projected size of both boxes on their forward and left axes, which only depends on the yaw between them
+    abs_cos = np.abs(cos_a * cos_b + sin_a * sin_b)
+    abs_sin = np.abs(cos_a * sin_b - sin_a * cos_b)
+    forward_reach = half_length * (1 + abs_cos) + half_width * abs_sin
+    left_reach = half_width * (1 + abs_cos) + half_length * abs_sin
+
+    # Axes in order: forward of a, left of a, forward of b, left of b
+    axis_x = np.stack([cos_a, -sin_a, cos_b, -sin_b], axis=-1)
+    axis_y = np.stack([sin_a, cos_a, sin_b, cos_b], axis=-1)
+    separation = offset_x[..., np.newaxis] * axis_x + offset_y[..., np.newaxis] * axis_y
+    reach = np.stack([forward_reach, left_reach, forward_reach, left_reach], axis=-1)
+    overlap = reach - np.abs(separation)
+
+    axis = overlap.argmin(axis=-1)[..., np.newaxis]
+    depth = np.take_along_axis(overlap, axis, axis=-1)[..., 0]
+    sign = np.where(np.take_along_axis(separation, axis, axis=-1)[..., 0] < 0, -1.0, 1.0)
+    direction = np.stack([np.take_along_axis(axis_x, axis, axis=-1)[..., 0] * sign,
+                          np.take_along_axis(axis_y, axis, axis=-1)[..., 0] * sign,
+                          np.zeros_like(sign)], axis=-1)
+
+    # Cars stacked on top of each other don't touch
+    depth = np.where(np.abs(offset_z) >= 2 * half_height, 0.0, depth)
+    return depth, direction
+
+
+def resolve_overlaps(ball_location, car_location, car_yaw, fixed=None, iterations=RESOLVE_ITERATIONS):
+    """
+    Push overlapping cars and balls apart by the smallest displacement, in place, keeping moved objects in the arena
+    ball_location is (N, 3), car_location (N, C, 3) and car_yaw (N, C), unset (NaN) objects are ignored
+    fixed is an optional (N, 1 + C) mask of the objects that may not move, ball first
+    The ball takes the whole push from a car unless it is fixed, two cars split it unless one of them is
+    Returns a mask of the scenarios that still overlap after the last pass
+    """
+    count, num_cars = car_location.shape[:2]
+    overlapping = np.zeros(count, dtype=bool)
+    # Only scenarios with objects close enough to touch are checked, then the ones that overlapped in the previous pass
+    active = np.flatnonzero(_near(ball_location, car_location))
+    if not len(active):
+        return overlapping
+    movable = np.ones((count, 1 + num_cars)) if fixed is None else (~np.asarray(fixed)).astype(np.float64)
+
+    with np.errstate(invalid="ignore"):
+        # One more check than there are passes, so the result reflects the last push
+        for remaining in range(iterations, -1, -1):
+            ball = ball_location[active]
+            cars = car_location[active]
+            ball_push, car_push, still = _pushes(ball, cars, car_yaw[active], movable[active])
+            ball_moves = ball_push.any(axis=1)
+            car_moves = car_push.any(axis=2)
+            overlapping[active] = still
+            if not remaining or not still.any():
+                break
+
+            active = active[still]
+            ball = ball[still] + ball_push[still]
+            cars = cars[still] + car_push[still]
+            # An object the arena held back is against a wall, whatever it overlaps has to make room instead
+            pinned = np.zeros((len(active), 1 + num_cars), dtype=bool)
+            pinned[:, 0] = _keep_in_arena(ball, ball_moves[still], BALL_RADIUS)
+            for car in range(num_cars):
+                pinned[:, car + 1] = _keep_in_arena(cars[:, car], car_moves[still, car])
+            movable[active] *= ~pinned
+            ball_location[active] = ball
+            car_location[active] = cars
+
+    return overlapping
+
+
+def find_overlaps(ball_location, car_location, car_yaw):
+    """Get a mask of the scenarios where any two objects overlap, without moving anything"""
+    return resolve_overlaps(ball_location, car_location, car_yaw, iterations=0)
+
+
+def _near(ball_location, car_location):
+    """Get a mask of the scenarios where the bounding spheres of any two objects intersect"""
+    if len(ball_location) == 1:
+        # A single scenario, as spawned every rep, is quicker to check with floats
+        objects = [ball_location[0].tolist(), *car_location[0].tolist()]
+        bounds = [_BALL_RADIUS] + [_CAR_BOUND] * car_location.shape[1]
+        return np.array([any(math.dist(objects[first], objects[second]) < bounds[first] + bounds[second]
+                             for first in range(len(objects)) for second in range(first + 1, len(objects)))])
+    bounds = np.full(1 + car_location.shape[1], _CAR_BOUND)
+    bounds[0] = _BALL_RADIUS
+    objects = np.concatenate([ball_location[:, np.newaxis], car_location], axis=1)
+    offset = objects[:, :, np.newaxis] - objects[:, np.newaxis]
+    distance = np.sqrt((offset * offset).sum(axis=-1))
+    # Objects are compared with themselves too, keep only distinct pairs
+    reach = bounds[:, np.newaxis] + bounds + np.where(np.eye(len(bounds), dtype=bool), -np.inf, 0)
+    return (distance < reach).any(axis=(1, 2))
+
+
+def _pushes(ball_location, car_location, car_yaw, movable):
+    """
+    Get the displacement of the ball and of every car that separates them from what they overlap,
+    and a mask of the scenarios with any overlap, even one that fixed objects keep from being pushed apart
+    """
+    count, num_cars = car_location.shape[:2]
+    ball_push = np.zeros((count, 3))
+    car_push = np.zeros((count, num_cars, 3))
+    overlapping = np.zeros(count, dtype=bool)
+
+    for first in range(num_cars):
+        for second in range(first + 1, num_cars):
+            depth, direction = car_overlaps(car_location[:, first], car_yaw[:, first],
+                                            car_location[:, second], car_yaw[:, second])
+            depth = np.where(depth > TOLERANCE, depth, 0)
+            overlapping |= depth > 0
+            share_first, share_second = _shares(movable[:, 1 + first], movable[:, 1 + second])
+            car_push[:, first] -= direction * (depth * share_first)[:, np.newaxis]
+            car_push[:, second] += direction * (depth * share_second)[:, np.newaxis]
+
+    depth, normal = ball_overlaps(ball_location, car_location, car_yaw)
+    depth = np.where(depth > TOLERANCE, depth, 0)
+    ball_movable = movable[:, :1]
+    ball_push += (normal * (depth * ball_movable)[..., np.newaxis]).sum(axis=1)
+
+    # A fixed ball pushes the car back instead, sideways only so it stays on its wheels,
+    # until the horizontal gap alone clears the ball at the height it touches the box
+    horizontal = np.sqrt(normal[..., 0] ** 2 + normal[..., 1] ** 2)
+    gap = _BALL_RADIUS - depth
+    sideways = np.sqrt(np.maximum(_BALL_RADIUS ** 2 - (gap * normal[..., 2]) ** 2, 0)) - gap * horizontal
+    car_depth = np.where(depth > 0, sideways, 0) * (1 - ball_movable) * movable[:, 1:]
+    # A ball right on top of a car has no sideways normal, the car backs out from under it
+    away = np.where((horizontal > 1e-6)[..., np.newaxis], normal[..., :2] / np.maximum(horizontal, 1e-6)[..., np.newaxis],
+                    np.stack([np.cos(car_yaw), np.sin(car_yaw)], axis=-1))
+    car_push[..., :2] -= away * car_depth[..., np.newaxis]
+    overlapping |= (depth > 0).any(axis=1)
+    return ball_push, car_push, overlapping
+
+
+def _shares(movable_first, movable_second):
+    """Split a push between two objects, the one that can move takes all of it if the other can't"""
+    total = movable_first + movable_second
+    return (np.divide(movable_first, total, out=np.zeros_like(total), where=total > 0),
+            np.divide(movable_second, total, out=np.zeros_like(total), where=total > 0))
+
+
+def _keep_in_arena(locations, moved, floor=0):
+    """Move the objects where moved is set back inside the arena, and above the floor, returning a mask of the ones moved"""
+    held = np.zeros(len(locations), dtype=bool)
+    if not moved.any():
+        return held
+    objects = locations[moved]
+    pushed = objects.copy()
+    utils.sanity_check_locations(objects, utils.FIELD_MARGIN)
+    objects[:, 2] = np.maximum(objects[:, 2], floor)
+    locations[moved] = objects
+    held[moved] = (np.abs(objects - pushed) > TOLERANCE).any(axis=1)
+    return held
+
+
+def resolve_game_state_overlaps(game_state, moved=None):
+    """
+    Push apart overlapping objects of an rlbot GameState, in place
+    moved is the object that was just edited: it is the one pushed out, everything else stays where it is
+    """
+    ball = game_state.ball if _location(game_state.ball) is not None else None
+    cars = [car for car in game_state.cars.values() if _location(car) is not None]
+    if not cars:
+        return False
+    ball_location = np.array([_location(ball) if ball is not None else (np.nan, np.nan, np.nan)], dtype=np.float64)
+    car_location = np.array([[_location(car) for car in cars]], dtype=np.float64)
+    car_yaw = np.array([[_yaw(car) for car in cars]], dtype=np.float64)
+
+    fixed = None
+    if moved is not None:
+        fixed = np.array([[state is not moved for state in [ball, *cars]]])
+    overlapping = resolve_overlaps(ball_location, car_location, car_yaw, fixed)
+
+    for state, location in zip([ball, *cars], [ball_location[0], *car_location[0]]):
+        if state is not None:
+            state.physics.location.x, state.physics.location.y, state.physics.location.z = location.tolist()
+    return bool(overlapping[0])
+
+
+def _location(state):
+    location = state.physics.location if state is not None and state.physics is not None else None
+    if location is None or location.x is None or location.y is None or location.z is None:
+        return None
+    return location.x, location.y, location.z
+
+
+def _yaw(car):
+    rotation = car.physics.rotation
+    return rotation.yaw if rotation is not None and rotation.yaw is not None else 0.0
@@ -10,6 +10,16 @@ DEFAULT_TIMEOUT = 10.0
 FREE_GOAL_TIMEOUT = 7.0
 DEFAULT_PAUSE_TIME = 1.0
 
+# Setups are redrawn up to this many times until they meet the constraints of their mode
+SAMPLE_ROUNDS = 10
+
+# Generated scenarios are regenerated if the ball scores or hits a wall this soon, up to SPAWN_ATTEMPTS times
+MIN_GOAL_TIME = 1.0
+MIN_WALL_TIME = 0.3
+SPAWN_ATTEMPTS = 5
+# They are also regenerated if the defense gets to the ball this much sooner than the offense
+MAX_DEFENSE_LEAD = 0.75
+
 # UI constants
 MENU_START_X = 20
 MENU_START_Y = 400
@@ -35,6 +45,26 @@ MAX_VELOCITY = 2000
 BALL_GROUND_THRESHOLD = 100
 GOAL_DETECTION_THRESHOLD = 40
 
+# Arena and ball physics constants, used by the local simulator
+CEILING_HEIGHT = 2044
+GOAL_HEIGHT = 642.775
+BALL_RADIUS = 92.75
+GRAVITY = -650
+BALL_DRAG = 0.0305  # Fraction of velocity lost per second
+BALL_MAX_SPEED = 6000
+BALL_RESTITUTION = 0.6
+BALL_FRICTION = 0.35
+TICK_RATE = 120
+
+# Octane hitbox, the default car, and where its center sits relative to the car's origin
+CAR_HITBOX_LENGTH = 118.01
+CAR_HITBOX_WIDTH = 84.20
+CAR_HITBOX_HEIGHT = 36.16
+CAR_HITBOX_FORWARD_OFFSET = 13.88
+CAR_HITBOX_UP_OFFSET = 20.75
+# Gap left between spawned objects that overlapped
+SPAWN_CLEARANCE = 20
+
 # Default trial counts
 DEFAULT_TRIAL_OPTIONS = [100, 50, 25, 10]
 DEFAULT_NUM_TRIALS = 100 
@@ -8,11 +8,11 @@ custom playlists that persist between sessions.
 import json
 import os
 from typing import List, Dict, Any, Optional, Tuple
-from playlist import Playlist, ScenarioConfig, PlaylistSettings, PlayerRole
+from playlist import Playlist, ScenarioConfig, PlaylistSettings, PlayerRole, CustomScenarioRef
 from scenario import OffensiveMode, DefensiveMode
-from menu import MenuRenderer, UIElement
+from menu import MenuRenderer, UIElement, create_filter_menu
 from pydantic import BaseModel, Field, ValidationError
-from custom_scenario import CustomScenario, get_custom_scenarios
+from custom_scenario import CustomScenario, get_custom_scenarios, get_custom_scenario_index
 
 class CustomPlaylistManager:
     def __init__(self, renderer, main_menu_renderer):
@@ -25,15 +25,51 @@ class CustomPlaylistManager:
         self.current_boost_range = [12, 100]  # Default boost range
         self.current_timeout = 7.0
         self.current_rule_zero = False
+        # Preview of the playlist being edited, rebuilt only when the settings change
+        self._preview_playlist = None
+        # Loaded playlists: name -> (file modification time, playlist)
+        self._playlist_cache = {}
         
     def load_custom_playlists(self):
         """Load custom playlists from disk and return a list of all custom playlists"""
+        playlists_path = _get_custom_playlists_path()
         custom_playlists = {}
-        for file in os.listdir(_get_custom_playlists_path()):
+        for file in os.listdir(playlists_path):
             if file.endswith(".json"):
-                with open(os.path.join(_get_custom_playlists_path(), file), "r") as f:
-                    custom_playlists[file.replace(".json", "")] = Playlist.model_validate_json(f.read())
+                name = file.replace(".json", "")
+                file_path = os.path.join(playlists_path, file)
+                modified_time = os.path.getmtime(file_path)
+                cached = self._playlist_cache.get(name)
+                if cached is None or cached[0] != modified_time:
+                    with open(file_path, "r") as f:
+                        playlist = Playlist.model_validate_json(f.read())
+                    saved = playlist.migrate_embedded_scenarios()
+                    if saved is not None:
+                        # Rewritten once with references to the library instead of full copies
+                        modified_time = _write_playlist(file_path, playlist)
+                        if saved:
+                            print(f"Saved custom scenarios of playlist {name} to the custom scenario library: {', '.join(saved)}")
+                        print(f"Playlist {name} now refers to its custom scenarios in the library")
+                    cached = (modified_time, playlist)
+                    self._playlist_cache[name] = cached
+                custom_playlists[name] = cached[1]
+        self._playlist_cache = {name: self._playlist_cache[name] for name in custom_playlists}
         return custom_playlists
+
+    def replace_custom_scenarios(self, replacements: Dict[str, CustomScenario]) -> List[str]:
+        """Point every custom playlist entry referring to a scenario name of replacements at its replacement, returns the playlists changed"""
+        changed = []
+        for name, playlist in self.load_custom_playlists().items():
+            refs = [ref for ref in playlist.custom_scenarios or [] if ref.name in replacements]
+            if not refs:
+                continue
+            for ref in refs:
+                replacement = replacements[ref.name]
+                ref.name, ref.content_hash = replacement.name, replacement.content_hash()
+            file_path = os.path.join(_get_custom_playlists_path(), f"{name}.json")
+            self._playlist_cache[name] = (_write_playlist(file_path, playlist), playlist)
+            changed.append(name)
+        return changed
     
     def create_playlist_creation_menu(self):
         """Create the main playlist creation menu"""
@@ -41,7 +77,7 @@ class CustomPlaylistManager:
         menu.add_element(UIElement("Create Custom Playlist", header=True))
         menu.add_element(UIElement("Set Playlist Name", submenu=self._create_name_input_menu(), display_value_function=self.get_current_playlist_name))
         menu.add_element(UIElement("Add PresetScenarios", submenu=self._create_scenario_selection_menu()))
-        menu.add_element(UIElement("Add Custom Scenario", submenu=self._create_custom_scenario_selection_menu()))
+        menu.add_element(UIElement("Add Custom Scenario", submenu=self._create_custom_scenario_selection_menu(), submenu_refresh_function=self._create_custom_scenario_selection_menu))
         menu.add_element(UIElement("Set Boost Range", submenu=self._create_boost_range_menu(), display_value_function=self.get_current_playlist_boost_range))
         menu.add_element(UIElement("Set Timeout", submenu=self._create_timeout_menu(), display_value_function=self.get_current_playlist_timeout))
         menu.add_element(UIElement("Toggle Rule Zero", function=self._toggle_rule_zero, display_value_function=self.get_current_playlist_rule_zero))
@@ -65,14 +101,19 @@ class CustomPlaylistManager:
 
     def _render_playlist_details(self):
         # Create a playlist out of current settings
-        playlist = Playlist(
-            name=self.current_playlist_name,
-            description=f"Custom playlist with {len(self.current_scenarios)} scenarios",
-            scenarios=self.current_scenarios.copy(),
-            custom_scenarios=self.current_custom_scenarios.copy(),
-            settings=PlaylistSettings(timeout=self.current_timeout, shuffle=True, boost_range=self.current_boost_range, rule_zero=self.current_rule_zero)
-        )
-        playlist.render_details(self.renderer)
+        if self._preview_playlist is None:
+            self._preview_playlist = Playlist(
+                name=self.current_playlist_name,
+                description=f"Custom playlist with {len(self.current_scenarios)} scenarios",
+                scenarios=self.current_scenarios.copy(),
+                custom_scenarios=self.current_custom_scenarios.copy(),
+                settings=PlaylistSettings(timeout=self.current_timeout, shuffle=True, boost_range=self.current_boost_range, rule_zero=self.current_rule_zero)
+            )
+        self._preview_playlist.render_details(self.renderer)
+
+    def _invalidate_preview(self):
+        """Drop the cached preview so it is rebuilt from the current settings"""
+        self._preview_playlist = None
     
     def _create_name_input_menu(self):
         """Create menu for setting playlist name"""
@@ -119,11 +160,21 @@ class CustomPlaylistManager:
         custom_scenarios = get_custom_scenarios()
         
         # Column 1: Custom scenarios
+        menu.add_element(UIElement("Search...", submenu=self._create_custom_scenario_search_menu(), submenu_refresh_function=self._create_custom_scenario_search_menu))
         for scenario_name in custom_scenarios:
             menu.add_element(UIElement(scenario_name, function=self._add_custom_scenario, function_args=scenario_name))
             
         # Column 2: Player role and actions
         return menu
+
+    def _create_custom_scenario_search_menu(self):
+        """Create filter-as-you-type menu for finding a custom scenario to add"""
+        return create_filter_menu(
+            self.renderer,
+            get_custom_scenario_index().search,
+            lambda scenario_name: UIElement(scenario_name, function=self._add_custom_scenario, function_args=scenario_name),
+            render_function=self._render_playlist_details
+        )
     
     def _create_boost_range_menu(self):
         """Create menu for setting boost range"""
@@ -170,6 +221,7 @@ class CustomPlaylistManager:
     
     def _set_playlist_name(self, name):
         self.current_playlist_name = name
+        self._invalidate_preview()
         print(f"Playlist name set to: {name}")
     
     def _set_temp_offensive_mode(self, mode):
@@ -193,6 +245,7 @@ class CustomPlaylistManager:
                 player_role=self.temp_player_role
             )
             self.current_scenarios.append(scenario)
+            self._invalidate_preview()
             print(f"Added scenario: {self.temp_offensive_mode.name} vs {self.temp_defensive_mode.name} ({self.temp_player_role.name})")
             
             # Reset temp variables
@@ -211,21 +264,25 @@ class CustomPlaylistManager:
     def _set_min_boost(self, boost):
         """Set minimum boost value"""
         self.current_boost_range = (boost, max(boost + 10, self.current_boost_range[1]))
+        self._invalidate_preview()
         print(f"Set boost range: {self.current_boost_range}")
     
     def _set_max_boost(self, boost):
         """Set maximum boost value"""
         self.current_boost_range = (min(boost - 10, self.current_boost_range[0]), boost)
+        self._invalidate_preview()
         print(f"Set boost range: {self.current_boost_range}")
     
     def _set_timeout(self, timeout):
         """Set scenario timeout"""
         self.current_timeout = timeout
+        self._invalidate_preview()
         print(f"Set timeout: {timeout}s")
     
     def _toggle_rule_zero(self):
         """Toggle rule zero setting"""
         self.current_rule_zero = not self.current_rule_zero
+        self._invalidate_preview()
         print(f"Rule zero: {'ON' if self.current_rule_zero else 'OFF'}")
     
     
@@ -264,23 +321,26 @@ class CustomPlaylistManager:
         self.temp_offensive_mode = None
         self.temp_defensive_mode = None
         self.temp_player_role = None
+        self._invalidate_preview()
         
     def _add_custom_scenario(self, scenario_name):
         """Add a custom scenario"""
-        self.current_custom_scenarios.append(CustomScenario.load(scenario_name))
+        self.current_custom_scenarios.append(CustomScenarioRef.to(CustomScenario.load(scenario_name)))
+        self._invalidate_preview()
         print(f"Added custom scenario: {scenario_name}")
     
     def get_custom_playlists(self):
         """Get all custom playlists"""
-        # Load all custom playlists from disk
-        custom_playlists = {}
-        for file in os.listdir(_get_custom_playlists_path()):
-            if file.endswith(".json"):
-                with open(os.path.join(_get_custom_playlists_path(), file), "r") as f:
-                    custom_playlists[file.replace(".json", "")] = Playlist.model_validate_json(f.read())
-        return custom_playlists
+        # Files that haven't changed since the last load are served from memory
+        return self.load_custom_playlists()
     
 
+def _write_playlist(file_path, playlist) -> float:
+    """Save a playlist over its file, returns the new modification time"""
+    with open(file_path, "w") as f:
+        f.write(playlist.model_dump_json(indent=2))
+    return os.path.getmtime(file_path)
+
 def _get_custom_playlists_path():
     appdata_path = os.path.expandvars("%APPDATA%")
     if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "Playlists")):
@@ -1,8 +1,13 @@
 import json
 import os
+import queue
+import threading
+import time
 from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field, ValidationError
 from rlbot.utils.game_state_util import GameState, BallState, CarState, Physics, Vector3, Rotator
+from search_index import SearchIndex
+from scenario_similarity import SimilarityIndex, content_hash
 
 class Vector3Model(BaseModel):
     x: float = Field(default=0.0)
@@ -100,6 +105,20 @@ class TypedGameState(BaseModel):
 
         return cls(cars=cars, ball=ball)
 
+    @classmethod
+    def from_packet(cls, packet) -> 'TypedGameState':
+        """Capture the ball and every car of a game tick packet"""
+        cars = {}
+        for idx in range(packet.num_cars):
+            car = packet.game_cars[idx]
+            cars[idx] = CarStateModel(
+                physics=_physics_model(car.physics),
+                boost_amount=car.boost,
+                jumped=car.jumped,
+                double_jumped=car.double_jumped
+            )
+        return cls(cars=cars, ball=BallStateModel(physics=_physics_model(packet.game_ball.physics)))
+
     def to_game_state(self) -> GameState:
         """Convert TypedGameState back to RLBot GameState"""
         cars = {}
@@ -161,15 +180,28 @@ class TypedGameState(BaseModel):
 
         return GameState(cars=cars, ball=ball)
 
+def _physics_model(physics) -> PhysicsModel:
+    location, rotation, velocity, angular_velocity = physics.location, physics.rotation, physics.velocity, physics.angular_velocity
+    return PhysicsModel(
+        location=Vector3Model(x=location.x, y=location.y, z=location.z),
+        rotation=RotatorModel(pitch=rotation.pitch, yaw=rotation.yaw, roll=rotation.roll),
+        velocity=Vector3Model(x=velocity.x, y=velocity.y, z=velocity.z),
+        angular_velocity=Vector3Model(x=angular_velocity.x, y=angular_velocity.y, z=angular_velocity.z)
+    )
+
 class CustomScenario(BaseModel):
     """A custom scenario that can be saved to and loaded from disk.
     
     Attributes:
         name: The name of the scenario
         game_state: The game state for this scenario
+        tags: Optional search tags for the scenario library
+        weight: Relative chance of being picked when part of a playlist
     """
     name: str
     game_state: TypedGameState
+    tags: List[str] = Field(default_factory=list)
+    weight: float = 1.0
 
     @classmethod
     def from_rlbot_game_state(cls, name: str, game_state: GameState) -> 'CustomScenario':
@@ -183,8 +215,20 @@ class CustomScenario(BaseModel):
         """Convert this scenario back to an RLBot GameState"""
         return self.game_state.to_game_state()
 
+    def content_hash(self) -> str:
+        """Hash of the quantized game state, equal for scenarios that only differ by name or tags"""
+        return content_hash(self.game_state)
+
     def save(self) -> None:
         """Save this scenario to disk"""
+        file_path = self._write()
+
+        # Keep the in-memory library and search index up to date without rescanning the folder
+        _scenario_cache[self.name] = (os.path.getmtime(file_path), self)
+        _scenario_index.add(self.name, self.name, self.tags)
+        _similarity_index.add(self.name, self.game_state)
+
+    def _write(self) -> str:
         if not self.name:
             raise ValueError("Scenario must have a name before saving")
         
@@ -195,6 +239,7 @@ class CustomScenario(BaseModel):
         file_path = os.path.join(_get_custom_scenarios_path(), f"{self.name}.json")
         with open(file_path, "w") as f:
             f.write(self.model_dump_json(indent=2))
+        return file_path
 
     @classmethod
     def load(cls, name: str) -> 'CustomScenario':
@@ -208,14 +253,133 @@ class CustomScenario(BaseModel):
 
 
 
+# In-memory scenario library: name -> (file modification time, scenario)
+_scenario_cache: Dict[str, Tuple[float, CustomScenario]] = {}
+_scenario_index = SearchIndex()
+_similarity_index = SimilarityIndex()
+# Scenarios in the library whose files the background writer hasn't written yet
+_pending_saves: Dict[str, CustomScenario] = {}
+_pending_lock = threading.Lock()
+_save_queue: Optional[queue.Queue] = None
+# Whether the whole library has been read once, single scenarios can be cached before that
+_library_loaded = False
+
+
+def _cached_scenario(name: str, modified_time: float) -> CustomScenario:
+    """A scenario from the in-memory library, re-read if its file changed"""
+    cached = _scenario_cache.get(name)
+    if cached is None or cached[0] != modified_time:
+        cached = (modified_time, CustomScenario.load(name))
+        _scenario_cache[name] = cached
+        _scenario_index.add(name, name, cached[1].tags)
+        _similarity_index.add(name, cached[1].game_state)
+    return cached[1]
+
 def get_custom_scenarios():
-    """Get all custom scenarios"""
+    """Get all custom scenarios, only re-reading files that changed since the last call"""
+    global _library_loaded
+    scenarios_path = _get_custom_scenarios_path()
     custom_scenarios = {}
-    for file in os.listdir(_get_custom_scenarios_path()):
-        if file.endswith(".json"):
-            custom_scenarios[file.replace(".json", "")] = CustomScenario.load(file.replace(".json", ""))
+    for file in os.listdir(scenarios_path):
+        if not file.endswith(".json"):
+            continue
+        name = file.replace(".json", "")
+        custom_scenarios[name] = _cached_scenario(name, os.path.getmtime(os.path.join(scenarios_path, file)))
+
+    with _pending_lock:
+        pending = dict(_pending_saves)
+    for name, scenario in pending.items():
+        custom_scenarios.setdefault(name, scenario)
+
+    # Forget scenarios whose files were removed outside of Dojo
+    for name in [name for name in _scenario_cache if name not in custom_scenarios]:
+        del _scenario_cache[name]
+        _scenario_index.remove(name)
+        _similarity_index.remove(name)
+    _library_loaded = True
     return custom_scenarios
 
+def resolve_custom_scenario(name: str, content_hash: Optional[str] = None) -> Optional[CustomScenario]:
+    """
+    The library's copy of a scenario, the one object every playlist referring to it shares.
+    Only that scenario's file is checked, and read if it changed. A scenario renamed since it was
+    referred to is found by its content hash.
+    """
+    with _pending_lock:
+        pending = _pending_saves.get(name)
+    if pending is not None:
+        return pending
+    file_path = os.path.join(_get_custom_scenarios_path(), f"{name}.json")
+    if os.path.exists(file_path):
+        return _cached_scenario(name, os.path.getmtime(file_path))
+    if content_hash is not None:
+        names = get_custom_scenario_similarity_index().names_with_hash(content_hash)
+        if names:
+            return resolve_custom_scenario(names[0])
+    return None
+
+def get_custom_scenario_index() -> SearchIndex:
+    """Get the search index over custom scenario names and tags, loading the library if needed"""
+    if not _library_loaded:
+        get_custom_scenarios()
+    return _scenario_index
+
+def get_custom_scenario_similarity_index() -> SimilarityIndex:
+    """Get the duplicate and near-duplicate index of the custom scenarios, loading the library if needed"""
+    if not _library_loaded:
+        get_custom_scenarios()
+    return _similarity_index
+
+def save_custom_scenario_async(scenario: CustomScenario) -> None:
+    """Add a scenario to the library right away and leave writing its file to a background thread"""
+    global _save_queue
+    with _pending_lock:
+        _pending_saves[scenario.name] = scenario
+    _scenario_index.add(scenario.name, scenario.name, scenario.tags)
+    _similarity_index.add(scenario.name, scenario.game_state)
+    if _save_queue is None:
+        _save_queue = queue.Queue()
+        threading.Thread(target=_save_worker, name="ScenarioWriter", daemon=True).start()
+    _save_queue.put(scenario)
+
+def flush_custom_scenario_saves() -> None:
+    """Wait for the background writer to write every queued scenario"""
+    if _save_queue is not None:
+        _save_queue.join()
+
+def _save_worker():
+    while True:
+        scenario = _save_queue.get()
+        try:
+            scenario._write()
+        except OSError as e:
+            print(f"Failed to save custom scenario {scenario.name}: {e}")
+        with _pending_lock:
+            _pending_saves.pop(scenario.name, None)
+        _save_queue.task_done()
+
+def new_capture_name() -> str:
+    """Name for a captured scenario, from the time of the capture"""
+    return unique_scenario_name(f"capture_{time.strftime('%Y%m%d_%H%M%S')}")
+
+def unique_scenario_name(base_name: str) -> str:
+    """base_name, or base_name with a number after it if the library already has a scenario by that name"""
+    name, number = base_name, 1
+    while (name in _scenario_cache or name in _pending_saves
+           or os.path.exists(os.path.join(_get_custom_scenarios_path(), f"{name}.json"))):
+        number += 1
+        name = f"{base_name}_{number}"
+    return name
+
+def delete_custom_scenario(name: str) -> None:
+    """Delete a custom scenario from disk and from the in-memory library"""
+    file_path = os.path.join(_get_custom_scenarios_path(), f"{name}.json")
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    _scenario_cache.pop(name, None)
+    _scenario_index.remove(name)
+    _similarity_index.remove(name)
+
 def _get_custom_scenarios_path():
     appdata_path = os.path.expandvars("%APPDATA%")
     if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "Scenarios")):
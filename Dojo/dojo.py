@@ -10,15 +10,18 @@ from input_management.custom_hotkey_manager import CustomHotkeyManager, HotkeyAc
 from game_state import DojoGameState, GymMode, ScenarioPhase, RacePhase, CarIndex, CUSTOM_SELECTION_LIST, CUSTOM_MODES
 from game_modes import ScenarioMode, RaceMode
 from ui_renderer import UIRenderer
-from menu import MenuRenderer, UIElement
+from menu import MenuRenderer, UIElement, create_filter_menu
 from scenario import Scenario, OffensiveMode, DefensiveMode
 import constants
 import modifier
+import collision
 import utils
 from race_record import RaceRecord, RaceRecords, get_race_records
 from custom_playlist import CustomPlaylistManager
 from playlist import PlaylistRegistry, PlayerRole
-from custom_scenario import CustomScenario, get_custom_scenarios
+from custom_scenario import (CustomScenario, TypedGameState, get_custom_scenarios, get_custom_scenario_index,
+                             save_custom_scenario_async, flush_custom_scenario_saves, new_capture_name)
+from session_recorder import SessionRecorder, NO_SCENARIO
 
 
 class Dojo(BaseScript):
@@ -56,6 +59,7 @@ class Dojo(BaseScript):
         
         # Internal state
         self.rlbot_game_state = None
+        self.session_recorder: SessionRecorder = None
 
         # Hotkey management
         self.binding_menu_manager: HotkeyBindingMenu = None
@@ -83,9 +87,16 @@ class Dojo(BaseScript):
             # Update current game mode
             if self.current_mode:
                 self.current_mode.update(packet)
+
+            if self.session_recorder:
+                self._record_tick(packet)
+
+            if self.game_state.capture_requested:
+                self.game_state.capture_requested = False
+                self._capture_scenario(packet)
             
             # Render UI
-            self._render_ui()
+            self._render_ui(packet)
     
     def _update_game_state(self, packet):
         """Update the game state with packet information"""
@@ -148,6 +159,9 @@ class Dojo(BaseScript):
         self.menu_renderer.add_element(UIElement('Main Menu', header=True))
         self.menu_renderer.add_element(UIElement('Reset Score', function=self._clear_score))
         self.menu_renderer.add_element(UIElement('Freeze Scenario', function=self._toggle_freeze_scenario))
+        self.menu_renderer.add_element(UIElement('Show First To Ball', function=self._toggle_first_to_ball))
+        self.menu_renderer.add_element(UIElement('Record Session', function=self._toggle_session_recording))
+        self.menu_renderer.add_element(UIElement('Scenario Stats', submenu=self.create_stats_menu(), submenu_refresh_function=self.create_stats_menu))
 
         # Preset mode menu
         self.preset_mode_menu = MenuRenderer(self.game_interface.renderer, columns=3)
@@ -208,6 +222,21 @@ class Dojo(BaseScript):
         """Move to the next scenario"""
         self.game_state.manual_reset_requested = True
 
+    def _rewind(self):
+        """Step the rep back in time"""
+        self.game_state.rewind_requested = True
+
+    def _request_capture(self):
+        """Save the next tick as a custom scenario"""
+        self.game_state.capture_requested = True
+
+    def _capture_scenario(self, packet):
+        # Only the file is written in the background, the scenario is in the library already
+        custom_scenario = CustomScenario(name=new_capture_name(), game_state=TypedGameState.from_packet(packet),
+                                         tags=["captured"])
+        save_custom_scenario_async(custom_scenario)
+        print(f"Captured custom scenario {custom_scenario.name}")
+
     def _toggle_timeout(self):
         """Toggle the timeout"""
         self.game_state.enable_timeouts = not self.game_state.enable_timeouts
@@ -217,6 +246,8 @@ class Dojo(BaseScript):
             self.hotkey_manager.set_action_callback(action=HotkeyAction.RESET_SHOT, callback=self._next_scenario)
             self.hotkey_manager.set_action_callback(action=HotkeyAction.TOGGLE_FREEZE_SCENARIO, callback=self._toggle_freeze_scenario)
             self.hotkey_manager.set_action_callback(action=HotkeyAction.TOGGLE_TIMEOUT, callback=self._toggle_timeout)
+            self.hotkey_manager.set_action_callback(action=HotkeyAction.REWIND, callback=self._rewind)
+            self.hotkey_manager.set_action_callback(action=HotkeyAction.CAPTURE_SCENARIO, callback=self._request_capture)
 
     def _setup_keyboard_handlers(self):
         """Set up all keyboard hotkeys"""
@@ -415,11 +446,24 @@ class Dojo(BaseScript):
         
         self.renderer.end_rendering()
 
-    def _render_ui(self):
+    def _render_ui(self, packet=None):
         """Render all UI elements"""
         if self.ui_renderer:
             # Render main UI
             self.ui_renderer.render_main_ui()
+
+            # Show where the ball is headed while the scenario is paused
+            ball_prediction = None
+            if self.game_state.game_phase == ScenarioPhase.PAUSED:
+                ball_prediction = getattr(self.current_mode, 'ball_prediction', None)
+            self.ui_renderer.render_ball_prediction(ball_prediction)
+
+            # Live estimate of who gets to the ball first, while a rep is being played
+            first_to_ball_packet = None
+            if (self.game_state.show_first_to_ball and self.game_state.gym_mode == GymMode.SCENARIO
+                    and self.game_state.game_phase in [ScenarioPhase.ACTIVE, ScenarioPhase.PAUSED]):
+                first_to_ball_packet = packet
+            self.ui_renderer.render_first_to_ball(first_to_ball_packet)
             
             # Render custom sandbox UI if in custom mode
             if self.game_state.is_in_custom_mode():
@@ -444,7 +488,26 @@ class Dojo(BaseScript):
     def _toggle_freeze_scenario(self):
         """Toggle scenario freezing"""
         self.game_state.toggle_freeze_scenario()
+
+    def _toggle_first_to_ball(self):
+        """Toggle the first to ball readout"""
+        self.game_state.show_first_to_ball = not self.game_state.show_first_to_ball
         
+    def _toggle_session_recording(self):
+        """Start or stop recording every tick of the session to disk"""
+        if self.session_recorder:
+            self.session_recorder.close()
+            self.session_recorder = None
+        else:
+            self.session_recorder = SessionRecorder()
+
+    def _record_tick(self, packet):
+        # Custom scenarios are not in the scenario history
+        scenario_id = self.game_state.freeze_scenario_index
+        if self.current_mode is not self.scenario_mode or self.scenario_mode.custom_mode_active:
+            scenario_id = NO_SCENARIO
+        self.session_recorder.record(packet, self.game_state, scenario_id)
+
     def _set_custom_scenario_name(self, name):
         """Set the custom scenario name"""
         if self.game_state.game_phase == ScenarioPhase.CUSTOM_NAMING:
@@ -542,11 +605,7 @@ class Dojo(BaseScript):
         elif self.game_state.custom_updown_selection.name == 'VELOCITY':
             modifier.modify_velocity(object_to_modify, -0.1)
         
-        # Update the game state
-        if hasattr(self.current_mode, 'get_rlbot_game_state'):
-            rlbot_game_state = self.current_mode.get_rlbot_game_state()
-            if rlbot_game_state:
-                self.game_interface.set_game_state(rlbot_game_state)
+        self._update_custom_game_state(object_to_modify)
     
     def _custom_up_handler(self):
         """Handle up input in custom mode"""
@@ -563,11 +622,7 @@ class Dojo(BaseScript):
         elif self.game_state.custom_updown_selection.name == 'VELOCITY':
             modifier.modify_velocity(object_to_modify, 0.1)
         
-        # Update the game state
-        if hasattr(self.current_mode, 'get_rlbot_game_state'):
-            rlbot_game_state = self.current_mode.get_rlbot_game_state()
-            if rlbot_game_state:
-                self.game_interface.set_game_state(rlbot_game_state)
+        self._update_custom_game_state(object_to_modify)
     
     def _custom_left_handler(self):
         """Handle left input in custom mode"""
@@ -584,11 +639,7 @@ class Dojo(BaseScript):
         elif self.game_state.custom_leftright_selection.name == 'BOOST':
             modifier.modify_boost(object_to_modify, increase=True)
         
-        # Update the game state
-        if hasattr(self.current_mode, 'get_rlbot_game_state'):
-            rlbot_game_state = self.current_mode.get_rlbot_game_state()
-            if rlbot_game_state:
-                self.game_interface.set_game_state(rlbot_game_state)
+        self._update_custom_game_state(object_to_modify)
     
     def _custom_right_handler(self):
         """Handle right input in custom mode"""
@@ -605,12 +656,16 @@ class Dojo(BaseScript):
         elif self.game_state.custom_leftright_selection.name == 'BOOST':
             modifier.modify_boost(object_to_modify, increase=False)
         
-        # Update the game state
+        self._update_custom_game_state(object_to_modify)
+    
+    def _update_custom_game_state(self, modified_object):
+        """Push the edited object out of anything it now overlaps and send the game state"""
         if hasattr(self.current_mode, 'get_rlbot_game_state'):
             rlbot_game_state = self.current_mode.get_rlbot_game_state()
             if rlbot_game_state:
+                collision.resolve_game_state_overlaps(rlbot_game_state, moved=modified_object)
                 self.game_interface.set_game_state(rlbot_game_state)
-    
+
     def _get_custom_object_to_modify(self):
         """Get the object to modify based on current custom phase"""
         rlbot_game_state = None
@@ -666,9 +721,18 @@ class Dojo(BaseScript):
         
         custom_scenario_selection_menu = MenuRenderer(self.game_interface.renderer, columns=1)
         custom_scenario_selection_menu.add_element(UIElement("Select Custom Scenario", header=True))
+        custom_scenario_selection_menu.add_element(UIElement("Search...", submenu=self.create_custom_scenario_search_menu(), submenu_refresh_function=self.create_custom_scenario_search_menu))
         for scenario_name in custom_scenarios:
             custom_scenario_selection_menu.add_element(UIElement(scenario_name, function=self.load_custom_scenario, function_args=scenario_name))
         return custom_scenario_selection_menu
+
+    def create_custom_scenario_search_menu(self):
+        """Create filter-as-you-type menu over custom scenario names and tags"""
+        return create_filter_menu(
+            self.game_interface.renderer,
+            get_custom_scenario_index().search,
+            lambda scenario_name: UIElement(scenario_name, function=self.load_custom_scenario, function_args=scenario_name)
+        )
         
     def create_custom_scenario_starting_point_menu(self):
         """Create custom scenario starting point submenu"""
@@ -744,6 +808,7 @@ class Dojo(BaseScript):
         
         playlist_menu = MenuRenderer(self.game_interface.renderer, columns=1)
         playlist_menu.add_element(UIElement("Select Playlist", header=True))
+        playlist_menu.add_element(UIElement("Search...", submenu=self.create_playlist_search_menu(), submenu_refresh_function=self.create_playlist_search_menu))
         
         # Add each playlist as a menu option
         for playlist_name in self.playlist_registry.list_playlists():
@@ -757,6 +822,23 @@ class Dojo(BaseScript):
             ))
         
         return playlist_menu
+
+    def create_stats_menu(self):
+        """Create the outcome stats submenu, most played scenarios first"""
+        stats_menu = MenuRenderer(self.game_interface.renderer, columns=1)
+        stats_menu.add_element(UIElement("Scenario Stats", header=True))
+        scenarios = sorted(self.game_state.outcome_stats.scenarios.items(), key=lambda item: -item[1].reps)
+        for key, stats in scenarios:
+            stats_menu.add_element(UIElement(f"{key}  {stats.summary()}"))
+        return stats_menu
+
+    def create_playlist_search_menu(self):
+        """Create filter-as-you-type menu over playlist names and tags"""
+        return create_filter_menu(
+            self.game_interface.renderer,
+            self.playlist_registry.search_index.search,
+            lambda playlist_name: UIElement(playlist_name, function=self.set_playlist, function_args=playlist_name)
+        )
     
     def set_playlist(self, playlist_name):
         """Set the active playlist and return to game"""
@@ -776,6 +858,12 @@ class Dojo(BaseScript):
         keyboard.unhook_all()
         if self.hotkey_manager:
             self.hotkey_manager.stop()
+        if self.game_state:
+            self.game_state.scenario_history.close()
+            self.game_state.outcome_stats.close()
+        if self.session_recorder:
+            self.session_recorder.close()
+        flush_custom_scenario_saves()
 
 
 # Entry point
@@ -4,6 +4,7 @@ from rlbot.utils.game_state_util import GameState, BallState, CarState, Physics,
 
 from .base_mode import BaseGameMode
 from game_state import RacePhase, CarIndex
+from car_layout import CarLayout, DEFAULT_LAYOUT
 import race
 from race_record import RaceRecord, RaceRecords, store_race_records
 
@@ -16,6 +17,7 @@ class RaceMode(BaseGameMode):
         self.race = None
         self.rlbot_game_state = None
         self.last_menu_phase_time = 0
+        self.car_layout = DEFAULT_LAYOUT
     
     def initialize(self):
         """Initialize race mode"""
@@ -37,17 +39,9 @@ class RaceMode(BaseGameMode):
             )
         )
         
-        # Tuck the bot above the map
-        bot_car_state = CarState(
-            physics=Physics(
-                location=Vector3(0, 0, 2500), 
-                velocity=Vector3(0, 0, 0), 
-                rotation=Rotator(0, 0, 0)
-            )
-        )
-        
         car_states[CarIndex.HUMAN.value] = player_car_state
-        car_states[CarIndex.BOT.value] = bot_car_state
+        # Tuck the bots above the map
+        car_states.update(self._tucked_bot_states())
         
         self.rlbot_game_state = GameState(cars=car_states)
         self.set_game_state(self.rlbot_game_state)
@@ -60,6 +54,9 @@ class RaceMode(BaseGameMode):
         """Update race mode based on current game phase"""
         if self.game_state.paused:
             return
+
+        if packet.num_cars != self.car_layout.num_cars:
+            self.car_layout = CarLayout.from_packet(packet)
             
         phase_handlers = {
             RacePhase.INIT: self._handle_init_phase,
@@ -175,17 +172,22 @@ class RaceMode(BaseGameMode):
             )
         )
         
-        # Keep bot tucked away
-        bot_car_state = CarState(
-            physics=Physics(
-                location=Vector3(0, 0, 2500),
-                velocity=Vector3(0, 0, 0),
-                rotation=Rotator(0, 0, 0)
-            )
-        )
-        
         car_states[CarIndex.HUMAN.value] = human_car_state
-        car_states[CarIndex.BOT.value] = bot_car_state
+        # Keep bots tucked away
+        car_states.update(self._tucked_bot_states())
         
         self.rlbot_game_state = GameState(cars=car_states, ball=ball_state)
         self.set_game_state(self.rlbot_game_state) 
+
+    def _tucked_bot_states(self):
+        """Get a car state for every bot in the match, spaced out above the map so they don't collide"""
+        return {
+            index: CarState(
+                physics=Physics(
+                    location=Vector3(slot * 300, 0, 2500),
+                    velocity=Vector3(0, 0, 0),
+                    rotation=Rotator(0, 0, 0)
+                )
+            )
+            for slot, index in enumerate(self.car_layout.bot_indices())
+        }
@@ -4,11 +4,15 @@ from rlbot.utils.game_state_util import GameState, BallState, CarState, Physics,
 from .base_mode import BaseGameMode
 from game_state import ScenarioPhase, CarIndex, CUSTOM_MODES
 from scenario import Scenario, OffensiveMode, DefensiveMode
+from car_layout import CarLayout, DEFAULT_LAYOUT, BLUE_TEAM, ORANGE_TEAM
 from constants import BACK_WALL, GOAL_DETECTION_THRESHOLD, BALL_GROUND_THRESHOLD, FREE_GOAL_TIMEOUT
 from playlist import PlaylistRegistry, PlayerRole
 import utils
 import time
 from custom_scenario import CustomScenario
+from outcome_stats import Outcome, scenario_key
+from rewind_buffer import RewindBuffer, REWIND_STEP
+from simulator import predict_scenarios, spawn_scenario
 
 class ScenarioMode(BaseGameMode):
     """Handles scenario-based training mode"""
@@ -24,6 +28,15 @@ class ScenarioMode(BaseGameMode):
         self.custom_scenario = None
         self.custom_trial_active = False
         self.trial_start_time = 0
+        self.car_layout = DEFAULT_LAYOUT
+        self.ball_prediction = None
+        # Start time of the rep being played, None between reps
+        self.rep_start_time = None
+        self.rep_extended = False
+        # Game time the menu was opened at, its time is left out of the rep being played
+        self.menu_start_time = None
+        # Physics of the last seconds of the rep, to rewind to
+        self.rewind_buffer = RewindBuffer()
             
     def set_custom_scenario(self, scenario):
         """Set the custom scenario"""
@@ -46,6 +59,7 @@ class ScenarioMode(BaseGameMode):
             
         self.current_playlist = self.playlist_registry.get_playlist(playlist_name)
         if self.current_playlist:
+            self.current_playlist.compile_sampler()
             self.game_state.timeout = self.current_playlist.settings.timeout
             self.game_state.rule_zero_mode = self.current_playlist.settings.rule_zero
     
@@ -67,6 +81,11 @@ class ScenarioMode(BaseGameMode):
         """Update scenario mode based on current game phase"""
         if self.game_state.paused:
             return
+
+        # Cars can join or leave mid-session, keep the team index mapping current
+        if packet.num_cars != self.car_layout.num_cars:
+            self.car_layout = CarLayout.from_packet(packet)
+            print(f"Car layout changed: {self.car_layout.team_size(BLUE_TEAM)}v{self.car_layout.team_size(ORANGE_TEAM)}")
             
         phase_handlers = {
             ScenarioPhase.INIT: self._handle_init_phase,
@@ -96,9 +115,19 @@ class ScenarioMode(BaseGameMode):
     
     def _handle_setup_phase(self, packet):
         """Handle setup phase - create new scenario"""
-        if self.current_playlist:
-            self._setup_playlist_mode()
-        
+        # Every scenario starts a fresh rep, also when the last one was left mid-play,
+        # by setting a playlist or resetting during the menu countdown
+        self._leave_menu()
+        self._end_rep(Outcome.RESET)
+        self.rep_start_time = None
+        self.rep_extended = False
+        self.rewind_buffer.clear()
+
+        if self.current_playlist and not self._setup_playlist_mode():
+            # A playlist that doesn't loop stops when it runs out, back to the menu to pick what's next
+            self.game_state.game_phase = ScenarioPhase.MENU
+            return
+
         self._set_next_game_state()
         self.prev_time = self.game_state.cur_time
         self.game_state.game_phase = ScenarioPhase.PAUSED
@@ -108,6 +137,14 @@ class ScenarioMode(BaseGameMode):
         if self.rlbot_game_state:
             self.set_game_state(self.rlbot_game_state)
         self.last_menu_phase_time = time.time()
+        if self.menu_start_time is None:
+            self.menu_start_time = self.game_state.cur_time
+
+    def _leave_menu(self):
+        """Move the start of the rep being played past the time spent in the menu"""
+        if self.menu_start_time is not None and self.rep_start_time is not None:
+            self.rep_start_time += self.game_state.cur_time - self.menu_start_time
+        self.menu_start_time = None
             
     def _handle_menu_exiting_phase(self, packet):
         """Unfreeze game state after a 3 second countdown"""
@@ -121,6 +158,7 @@ class ScenarioMode(BaseGameMode):
         # For each second, render a countdown from 3 to 1
         if time.time() - self.last_menu_phase_time > 3:
             self.game_state.game_phase = ScenarioPhase.ACTIVE
+            self._leave_menu()
             
             # Reset prev time so we don't instantly timeout 
             self.prev_time = self.game_state.cur_time
@@ -151,6 +189,19 @@ class ScenarioMode(BaseGameMode):
     
     def _handle_active_phase(self, packet):
         """Handle active scenario phase"""
+        if self.rep_start_time is None:
+            self.rep_start_time = self.game_state.cur_time
+            self.rep_extended = False
+            self.rewind_buffer.clear()
+            # A rewind asked for between reps is dropped
+            self.game_state.rewind_requested = False
+
+        if self.game_state.rewind_requested:
+            self.game_state.rewind_requested = False
+            self._rewind()
+            return
+        self.rewind_buffer.record(packet)
+
         # Handle goal reset disabled mode
         if self.game_state.disable_goal_reset:
             if self._check_ball_in_goal(packet):
@@ -158,6 +209,11 @@ class ScenarioMode(BaseGameMode):
         
         # Handle kickoff pause
         if packet.game_info.is_kickoff_pause:
+            # The game reset the ball after a goal
+            outcome = self._goal_outcome(packet)
+            if outcome is not None:
+                self._end_rep(outcome)
+            self.rep_start_time = None
             self.game_state.game_phase = ScenarioPhase.SETUP
             return
         
@@ -168,11 +224,26 @@ class ScenarioMode(BaseGameMode):
             if (packet.game_ball.physics.location.z < BALL_GROUND_THRESHOLD
                 or not self.game_state.rule_zero_mode
                 or self.game_state.manual_reset_requested):
+                self._end_rep(Outcome.RESET if self.game_state.manual_reset_requested else Outcome.TIMEOUT)
                 self.game_state.manual_reset_requested = False
                 self._award_defensive_goal()
                 self.game_state.game_phase = ScenarioPhase.SETUP
                 self.game_state.scored_time = self.game_state.cur_time
+            else:
+                # Rule zero keeps the rep going while the ball is in the air
+                self.rep_extended = True
     
+    def _rewind(self):
+        """Set the rep back REWIND_STEP seconds, its timeout and duration count from there"""
+        rewound = self.rewind_buffer.rewind(REWIND_STEP)
+        if rewound is None:
+            return
+        rlbot_game_state, rewound_time = rewound
+        self.set_game_state(rlbot_game_state)
+        seconds_back = self.game_state.cur_time - rewound_time
+        self.prev_time += seconds_back
+        self.rep_start_time += seconds_back
+
     def _handle_custom_phase(self, packet):
         """Handle custom sandbox phases"""
         if self.rlbot_game_state:
@@ -188,10 +259,15 @@ class ScenarioMode(BaseGameMode):
             self.game_state.game_phase = ScenarioPhase.CUSTOM_OFFENSE
             return
     
-    def _setup_playlist_mode(self):
-        """Setup scenario based on current playlist"""
+    def _setup_playlist_mode(self) -> bool:
+        """Setup scenario based on current playlist, returns False once the playlist has finished"""
         self.custom_mode_active = False
-        scenario_config, is_custom = self.current_playlist.get_next_scenario()
+        next_scenario = self.current_playlist.get_next_scenario()
+        if next_scenario is None:
+            print(f"Playlist {self.current_playlist.name} finished")
+            self.clear_playlist()
+            return False
+        scenario_config, is_custom = next_scenario
         if scenario_config and not is_custom:
             self.game_state.offensive_mode = scenario_config.offensive_mode
             self.game_state.defensive_mode = scenario_config.defensive_mode
@@ -199,6 +275,7 @@ class ScenarioMode(BaseGameMode):
         elif scenario_config and is_custom:
             self.custom_scenario = scenario_config
             self.custom_mode_active = True
+        return True
             
     def _set_next_game_state(self):
         """Create and set the next scenario game state"""
@@ -211,20 +288,32 @@ class ScenarioMode(BaseGameMode):
                 boost_range = self.current_playlist.settings.boost_range
                 print(f"Using playlist boost range: {boost_range}")
             
-            scenario = Scenario(self.game_state.offensive_mode, self.game_state.defensive_mode, boost_range=boost_range)
-            if self.game_state.player_offense:
-                scenario.Mirror()
+            # Fill every car in the match, the human's team is on offense when player_offense is set
+            offense_team = BLUE_TEAM if self.game_state.player_offense else ORANGE_TEAM
+            num_offense = max(1, self.car_layout.team_size(offense_team))
+            num_defense = max(1, self.car_layout.team_size(1 - offense_team))
+
+            # Seeded on its own so the rep can be regenerated from its history entry, see spawn_scenario
+            scenario, seed, self.ball_prediction = spawn_scenario(
+                self.game_state.offensive_mode, self.game_state.defensive_mode, self.game_state.player_offense,
+                boost_range, num_offense, num_defense)
             
-            self.game_state.scenario_history.append(scenario)
-            self.game_state.freeze_scenario_index = len(self.game_state.scenario_history) - 1
+            self.game_state.freeze_scenario_index = self.game_state.scenario_history.append(
+                scenario, seed, self.game_state.offensive_mode, self.game_state.defensive_mode)
         else:
             if self.custom_mode_active:
                 scenario = Scenario.FromGameState(self.custom_scenario.to_rlbot_game_state())
             else:
                 scenario = self.game_state.scenario_history[self.game_state.freeze_scenario_index]
+            self.ball_prediction = predict_scenarios([scenario])
         
-        self.rlbot_game_state = scenario.GetGameState()
+        self.rlbot_game_state = scenario.GetGameState(self.car_layout)
         self.set_game_state(self.rlbot_game_state)
+        if self.custom_mode_active:
+            self.game_state.current_scenario_key = scenario_key(custom_name=self.custom_scenario.name)
+        else:
+            self.game_state.current_scenario_key = scenario_key(self.game_state.offensive_mode, self.game_state.defensive_mode,
+                                                                self.game_state.player_offense)
     
     def _check_ball_in_goal(self, packet) -> bool:
         """Check if ball is in goal and award points accordingly"""
@@ -235,6 +324,7 @@ class ScenarioMode(BaseGameMode):
         # Bot scored
         if ball_y < BACK_WALL - GOAL_DETECTION_THRESHOLD:
             self.game_state.bot_score += 1
+            self._end_rep(Outcome.LOSS)
             self.game_state.game_phase = ScenarioPhase.SETUP
             return True
         
@@ -242,6 +332,7 @@ class ScenarioMode(BaseGameMode):
         # Human scored
         elif ball_y > (-BACK_WALL + GOAL_DETECTION_THRESHOLD):
             self.game_state.human_score += 1
+            self._end_rep(Outcome.WIN)
             self.game_state.game_phase = ScenarioPhase.SETUP
             return True
         
@@ -250,8 +341,10 @@ class ScenarioMode(BaseGameMode):
             team_scored = self.get_team_scored(packet)
             if team_scored == CarIndex.HUMAN.value:
                 self.game_state.human_score += 1
+                self._end_rep(Outcome.WIN)
             else:
                 self.game_state.bot_score += 1
+                self._end_rep(Outcome.LOSS)
             self.game_state.game_phase = ScenarioPhase.SETUP
             return True
         
@@ -262,4 +355,20 @@ class ScenarioMode(BaseGameMode):
         if self.game_state.player_offense:
             self.game_state.bot_score += 1
         else:
-            self.game_state.human_score += 1 
+            self.game_state.human_score += 1
+
+    def _goal_outcome(self, packet):
+        """Outcome of a goal the game counted, or None if no team's score changed"""
+        human_score = packet.teams[CarIndex.HUMAN.value].score
+        bot_score = packet.teams[CarIndex.BOT.value].score
+        if human_score == self.game_state.score_human_prev and bot_score == self.game_state.score_bot_prev:
+            return None
+        return Outcome.WIN if self.get_team_scored(packet) == CarIndex.HUMAN.value else Outcome.LOSS
+
+    def _end_rep(self, outcome):
+        """Count the rep being played in the outcome stats"""
+        if self.rep_start_time is None or self.game_state.current_scenario_key is None:
+            return
+        self.game_state.outcome_stats.record_rep(self.game_state.current_scenario_key, outcome,
+                                                 self.game_state.cur_time - self.rep_start_time, self.rep_extended)
+        self.rep_start_time = None
@@ -3,6 +3,8 @@ from dataclasses import dataclass
 from typing import List, Optional
 from scenario import Scenario, OffensiveMode, DefensiveMode
 from race_record import RaceRecord, RaceRecords
+from scenario_history import ScenarioHistory
+from outcome_stats import OutcomeStats
 
 
 class CustomUpDownSelection(Enum):
@@ -84,10 +86,16 @@ class DojoGameState:
     freeze_scenario: bool = False
     freeze_scenario_index: int = 0
     enable_timeouts: bool = True
-    scenario_history: List[Scenario] = None
+    show_first_to_ball: bool = False
+    scenario_history: ScenarioHistory = None
+    outcome_stats: OutcomeStats = None
+    # Stats key of the scenario being played, see outcome_stats.scenario_key
+    current_scenario_key: Optional[str] = None
 
     # Scenario controls
     manual_reset_requested: bool = False  # Scenario should reset on next tick (flag should be set to False after)
+    rewind_requested: bool = False  # Rep should rewind by REWIND_STEP on next tick
+    capture_requested: bool = False  # Next tick should be saved as a custom scenario
     
     # Custom mode selections
     custom_updown_selection: CustomUpDownSelection = CustomUpDownSelection.Y
@@ -119,7 +127,9 @@ class DojoGameState:
     
     def __post_init__(self):
         if self.scenario_history is None:
-            self.scenario_history = []
+            self.scenario_history = ScenarioHistory()
+        if self.outcome_stats is None:
+            self.outcome_stats = OutcomeStats()
     
     def clear_score(self):
         """Reset both human and bot scores to zero"""
@@ -0,0 +1,5 @@
+from .expressions import ExpressionError
+from .spec import ModeSpec, CompiledMode, compile_mode
+from .modes import OFFENSIVE_SPECS, DEFENSIVE_SPECS, BUILTIN_MODES
+from .user_modes import get_user_modes, load_mode_file, store_mode
+from .generator import get_mode, generate_states, generate_scenarios
@@ -0,0 +1,49 @@
+"""
+Checks a generated setup has to pass, by the name specs refer to them with.
+
+Each one takes stacked (N, rows, 13) scenario arrays and returns a mask of
+the feasible scenarios, see sampling.sample_feasible, along with the same
+check of a single scenario for sampling.sample_feasible_one.
+"""
+
+import math
+
+import numpy as np
+
+from constants import BALL_RADIUS
+from sampling import Constraint
+from scenario import BALL_ROW, OFFENSE_ROW, DEFENSE_ROW, X, Y, YAW
+import utils
+
+# Cars closer than this, center to center, spawn overlapping
+CAR_CLEARANCE = 250
+# The ball is "ahead" of a car when it is at least this far in front of it along the car's heading
+MIN_BALL_LEAD = 300
+
+BALL_IN_FIELD = Constraint(
+    "ball in field",
+    lambda states: utils.in_field(states[:, BALL_ROW, X], states[:, BALL_ROW, Y], BALL_RADIUS),
+    lambda state: utils.in_field_xy(state[BALL_ROW][X], state[BALL_ROW][Y], BALL_RADIUS))
+OFFENSE_IN_FIELD = Constraint(
+    "offense in field",
+    lambda states: utils.in_field(states[:, OFFENSE_ROW, X], states[:, OFFENSE_ROW, Y], utils.FIELD_MARGIN),
+    lambda state: utils.in_field_xy(state[OFFENSE_ROW][X], state[OFFENSE_ROW][Y], utils.FIELD_MARGIN))
+# Defenders may start in their net
+DEFENSE_IN_FIELD = Constraint(
+    "defense in field",
+    lambda states: utils.in_field(states[:, DEFENSE_ROW, X], states[:, DEFENSE_ROW, Y], utils.FIELD_MARGIN, allow_goal=True),
+    lambda state: utils.in_field_xy(state[DEFENSE_ROW][X], state[DEFENSE_ROW][Y], utils.FIELD_MARGIN, allow_goal=True))
+BALL_AHEAD = Constraint(
+    "ball ahead of offense",
+    lambda states: ((states[:, BALL_ROW, X] - states[:, OFFENSE_ROW, X]) * np.cos(states[:, OFFENSE_ROW, YAW])
+                    + (states[:, BALL_ROW, Y] - states[:, OFFENSE_ROW, Y]) * np.sin(states[:, OFFENSE_ROW, YAW]) >= MIN_BALL_LEAD),
+    lambda state: ((state[BALL_ROW][X] - state[OFFENSE_ROW][X]) * math.cos(state[OFFENSE_ROW][YAW])
+                   + (state[BALL_ROW][Y] - state[OFFENSE_ROW][Y]) * math.sin(state[OFFENSE_ROW][YAW]) >= MIN_BALL_LEAD))
+CARS_APART = Constraint(
+    "cars apart",
+    lambda states: np.hypot(states[:, DEFENSE_ROW, X] - states[:, OFFENSE_ROW, X],
+                            states[:, DEFENSE_ROW, Y] - states[:, OFFENSE_ROW, Y]) >= CAR_CLEARANCE,
+    lambda state: float(np.hypot(state[DEFENSE_ROW][X] - state[OFFENSE_ROW][X],
+                                 state[DEFENSE_ROW][Y] - state[OFFENSE_ROW][Y])) >= CAR_CLEARANCE)
+
+BY_NAME = {constraint.name: constraint for constraint in (BALL_IN_FIELD, OFFENSE_IN_FIELD, DEFENSE_IN_FIELD, BALL_AHEAD, CARS_APART)}
@@ -0,0 +1,326 @@
+"""
+Expressions of the scenario spec format, compiled to batched numpy functions.
+
+An expression is a Python-like formula such as
+    offense.x + 600 * cos(offense.yaw) + uniform(-100, 100)
+Names are variables set earlier in the spec or the CONSTANTS below,
+and object.field reads a value of the ball or of a car. Every random call
+draws one value per scenario of the batch, so the same formula evaluated
+for 100000 scenarios is a handful of array operations.
+
+A batch of one is mostly numpy call overhead, so expressions also compile to
+plain float functions for single scenarios. Those draw from the same random
+stream as a batch of one and fall back to numpy for whatever math raises on,
+like the square root of a negative number.
+
+Only the syntax below is accepted, anything else is rejected at compile time.
+"""
+
+import ast
+import math
+import operator
+from typing import Callable, Dict, Sequence
+
+import numpy as np
+
+from constants import SIDE_WALL, BACK_WALL, BALL_RADIUS
+import utils
+
+# Values a formula is evaluated against: the batch size, the variables and a reader of object fields
+Evaluate = Callable[["Context"], np.ndarray]
+
+CONSTANTS = {
+    "pi": np.pi,
+    "SIDE_WALL": SIDE_WALL,
+    "BACK_WALL": BACK_WALL,
+    "BALL_RADIUS": BALL_RADIUS,
+    "GOAL_WIDTH": utils.GOAL_WIDTH,
+    "GOAL_DEPTH": utils.GOAL_DEPTH,
+    "FIELD_MARGIN": utils.FIELD_MARGIN,
+}
+
+
+class Context:
+    """Batch being drawn: its size, the variables set so far and a reader of object fields"""
+    __slots__ = ('count', 'variables', 'read')
+
+    def __init__(self, count: int, read: Callable[[str, str], np.ndarray]):
+        self.count = count
+        self.variables: Dict[str, np.ndarray] = {}
+        self.read = read
+
+
+def _uniform(context, low, high):
+    return low + np.random.random(context.count) * (high - low)
+
+
+def _choice(context, *options):
+    index = np.random.randint(len(options), size=context.count)
+    return np.choose(index, np.broadcast_arrays(*options))
+
+
+def _sign(context):
+    return np.where(np.random.random(context.count) < 0.5, -1.0, 1.0)
+
+
+def _fit(context, min_distance, max_distance, room):
+    # Distance from [min_distance, max_distance], cut down to fit in room. When not even
+    # min_distance fits, the draw spreads over the far half of the room instead of stacking at its end
+    high = np.minimum(max_distance, room)
+    low = np.minimum(min_distance, high / 2)
+    return _uniform(context, low, high)
+
+
+def _minimum(a, b):
+    # NaN wins, as with np.minimum
+    return a if a <= b or a != a else b
+
+
+def _maximum(a, b):
+    return a if a >= b or a != a else b
+
+
+def _uniform_one(context, low, high):
+    return low + np.random.random() * (high - low)
+
+
+def _choice_one(context, *options):
+    return options[np.random.randint(len(options))]
+
+
+def _sign_one(context):
+    return -1.0 if np.random.random() < 0.5 else 1.0
+
+
+def _fit_one(context, min_distance, max_distance, room):
+    high = _minimum(max_distance, room)
+    low = _minimum(min_distance, high / 2)
+    return _uniform_one(context, low, high)
+
+
+# Random functions take the context to know how many values to draw
+RANDOM_FUNCTIONS = {
+    "uniform": (_uniform, 2),
+    "choice": (_choice, None),
+    "sign": (_sign, 0),
+    "fit": (_fit, 3),
+}
+_SCALAR_RANDOM_FUNCTIONS = {
+    "uniform": _uniform_one,
+    "choice": _choice_one,
+    "sign": _sign_one,
+    "fit": _fit_one,
+}
+
+FUNCTIONS = {
+    "sin": (np.sin, 1),
+    "cos": (np.cos, 1),
+    "atan2": (np.arctan2, 2),
+    "sqrt": (np.sqrt, 1),
+    "hypot": (np.hypot, 2),
+    "abs": (np.abs, 1),
+    "min": (np.minimum, 2),
+    "max": (np.maximum, 2),
+    "clip": (np.clip, 3),
+}
+
+_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Pow: np.power,
+    ast.Mod: np.mod,
+}
+
+# math only matches numpy bit for bit on some functions, the others call numpy on floats
+_SCALAR_FUNCTIONS = {
+    "sin": math.sin,
+    "cos": math.cos,
+    "atan2": lambda y, x: float(np.arctan2(y, x)),
+    "sqrt": math.sqrt,
+    "hypot": lambda x, y: float(np.hypot(x, y)),
+    "abs": abs,
+    "min": _minimum,
+    "max": _maximum,
+    "clip": lambda value, low, high: _minimum(_maximum(value, low), high),
+}
+
+_SCALAR_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: math.pow,
+    ast.Mod: operator.mod,
+}
+
+_COMPARISONS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+_SCALAR_COMPARISONS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+
+class ExpressionError(ValueError):
+    """An expression uses syntax, names or fields the spec format does not support"""
+
+
+def compile_expression(source: str, variables: Sequence[str], fields: Dict[str, Sequence[str]],
+                       scalar: bool = False) -> Evaluate:
+    """
+    Compile an expression to a function of a Context
+    variables are the names set before it, fields the readable fields of each object name
+    A scalar expression evaluates a single scenario to a float, with object fields read as floats
+    """
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"invalid expression '{source}': {e.msg}") from None
+    return _compile(tree.body, source, set(variables), fields, scalar)
+
+
+def _guarded(function, fallback):
+    """Call a float function, and the numpy one it stands for when it raises instead of returning inf or NaN"""
+    def call(*arguments):
+        try:
+            return function(*arguments)
+        except (ArithmeticError, ValueError):
+            with np.errstate(all="ignore"):
+                return float(fallback(*arguments))
+    return call
+
+
+def _is_constant(node, variables) -> bool:
+    """Whether a node only combines numbers and CONSTANTS, without reading or drawing anything"""
+    if isinstance(node, ast.Name):
+        return node.id in CONSTANTS and node.id not in variables
+    if isinstance(node, ast.Call):
+        return (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords
+                and all(_is_constant(argument, variables) for argument in node.args))
+    if isinstance(node, (ast.Constant, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp)):
+        return all(_is_constant(child, variables) for child in ast.iter_child_nodes(node)
+                   if not isinstance(child, (ast.operator, ast.unaryop, ast.cmpop)))
+    return False
+
+
+def _compile(node, source, variables, fields, scalar=False, fold=True) -> Evaluate:
+    def compile_child(child):
+        return _compile(child, source, variables, fields, scalar, fold)
+
+    # Parts like -0.25 * pi are worked out once here instead of on every draw
+    if fold and not isinstance(node, ast.Constant) and _is_constant(node, variables):
+        value = _compile(node, source, variables, fields, scalar=True, fold=False)(None)
+        return lambda context: value
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = float(node.value)
+        return lambda context: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in variables:
+            return lambda context: context.variables[name]
+        if name in CONSTANTS:
+            value = float(CONSTANTS[name])
+            return lambda context: value
+        raise ExpressionError(f"unknown name '{name}' in '{source}'")
+
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+        owner, field = node.value.id, node.attr
+        if owner not in fields:
+            raise ExpressionError(f"'{owner}' can't be read in '{source}'")
+        if field not in fields[owner]:
+            raise ExpressionError(f"'{owner}.{field}' is unknown or not set yet in '{source}'")
+        return lambda context: context.read(owner, field)
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        function = _OPERATORS[type(node.op)]
+        if scalar:
+            function = _guarded(_SCALAR_OPERATORS[type(node.op)], function)
+        return _call(function, [compile_child(node.left), compile_child(node.right)])
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = compile_child(node.operand)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if scalar:
+            return lambda context: -operand(context)
+        return lambda context: np.negative(operand(context))
+
+    # Comparisons are numbers, so (ball.x > 0) can scale a value
+    if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in _COMPARISONS:
+        left, right = compile_child(node.left), compile_child(node.comparators[0])
+        if scalar:
+            comparison = _SCALAR_COMPARISONS[type(node.ops[0])]
+            return lambda context: float(comparison(left(context), right(context)))
+        comparison = _COMPARISONS[type(node.ops[0])]
+        return lambda context: comparison(left(context), right(context)).astype(np.float64)
+
+    # a if condition else b picks per scenario
+    if isinstance(node, ast.IfExp):
+        condition, body, orelse = compile_child(node.test), compile_child(node.body), compile_child(node.orelse)
+        if scalar:
+            # Both branches are evaluated, as in a batch, so they draw the same random numbers
+            def pick(context):
+                test, if_true, if_false = condition(context), body(context), orelse(context)
+                return if_true if test != 0 else if_false
+            return pick
+        return lambda context: np.where(condition(context) != 0, body(context), orelse(context))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        name = node.func.id
+        if name not in RANDOM_FUNCTIONS and name not in FUNCTIONS:
+            raise ExpressionError(f"unknown function '{name}' in '{source}'")
+        arguments = [compile_child(argument) for argument in node.args]
+        if name in RANDOM_FUNCTIONS:
+            function, arity = RANDOM_FUNCTIONS[name]
+            _check_arity(name, arity, arguments, source)
+            if scalar:
+                function = _SCALAR_RANDOM_FUNCTIONS[name]
+            return _call(function, [_context, *arguments])
+        function, arity = FUNCTIONS[name]
+        _check_arity(name, arity, arguments, source)
+        if scalar:
+            function = _guarded(_SCALAR_FUNCTIONS[name], function)
+        return _call(function, arguments)
+
+    raise ExpressionError(f"unsupported syntax '{ast.unparse(node)}' in '{source}'")
+
+
+def _context(context):
+    return context
+
+
+def _call(function, arguments) -> Evaluate:
+    """Call function with the value of every argument, unrolled for the usual counts since single draws are call bound"""
+    if len(arguments) == 1:
+        first, = arguments
+        return lambda context: function(first(context))
+    if len(arguments) == 2:
+        first, second = arguments
+        return lambda context: function(first(context), second(context))
+    if len(arguments) == 3:
+        first, second, third = arguments
+        return lambda context: function(first(context), second(context), third(context))
+    return lambda context: function(*[argument(context) for argument in arguments])
+
+
+def _check_arity(name, arity, arguments, source):
+    if arity is None:
+        if not arguments:
+            raise ExpressionError(f"{name}() needs at least one option in '{source}'")
+    elif len(arguments) != arity:
+        raise ExpressionError(f"{name}() takes {arity} arguments, got {len(arguments)} in '{source}'")
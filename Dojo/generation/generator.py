@@ -0,0 +1,153 @@
+"""
+Batched scenario generation from compiled setups.
+
+generate_states runs the whole pipeline of a Scenario over a batch at once:
+the offensive and defensive setups are drawn until they pass their
+constraints, objects are moved back in bounds, support cars are placed,
+overlapping spawns are pushed apart and boost is randomized. Tools that
+need many scenarios ask for them all in one call.
+
+Scenario asks for one at a time, once per rep. A batch of one would spend
+nearly all its time in numpy call overhead, so a single scenario is drawn and
+checked with plain floats instead, from the same random numbers.
+"""
+
+from enum import Enum
+from typing import List, Optional, Union
+
+import numpy as np
+
+import utils
+from sampling import sample_feasible, sample_feasible_one
+from scenario import (Scenario, CarRole, support_roles, resolve_spawn_overlaps,
+                      BALL_ROW, OFFENSE_ROW, DEFENSE_ROW, FIRST_SUPPORT_ROW, SCENARIO_SHAPE, LOCATION, VELOCITY,
+                      X, Y, Z, YAW, BOOST)
+from .modes import BUILTIN_MODES
+from .spec import CompiledMode
+from .user_modes import get_user_modes
+
+# A built-in mode, a compiled setup or the name of a user setup
+Mode = Union[Enum, CompiledMode, str, None]
+
+# Candidates carry their play yaw in one extra column of the ball row, so it follows them through redraws
+_PLAY_YAW = SCENARIO_SHAPE[1]
+
+
+def get_mode(mode: Mode) -> Optional[CompiledMode]:
+    """Resolve a mode argument to its compiled setup"""
+    if mode is None or isinstance(mode, CompiledMode):
+        return mode
+    if isinstance(mode, str):
+        user_modes = get_user_modes()
+        if mode not in user_modes:
+            raise KeyError(f"Unknown mode: {mode}")
+        return user_modes[mode]
+    return BUILTIN_MODES[mode]
+
+
+def generate_states(offensive_mode: Mode = None, defensive_mode: Mode = None, count: int = 1, boost_range=None,
+                    num_offense: int = 1, num_defense: int = 1):
+    """
+    Generate count scenarios as a stacked (count, rows, 13) array, with the play yaw of each (NaN when unset)
+    Cars past the first two are support cars, offense first, as in Scenario
+    """
+    offense = get_mode(offensive_mode)
+    defense = get_mode(defensive_mode)
+    roles = np.array(support_roles(num_offense, num_defense), dtype=np.int8)
+    paired = offense is not None and defense is not None
+
+    # The setups are redrawn together until they meet the constraints of both modes
+    modes = [mode for mode in (offense, defense) if mode is not None]
+    constraints = [constraint for mode in modes for constraint in mode.constraints]
+    if modes and count == 1:
+        candidate = _sample_one(modes, constraints, paired)
+        states = np.array([[row[:_PLAY_YAW] for row in candidate] + [[np.nan] * SCENARIO_SHAPE[1]] * len(roles)])
+        play_yaw = np.array([candidate[BALL_ROW][_PLAY_YAW]])
+    else:
+        states = np.full((count, FIRST_SUPPORT_ROW + len(roles), SCENARIO_SHAPE[1]), np.nan)
+        play_yaw = np.full(count, np.nan)
+        if modes:
+            def draw(n):
+                candidates = np.full((n, FIRST_SUPPORT_ROW, SCENARIO_SHAPE[1] + 1), np.nan)
+                for mode in modes:
+                    yaw = mode.draw(candidates)
+                    if yaw is not None:
+                        candidates[:, BALL_ROW, _PLAY_YAW] = yaw
+                return candidates
+            candidates, _ = sample_feasible(draw, constraints, count, modes=[mode.key for mode in modes])
+            states[:, :FIRST_SUPPORT_ROW] = candidates[..., :_PLAY_YAW]
+            play_yaw = candidates[:, BALL_ROW, _PLAY_YAW]
+        if paired:
+            # Out of bounds objects left by the last draw are moved back in
+            primary = states[:, :FIRST_SUPPORT_ROW, LOCATION].reshape(-1, 3)
+            utils.sanity_check_locations(primary, utils.FIELD_MARGIN)
+            states[:, :FIRST_SUPPORT_ROW, LOCATION] = primary.reshape(count, FIRST_SUPPORT_ROW, 3)
+
+    if paired:
+        if len(roles):
+            _place_support_cars(states, roles)
+        resolve_spawn_overlaps(states)
+
+    # Randomize boost level of each car - use boost_range if provided, otherwise default
+    min_boost, max_boost = boost_range if boost_range else (12, 100)
+    states[:, OFFENSE_ROW:, BOOST] = min_boost + np.random.random((count, states.shape[1] - OFFENSE_ROW)) * (max_boost - min_boost)
+    return states, play_yaw
+
+
+def generate_scenarios(offensive_mode: Mode, defensive_mode: Mode, count: int, boost_range=None,
+                       num_offense: int = 1, num_defense: int = 1) -> List[Scenario]:
+    """Generate count Scenario objects in one batch"""
+    states, play_yaw = generate_states(offensive_mode, defensive_mode, count, boost_range, num_offense, num_defense)
+    roles = [CarRole.OFFENSE.value, CarRole.DEFENSE.value, *support_roles(num_offense, num_defense)]
+    scenarios = []
+    for state, yaw in zip(states, play_yaw.tolist()):
+        scenario = Scenario.FromArray(state, roles=roles)
+        scenario.play_yaw = None if np.isnan(yaw) else yaw
+        scenarios.append(scenario)
+    return scenarios
+
+
+def _sample_one(modes, constraints, sanity_check):
+    """
+    The setups of a single scenario drawn as row lists, the same way a batch of one would be
+    Returns its rows with the play yaw in the extra column, moved back in bounds when sanity_check is set
+    """
+    def draw():
+        candidate = [[np.nan] * (SCENARIO_SHAPE[1] + 1) for _ in range(FIRST_SUPPORT_ROW)]
+        for mode in modes:
+            yaw = mode.draw_one(candidate)
+            if yaw is not None:
+                candidate[BALL_ROW][_PLAY_YAW] = yaw
+        return candidate
+    candidate, _ = sample_feasible_one(draw, constraints, modes=[mode.key for mode in modes])
+    if sanity_check:
+        for row in candidate:
+            row[X], row[Y] = utils.sanity_check_xy(row[X], row[Y], utils.FIELD_MARGIN)
+    return candidate
+
+
+def _place_support_cars(states, roles):
+    """
+    Place every extra car at once, around the primary car of its role
+    Offensive support trails behind the attacker, defensive support drops back toward its net
+    """
+    count = len(states)
+    support = states[:, FIRST_SUPPORT_ROW:]
+    is_offense = roles == CarRole.OFFENSE.value
+    primary = states[:, np.where(is_offense, OFFENSE_ROW, DEFENSE_ROW)]
+    shape = (count, len(roles))
+
+    # Offense attacks toward negative Y, so behind the attacker is positive Y
+    lateral_offset = np.random.uniform(800, 2000, shape) * np.random.choice([-1, 1], shape)
+    depth_offset = np.random.uniform(1000, 2500, shape) * np.where(is_offense, 1, -1)
+    speed_factor = np.random.uniform(0.6, 1.0, shape)
+
+    support[:] = 0
+    support[..., X] = primary[..., X] + lateral_offset
+    support[..., Y] = np.clip(primary[..., Y] + depth_offset, utils.BACK_WALL + 300, -utils.BACK_WALL - 300)
+    support[..., Z] = 17
+    support[..., VELOCITY] = primary[..., VELOCITY] * speed_factor[..., np.newaxis]
+    support[..., YAW] = primary[..., YAW]
+    locations = support[..., LOCATION].reshape(-1, 3)
+    utils.sanity_check_locations(locations, utils.FIELD_MARGIN)
+    support[..., LOCATION] = locations.reshape(shape + (3,))
@@ -0,0 +1,229 @@
+"""
+Spawn heatmaps of generated scenarios.
+
+Every offensive and defensive mode pair is generated through the whole
+pipeline, and where each object spawns is binned with np.histogramdd. Two
+histograms are kept: the object's location in 3D, and its location against
+the heading of its velocity. A mode's heatmap sums every pair it is part of.
+It is drawn as a location density, with the main heading of each cell drawn
+on top.
+
+Histograms are cached on disk per pair. The cache key is a hash of both
+setups and GENERATOR_VERSION, so editing one mode only regenerates the
+pairs it is part of. A cached pair is topped up to --count samples.
+--incremental adds --count new samples to it instead.
+
+Usage, from the Dojo folder:
+    python -m generation.heatmaps --count 20000
+    python -m generation.heatmaps --count 20000 --incremental --modes OffensiveMode.CORNER NET
+"""
+
+import argparse
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from constants import SIDE_WALL, BACK_WALL, GOAL_DEPTH, CEILING_HEIGHT
+from scenario import OffensiveMode, DefensiveMode, CarRole, GENERATOR_VERSION, BALL_ROW, OFFENSE_ROW, DEFENSE_ROW, LOCATION, X, Y
+from thumbnails import draw_field
+from .generator import Mode, get_mode, generate_states
+from .user_modes import get_user_modes
+
+OBJECTS = {"ball": BALL_ROW, "offense": OFFENSE_ROW, "defense": DEFENSE_ROW}
+FIELD_RANGE = ((-SIDE_WALL, SIDE_WALL), (BACK_WALL - GOAL_DEPTH, -BACK_WALL + GOAL_DEPTH))
+# x, y, z of each object
+LOCATION_BINS = (32, 48, 8)
+LOCATION_RANGE = FIELD_RANGE + ((0, CEILING_HEIGHT),)
+# x, y and heading of the velocity of each moving object, coarser so every cell gets enough samples
+HEADING_BINS = (16, 24, 16)
+HEADING_RANGE = FIELD_RANGE + ((-np.pi, np.pi),)
+# Objects slower than this have no heading
+MIN_SPEED = 100
+# Scenarios are generated and binned this many at a time, to bound memory
+CHUNK_SIZE = 20000
+# Cells with less than this share of the busiest cell's moving samples get no heading arrow
+MIN_HEADING_SHARE = 0.02
+
+
+class Histograms:
+    """Location and heading histograms of every object, with the number of scenarios binned"""
+
+    def __init__(self, samples: int = 0, counts: Optional[Dict[str, np.ndarray]] = None):
+        self.samples = samples
+        self.counts = counts if counts is not None else {
+            name: np.zeros(LOCATION_BINS if name.endswith("location") else HEADING_BINS, dtype=np.int64)
+            for name in histogram_names()
+        }
+
+    def add(self, other: "Histograms"):
+        self.samples += other.samples
+        for name, counts in other.counts.items():
+            self.counts[name] += counts
+
+
+def histogram_names() -> List[str]:
+    return [f"{name} {kind}" for name in OBJECTS for kind in ("location", "heading")]
+
+
+def bin_states(states: np.ndarray) -> Histograms:
+    """Bin stacked (N, rows, 13) scenario arrays"""
+    histograms = Histograms(len(states))
+    for name, row in OBJECTS.items():
+        location = states[:, row, LOCATION]
+        location = location[np.isfinite(location).all(axis=1)]
+        histograms.counts[f"{name} location"] += np.histogramdd(location, LOCATION_BINS, LOCATION_RANGE)[0].astype(np.int64)
+
+        velocity = states[:, row, 3:5]
+        with np.errstate(invalid="ignore"):
+            moving = np.hypot(velocity[:, X], velocity[:, Y]) >= MIN_SPEED
+        heading = np.column_stack((states[moving, row, X], states[moving, row, Y],
+                                   np.arctan2(velocity[moving, Y], velocity[moving, X])))
+        histograms.counts[f"{name} heading"] += np.histogramdd(heading, HEADING_BINS, HEADING_RANGE)[0].astype(np.int64)
+    return histograms
+
+
+def pair_key(offensive_mode: Mode, defensive_mode: Mode) -> str:
+    """Hash of everything that decides what a pair generates"""
+    setups = [get_mode(mode).spec.model_dump_json() for mode in (offensive_mode, defensive_mode)]
+    return hashlib.sha1("\n".join([str(GENERATOR_VERSION), *setups]).encode()).hexdigest()
+
+
+def update_pair(offensive_mode: Mode, defensive_mode: Mode, count: int, incremental: bool = False) -> Histograms:
+    """
+    Histograms of a mode pair with at least count samples, generating only what the cache lacks
+    With incremental, count new samples are added to the cache whatever it holds
+    """
+    key = pair_key(offensive_mode, defensive_mode)
+    histograms = _load_histograms(key)
+    needed = count if incremental else count - histograms.samples
+    for start in range(0, needed, CHUNK_SIZE):
+        # Seeded by how many samples came before, so new samples never repeat cached ones
+        np.random.seed((int(key[:8], 16) + histograms.samples) % 2 ** 32)
+        states, _ = generate_states(offensive_mode, defensive_mode, min(CHUNK_SIZE, needed - start))
+        histograms.add(bin_states(states))
+    if needed > 0:
+        _store_histograms(key, histograms)
+    return histograms
+
+
+def mode_heatmaps(modes: List[Mode], count: int, incremental: bool = False) -> Dict[str, Histograms]:
+    """Histograms of every mode, by name, summed over the pairs it is part of"""
+    offensive, defensive = all_modes()
+    pairs = {}
+    heatmaps = {}
+    for mode in modes:
+        compiled = get_mode(mode)
+        partners = defensive if compiled.role == CarRole.OFFENSE else offensive
+        total = Histograms()
+        for partner in partners:
+            pair = (mode, partner) if compiled.role == CarRole.OFFENSE else (partner, mode)
+            if pair not in pairs:
+                pairs[pair] = update_pair(*pair, count, incremental)
+                print(f"{mode_name(pair[0])} vs {mode_name(pair[1])}: {pairs[pair].samples} samples")
+            total.add(pairs[pair])
+        heatmaps[mode_name(mode)] = total
+    return heatmaps
+
+
+def all_modes() -> Tuple[List[Mode], List[Mode]]:
+    """Built-in and user modes of each side"""
+    offensive: List[Mode] = list(OffensiveMode)
+    defensive: List[Mode] = list(DefensiveMode)
+    for name, mode in get_user_modes().items():
+        (offensive if mode.role == CarRole.OFFENSE else defensive).append(name)
+    return offensive, defensive
+
+
+def mode_name(mode: Mode) -> str:
+    """Name of a user mode, or the enum and member of a built-in one: both sides have a CORNER"""
+    return mode if isinstance(mode, str) else f"{type(mode).__name__}.{mode.name}"
+
+
+def render_heatmap(name: str, histograms: Histograms, file_path: str):
+    """Save a heatmap image of a mode, one panel per object, offense attacking down"""
+    figure, axes = plt.subplots(1, len(OBJECTS), figsize=(5 * len(OBJECTS), 7))
+    extent = (*FIELD_RANGE[0], *FIELD_RANGE[1])
+    for ax, object_name in zip(axes, OBJECTS):
+        density = histograms.counts[f"{object_name} location"].sum(axis=2)
+        # Square root scale, so sparse spawns still show next to dense ones
+        ax.imshow(np.sqrt(density.T), origin="lower", extent=extent, cmap="magma", aspect="equal")
+
+        # Circular mean of the headings of every cell, longer when they agree
+        headings = histograms.counts[f"{object_name} heading"]
+        edges = np.linspace(*HEADING_RANGE[2], HEADING_BINS[2] + 1)
+        centers = (edges[:-1] + edges[1:]) / 2
+        moving = headings.sum(axis=2)
+        cos_sum = headings @ np.cos(centers)
+        sin_sum = headings @ np.sin(centers)
+        shown = moving >= max(moving.max() * MIN_HEADING_SHARE, 1)
+        if shown.any():
+            x_edges = np.linspace(*FIELD_RANGE[0], HEADING_BINS[0] + 1)
+            y_edges = np.linspace(*FIELD_RANGE[1], HEADING_BINS[1] + 1)
+            x, y = np.meshgrid((x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, indexing="ij")
+            length = np.hypot(cos_sum, sin_sum)[shown] / moving[shown]
+            angle = np.arctan2(sin_sum, cos_sum)[shown]
+            ax.quiver(x[shown], y[shown], np.cos(angle) * length, np.sin(angle) * length,
+                      color="cyan", scale=HEADING_BINS[0], width=0.004)
+
+        draw_field(ax, "w-")
+        ax.set_title(object_name)
+        ax.set_xticks([])
+        ax.set_yticks([])
+    figure.suptitle(f"{name} ({histograms.samples} scenarios)")
+    figure.savefig(file_path, bbox_inches="tight")
+    plt.close(figure)
+
+
+def _load_histograms(key: str) -> Histograms:
+    file_path = os.path.join(_get_heatmaps_path(), f"{key}.npz")
+    if not os.path.exists(file_path):
+        return Histograms()
+    with np.load(file_path) as data:
+        return Histograms(int(data["samples"]), {name: data[name] for name in histogram_names()})
+
+
+def _store_histograms(key: str, histograms: Histograms):
+    file_path = os.path.join(_get_heatmaps_path(), f"{key}.npz")
+    np.savez_compressed(file_path, samples=histograms.samples, **histograms.counts)
+
+
+def _get_heatmaps_path():
+    appdata_path = os.path.expandvars("%APPDATA%")
+    if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "Heatmaps")):
+        os.makedirs(os.path.join(appdata_path, "RLBot", "Dojo", "Heatmaps"))
+    return os.path.join(appdata_path, "RLBot", "Dojo", "Heatmaps")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw where every scenario mode spawns the ball and cars")
+    parser.add_argument("--count", type=int, default=20000, help="Scenarios binned per mode pair")
+    parser.add_argument("--modes", nargs="+", default=None, help="Names of the modes to draw, all by default")
+    parser.add_argument("--incremental", action="store_true", help="Add --count new samples to the cached histograms")
+    parser.add_argument("--output", default=None, help="Folder of the images, the heatmap cache by default")
+    args = parser.parse_args()
+
+    offensive, defensive = all_modes()
+    modes = offensive + defensive
+    if args.modes:
+        # A bare built-in name picks the modes of both sides that have it
+        selected = [mode for mode in modes if mode_name(mode) in args.modes or getattr(mode, "name", None) in args.modes]
+        known = {name for mode in selected for name in (mode_name(mode), getattr(mode, "name", None))}
+        unknown = [name for name in args.modes if name not in known]
+        if unknown:
+            print(f"Unknown modes: {', '.join(unknown)}")
+            return
+        modes = selected
+
+    output_path = args.output or _get_heatmaps_path()
+    os.makedirs(output_path, exist_ok=True)
+    for name, histograms in mode_heatmaps(modes, args.count, args.incremental).items():
+        file_path = os.path.join(output_path, f"{name}.png")
+        render_heatmap(name, histograms, file_path)
+        print(f"Saved {file_path}")
+
+
+if __name__ == "__main__":
+    main()
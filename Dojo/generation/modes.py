@@ -0,0 +1,234 @@
+"""
+The built-in offensive and defensive setups, written as specs.
+
+Setups of the same family share their pieces: a car driving along a yaw, a
+ball a fixed lead in front of the attacker, a ball rolling along a yaw.
+Coordinates are from the default perspective, with the offense attacking
+toward negative Y.
+"""
+
+from enum import Enum
+from typing import Dict
+
+from scenario import OffensiveMode, DefensiveMode, CarRole
+from .spec import ModeSpec, CompiledMode, compile_mode
+
+# Mostly straight at the goal, with some diagonal plays
+PLAY_YAW = "choice(-0.25 * pi, -0.375 * pi, -0.5 * pi, -0.5 * pi, -0.5 * pi, -0.625 * pi, -0.75 * pi)"
+TOWARD_GOAL = "1.5 * pi"
+# Setups that put the ball in front of the attacker to start with possession
+POSSESSION_CONSTRAINTS = ["ball in field", "offense in field", "ball ahead of offense"]
+
+
+def _car(role, x, y, yaw, speed, z="17"):
+    """A car at x, y driving along yaw at a speed"""
+    return {
+        f"{role}.x": x,
+        f"{role}.y": y,
+        f"{role}.z": z,
+        f"{role}.yaw": yaw,
+        f"{role}_speed": speed,
+        f"{role}.vx": f"{role}_speed * cos({role}.yaw)",
+        f"{role}.vy": f"{role}_speed * sin({role}.yaw)",
+    }
+
+
+def _ball_ahead(lead, z):
+    """The ball lead units in front of the attacker, give or take 100 on each axis"""
+    return {
+        "ball.x": f"offense.x + {lead} * cos(offense.yaw) + uniform(-100, 100)",
+        "ball.y": f"offense.y + {lead} * sin(offense.yaw) + uniform(-100, 100)",
+        "ball.z": z,
+    }
+
+
+def _ball_rolling(yaw, speed):
+    """The ball moving along yaw at a speed"""
+    return {
+        "ball_speed": speed,
+        "ball.vx": f"ball_speed * cos({yaw})",
+        "ball.vy": f"ball_speed * sin({yaw})",
+    }
+
+
+def _possession(y):
+    # Attacker driving upfield with the ball in front of it
+    return {
+        "play_yaw": PLAY_YAW,
+        **_car("offense", "uniform(-2000, 2000)", y, "play_yaw + uniform(-0.1 * pi, 0.1 * pi)", "uniform(800, 1200)"),
+        **_ball_ahead(600, "93 + uniform(0, 200)"),
+        **_ball_rolling("play_yaw", "uniform(800, 1200)"),
+    }
+
+
+def _wall_breakout(play_yaw):
+    # Attacker near the side wall with the ball in front of it, half of them on the other side
+    return {
+        "play_yaw": play_yaw,
+        **_car("offense", "SIDE_WALL - uniform(500, 1500)", "uniform(0, 2500)",
+               "play_yaw + uniform(-0.1 * pi, 0.1 * pi)", "uniform(1000, 1500)"),
+        **_ball_ahead(600, "93 + uniform(0, 30)"),
+        **_ball_rolling("play_yaw", "uniform(1000, 1500)"),
+    }
+
+
+def _attacking_run(yaw_spread="0.1 * pi", speed="uniform(800, 1200)", x="uniform(-500, 500)", y="uniform(-1000, 1000)"):
+    # Attacker driving at the goal, waiting on a ball sent toward the back wall
+    return {
+        "play_yaw": TOWARD_GOAL,
+        **_car("offense", x, y, f"play_yaw + uniform(-{yaw_spread}, {yaw_spread})", speed),
+    }
+
+
+def _lob(y_offset, height, rise):
+    # Ball in line with the attacker, flying toward the back wall
+    return {
+        **_attacking_run(),
+        "ball.x": "offense.x",
+        "ball.y": f"offense.y + {y_offset}",
+        "ball.z": height,
+        "ball.vx": "uniform(400, 500) * (ball.x > 0)",
+        "ball.vy": "uniform(-3000, -2000)",
+        "ball.vz": rise,
+    }
+
+
+def _corner(role):
+    # Car heading around the corner, facing halfway between the corner boost and the back post
+    return _car(role, "uniform(SIDE_WALL - 1000, SIDE_WALL - 500)", "uniform(BACK_WALL + 1500, BACK_WALL + 2500)",
+                f"atan2(BACK_WALL + 500 - {role}.y, SIDE_WALL - 2000 - {role}.x)", "uniform(800, 1200)")
+
+
+def _shadow(min_distance, max_distance):
+    # Defender between the attacker and the net, cut short to fit in front of the back wall
+    return _car("defense", "offense.x + uniform(-300, 300)",
+                f"offense.y - fit({min_distance}, {max_distance}, offense.y - (BACK_WALL + FIELD_MARGIN))",
+                "offense.yaw + uniform(-0.1 * pi, 0.1 * pi)", "uniform(800, 1200)")
+
+
+OFFENSIVE_SPECS: Dict[OffensiveMode, ModeSpec] = {
+    OffensiveMode.POSSESSION: ModeSpec(name="Possession", role=CarRole.OFFENSE, constraints=POSSESSION_CONSTRAINTS,
+                                       setup=_possession("uniform(-2500, 1500)")),
+    OffensiveMode.BREAKOUT: ModeSpec(name="Breakout", role=CarRole.OFFENSE, constraints=POSSESSION_CONSTRAINTS,
+                                     setup=_possession("uniform(2000, 3000)")),
+    OffensiveMode.PASS: ModeSpec(name="Pass", role=CarRole.OFFENSE, setup={
+        "play_yaw": PLAY_YAW,
+        **_car("offense", "uniform(-2000, 2000)", "uniform(-1000, 1500)", "play_yaw + uniform(-0.1 * pi, 0.1 * pi)",
+               "uniform(800, 1200)"),
+        # Ball comes from the far side wall, close to the goal, toward a spot 1500 in front of the attacker
+        "ball.x": "3500 if offense.x < 0 else -3500",
+        "ball.y": "uniform(-4500, -3500)",
+        "ball.z": "93 + uniform(0, 2000)",
+        "pass_speed": "uniform(0.4, 0.5)",
+        "ball.vx": "(offense.x + 1500 * cos(offense.yaw) - ball.x) * pass_speed",
+        # Capped, or else it goes past the offensive car sometimes
+        "ball.vy": "min((offense.y + 1500 * sin(offense.yaw) - ball.y) * pass_speed, 750)",
+        "ball.vz": "uniform(0, 300)",
+    }),
+    OffensiveMode.BACKPASS: ModeSpec(name="Backpass", role=CarRole.OFFENSE, setup={
+        "play_yaw": PLAY_YAW,
+        **_car("offense", "uniform(-2000, 2000)", "uniform(2000, 3000)", "play_yaw + uniform(-0.1 * pi, 0.1 * pi)",
+               "uniform(800, 1200)"),
+        # Like a breakout, but the ball starts far ahead and heads back to the attacker
+        **_ball_ahead(3000, "93 + uniform(0, 200)"),
+        "pass_speed": "uniform(0.4, 0.5)",
+        "ball.vx": "(offense.x - ball.x) * pass_speed",
+        "ball.vy": "(offense.y - ball.y) * pass_speed",
+        "ball.vz": "uniform(-300, 300)",
+    }),
+    OffensiveMode.CARRY: ModeSpec(name="Carry", role=CarRole.OFFENSE, setup={
+        "play_yaw": PLAY_YAW,
+        **_car("offense", "uniform(-2000, 2000)", "uniform(-2500, 2500)", "play_yaw + uniform(-0.1 * pi, 0.1 * pi)",
+               "uniform(800, 1200)"),
+        # Ball starts on top of the car
+        "ball.x": "offense.x",
+        "ball.y": "offense.y - 200",
+        "ball.z": "400",
+        **_ball_rolling("play_yaw", "uniform(800, 1200)"),
+    }),
+    OffensiveMode.CORNER: ModeSpec(name="Corner", role=CarRole.OFFENSE, constraints=POSSESSION_CONSTRAINTS, mirror_x=0.5, setup={
+        **_corner("offense"),
+        "play_yaw": "offense.yaw",
+        **_ball_ahead(600, "93 + uniform(0, 200)"),
+        **_ball_rolling("offense.yaw", "uniform(800, 1200)"),
+    }),
+    OffensiveMode.SIDEWALL: ModeSpec(name="Sidewall", role=CarRole.OFFENSE, constraints=POSSESSION_CONSTRAINTS, mirror_x=0.5, setup={
+        # Slightly toward the net but mostly toward the side wall, not too close to the goal
+        "play_yaw": "uniform(5.8, 6.2)",
+        **_car("offense", "SIDE_WALL - uniform(1500, 2500)", "uniform(-1500, 1500)",
+               "play_yaw + uniform(-0.1 * pi, 0.1 * pi)", "uniform(800, 1200)"),
+        **_ball_ahead(600, "93 + uniform(0, 30)"),
+        **_ball_rolling("play_yaw", "uniform(1500, 2000)"),
+    }),
+    OffensiveMode.LOB_ON_GOAL: ModeSpec(name="Lob on goal", role=CarRole.OFFENSE,
+                                        setup=_lob(1000, "93 + uniform(1000, 1600)", "uniform(0, 300)")),
+    OffensiveMode.BACKWALL_BOUNCE: ModeSpec(name="Backwall bounce", role=CarRole.OFFENSE,
+                                            setup=_lob(-1000, "93 + uniform(1000, 2000)", "uniform(300, 500)")),
+    # Slightly toward the side wall but mostly toward the net, from far out
+    OffensiveMode.SIDEWALL_BREAKOUT: ModeSpec(name="Sidewall breakout", role=CarRole.OFFENSE, constraints=POSSESSION_CONSTRAINTS,
+                                              mirror_x=0.5, setup=_wall_breakout("uniform(-1.5, -0.5)")),
+    OffensiveMode.BACK_CORNER_BREAKOUT: ModeSpec(name="Back corner breakout", role=CarRole.OFFENSE, constraints=POSSESSION_CONSTRAINTS,
+                                                 mirror_x=0.5, setup=_wall_breakout("uniform(0.5, 1.5)")),
+    OffensiveMode.BACKBOARD_PASS: ModeSpec(name="Backboard pass", role=CarRole.OFFENSE, mirror_x=0.5, setup={
+        **_attacking_run(),
+        # Ball starts close to the back wall, flying toward it
+        "ball.x": "SIDE_WALL - uniform(1000, 2000)",
+        "ball.y": "BACK_WALL + uniform(2000, 3000)",
+        "ball.z": "93 + uniform(500, 1200)",
+        "ball.vx": "uniform(400, 500) * (ball.x > 0)",
+        "ball.vy": "uniform(-3000, -2000)",
+        "ball.vz": "uniform(0, 300)",
+    }),
+    OffensiveMode.SIDE_BACKBOARD_PASS: ModeSpec(name="Side backboard pass", role=CarRole.OFFENSE, setup={
+        # Ball near one side wall bounces off the backboard to the other side of the net,
+        # the attacker follows up from the same side as the ball
+        "side": "sign()",
+        **_attacking_run(x="side * uniform(1000, 2000)", y="uniform(0, 1000)"),
+        "ball.x": "side * (SIDE_WALL - uniform(200, 800))",
+        "ball.y": "BACK_WALL + uniform(2500, 3500)",
+        "ball.z": "93 + uniform(300, 800)",
+        "ball.vx": "-side * uniform(1200, 1600)",
+        "ball.vy": "uniform(-3000, -2500)",
+        "ball.vz": "uniform(-50, 300)",
+    }),
+    OffensiveMode.OVER_SHOULDER: ModeSpec(name="Over shoulder", role=CarRole.OFFENSE, mirror_x=0.5, setup={
+        # Attacker on one side of the field facing the goal, the ball comes over its shoulder
+        # from behind and above, toward a spot ahead of it
+        "side": "sign()",
+        **_attacking_run("0.2 * pi", "uniform(1000, 1400)", "side * uniform(2000, 2500)", "uniform(-500, 1500)"),
+        "ball.x": "offense.x - side * uniform(1500, 2000)",
+        "ball.y": "offense.y + uniform(1500, 3000)",
+        "ball.z": "93 + uniform(400, 1200)",
+        "target_x": "offense.x - side * uniform(500, 1000)",
+        "target_y": "offense.y - uniform(800, 1500)",
+        **_ball_rolling("atan2(target_y - ball.y, target_x - ball.x)", "uniform(2800, 2900)"),
+        "ball.vz": "uniform(100, 400)",
+    }),
+}
+
+DEFENSIVE_SPECS: Dict[DefensiveMode, ModeSpec] = {
+    DefensiveMode.NEAR_SHADOW: ModeSpec(name="Near shadow", role=CarRole.DEFENSE, setup=_shadow(1500, 2500)),
+    DefensiveMode.FAR_SHADOW: ModeSpec(name="Far shadow", role=CarRole.DEFENSE, setup=_shadow(3000, 4000)),
+    DefensiveMode.NET: ModeSpec(name="Net", role=CarRole.DEFENSE, setup={
+        # Still in the net, facing the attacker
+        "defense.x": "uniform(-200, 200)",
+        "defense.y": "-5600",
+        "defense.z": "27",
+        "defense.yaw": "atan2(offense.y - defense.y, offense.x - defense.x)",
+    }),
+    DefensiveMode.CORNER: ModeSpec(name="Corner", role=CarRole.DEFENSE, mirror_x=0.5, setup=_corner("defense")),
+    DefensiveMode.RECOVERING: ModeSpec(name="Recovering", role=CarRole.DEFENSE, setup=_car(
+        # Past the attacker and the ball, in the air and heading for the other net, with little chance to make it back
+        "defense", "offense.x / 2", "offense.y + uniform(500, 1000)", TOWARD_GOAL, "uniform(100, 300)",
+        z="uniform(100, 300)")),
+    DefensiveMode.FRONT_INTERCEPT: ModeSpec(name="Front intercept", role=CarRole.DEFENSE, setup={
+        # 3000 in front of the attacker, or as far as the back wall allows, facing it
+        **_car("defense", "offense.x + uniform(-500, 500)",
+               "offense.y - fit(3000, 3000, offense.y - (BACK_WALL + FIELD_MARGIN))",
+               "atan2(offense.y - defense.y, offense.x - defense.x)", "uniform(800, 1200)"),
+    }),
+}
+
+BUILTIN_MODES: Dict[Enum, CompiledMode] = {
+    mode: compile_mode(spec, key=mode) for specs in (OFFENSIVE_SPECS, DEFENSIVE_SPECS) for mode, spec in specs.items()
+}
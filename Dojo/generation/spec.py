@@ -0,0 +1,217 @@
+"""
+Declarative scenario setups and their compiled batch samplers.
+
+A ModeSpec describes how one side of a scenario is randomized: the ball and
+the offensive car for an offensive mode, the defensive car for a defensive
+one. Its setup is an ordered list of assignments, each an expression (see
+expressions.py). A key with a dot sets a field of an object, any other key a
+variable later expressions can use:
+
+    {
+        "name": "Wall pinch",
+        "role": "offense",
+        "setup": {
+            "play_yaw": "choice(-0.25 * pi, -0.5 * pi)",
+            "offense.x": "uniform(-2000, 2000)",
+            "offense.y": "uniform(-1000, 1000)",
+            "offense.yaw": "play_yaw + uniform(-0.1 * pi, 0.1 * pi)",
+            "speed": "uniform(800, 1200)",
+            "offense.vx": "speed * cos(offense.yaw)",
+            "offense.vy": "speed * sin(offense.yaw)",
+            "ball.x": "offense.x + 600 * cos(offense.yaw)",
+            "ball.y": "offense.y + 600 * sin(offense.yaw)"
+        },
+        "mirror_x": 0.5
+    }
+
+Offensive setups own the ball and the offensive car, defensive setups own the
+defensive car and can anchor it to anything the offense placed. Fields left
+out keep their defaults: cars on the ground, still and flat, and the ball at
+rest on the ground. A variable named play_yaw is kept as the scenario's play
+direction. mirror_x is the chance of flipping the whole setup across the
+length of the field, and constraints names the checks a draw has to pass.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from pydantic import BaseModel, Field, field_validator
+
+from constants import BALL_RADIUS
+from sampling import Constraint
+from scenario import CarRole, BALL_ROW, OFFENSE_ROW, DEFENSE_ROW, YAW, MIRROR_X_COLUMNS
+from .expressions import Context, ExpressionError, compile_expression
+from . import constraints
+
+# Settable fields and their scenario column
+FIELDS = {
+    "x": 0, "y": 1, "z": 2,
+    "vx": 3, "vy": 4, "vz": 5,
+    "pitch": 6, "yaw": 7, "roll": 8,
+}
+PLAY_YAW = "play_yaw"
+
+_ROWS = {"ball": BALL_ROW, "offense": OFFENSE_ROW, "defense": DEFENSE_ROW}
+_MIRROR_X_COLUMNS = MIRROR_X_COLUMNS.tolist()
+# Objects each side sets, with their row
+OBJECTS = {
+    CarRole.OFFENSE: {"ball": BALL_ROW, "offense": OFFENSE_ROW},
+    CarRole.DEFENSE: {"defense": DEFENSE_ROW},
+}
+# Objects each side can read without setting them: the defense is placed after the offense
+ANCHORS = {
+    CarRole.OFFENSE: (),
+    CarRole.DEFENSE: ("ball", "offense"),
+}
+
+# Defaults of each row before the setup runs. Cars start on the ground, flat and still with full boost,
+# the ball at rest with its rotation and spin unset
+_CAR_DEFAULTS = np.array([0, 0, 17, 0, 0, 0, 0, 0, 0, 0, 0, 0, 100], dtype=np.float64)
+_BALL_DEFAULTS = np.array([0, 0, BALL_RADIUS, 0, 0, 0, *[np.nan] * 7], dtype=np.float64)
+
+DEFAULT_CONSTRAINTS = {
+    CarRole.OFFENSE: ["ball in field", "offense in field"],
+    CarRole.DEFENSE: ["defense in field", "cars apart"],
+}
+
+
+class ModeSpec(BaseModel):
+    """A randomized setup of one side of a scenario, see the module docstring for the format"""
+    name: str
+    role: CarRole
+    setup: Dict[str, Union[float, str]]
+    mirror_x: float = Field(default=0.0, ge=0.0, le=1.0)
+    constraints: Optional[List[str]] = None
+
+    @field_validator("role", mode="before")
+    @classmethod
+    def _role_by_name(cls, role):
+        # Files can name the role instead of using its value
+        if isinstance(role, str):
+            return CarRole[role.upper()]
+        return role
+
+
+@dataclass(eq=False)
+class CompiledMode:
+    """
+    A ModeSpec compiled to a sampler of stacked scenario arrays
+    key is what its sampling stats are recorded under: the mode enum of a built-in setup, the compiled mode otherwise
+    """
+    name: str
+    role: CarRole
+    key: object
+    constraints: Tuple[Constraint, ...]
+    mirror_x: float
+    # Rows the setup owns with their defaults, then its assignments in order, batched and scalar
+    rows: Tuple[int, ...]
+    defaults: np.ndarray
+    assignments: Tuple[Tuple[Optional[int], int, str, object, object], ...]
+    # The spec it was compiled from
+    spec: Optional[ModeSpec] = None
+
+    def draw(self, states: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Run the setup over stacked (N, rows, 13) scenario arrays, in place
+        Returns the play yaw of every scenario, or None when the setup has no play_yaw
+        """
+        rows = list(self.rows)
+        states[:, rows, :self.defaults.shape[1]] = self.defaults
+        # Reads are copies, so a variable keeps its value when the field it was read from changes
+        context = Context(len(states), lambda owner, field: states[:, _ROWS[owner], FIELDS[field]].copy())
+        for row, column, variable, evaluate, _ in self.assignments:
+            value = evaluate(context)
+            if row is None:
+                context.variables[variable] = value
+            else:
+                states[:, row, column] = value
+
+        play_yaw = context.variables.get(PLAY_YAW)
+        if play_yaw is not None:
+            play_yaw = np.array(np.broadcast_to(play_yaw, len(states)), dtype=np.float64)
+        if self.mirror_x:
+            mirrored = np.flatnonzero(np.random.random(len(states)) < self.mirror_x)
+            if len(mirrored):
+                flipped = states[mirrored[:, np.newaxis], rows]
+                flipped[..., MIRROR_X_COLUMNS] *= -1
+                flipped[..., YAW] += np.pi
+                states[mirrored[:, np.newaxis], rows] = flipped
+                # The play direction turns with the setup
+                if play_yaw is not None:
+                    play_yaw[mirrored] = -play_yaw[mirrored] + np.pi
+        return play_yaw
+
+    def draw_one(self, state: List[List[float]]) -> Optional[float]:
+        """
+        Run the setup over a single scenario given as a list of row lists, in place
+        Draws the same random numbers as draw on a batch of one, without its numpy overhead
+        """
+        for row, defaults in zip(self.rows, self.defaults.tolist()):
+            state[row][:len(defaults)] = defaults
+        context = Context(1, lambda owner, field: state[_ROWS[owner]][FIELDS[field]])
+        for row, column, variable, _, evaluate in self.assignments:
+            value = evaluate(context)
+            if row is None:
+                context.variables[variable] = value
+            else:
+                state[row][column] = value
+
+        play_yaw = context.variables.get(PLAY_YAW)
+        if self.mirror_x and np.random.random() < self.mirror_x:
+            for row in self.rows:
+                values = state[row]
+                for column in _MIRROR_X_COLUMNS:
+                    values[column] = -values[column]
+                values[YAW] += np.pi
+            if play_yaw is not None:
+                play_yaw = -play_yaw + np.pi
+        return play_yaw
+
+
+def compile_mode(spec: ModeSpec, key=None) -> CompiledMode:
+    """Check every expression of a spec and compile it, raising ValueError on the first mistake"""
+    owned = OBJECTS[spec.role]
+    readable = {owner: set(FIELDS) for owner in ANCHORS[spec.role]}
+    readable.update({owner: set() for owner in owned})
+    variables = []
+    assignments = []
+    for target, source in spec.setup.items():
+        try:
+            evaluate = compile_expression(str(source), variables, readable)
+            evaluate_one = compile_expression(str(source), variables, readable, scalar=True)
+        except ExpressionError as e:
+            raise ValueError(f"{spec.name}: {target}: {e}") from None
+        owner, _, field = target.partition(".")
+        if not field:
+            if target in readable or not target.isidentifier():
+                raise ValueError(f"{spec.name}: '{target}' is not a valid variable name")
+            variables.append(target)
+            assignments.append((None, 0, target, evaluate, evaluate_one))
+        elif owner not in owned or field not in FIELDS:
+            raise ValueError(f"{spec.name}: '{target}' can't be set by a {spec.role.name.lower()} setup")
+        else:
+            readable[owner].add(field)
+            assignments.append((owned[owner], FIELDS[field], target, evaluate, evaluate_one))
+
+    names = spec.constraints if spec.constraints is not None else DEFAULT_CONSTRAINTS[spec.role]
+    unknown = [name for name in names if name not in constraints.BY_NAME]
+    if unknown:
+        raise ValueError(f"{spec.name}: unknown constraints {unknown}, expected some of {list(constraints.BY_NAME)}")
+
+    rows = tuple(sorted(owned.values()))
+    defaults = np.array([_BALL_DEFAULTS if row == BALL_ROW else _CAR_DEFAULTS for row in rows])
+    compiled = CompiledMode(
+        name=spec.name,
+        role=spec.role,
+        key=key,
+        constraints=tuple(constraints.BY_NAME[name] for name in names),
+        mirror_x=spec.mirror_x,
+        rows=rows,
+        defaults=defaults,
+        assignments=tuple(assignments),
+        spec=spec,
+    )
+    if key is None:
+        compiled.key = compiled
+    return compiled
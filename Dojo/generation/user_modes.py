@@ -0,0 +1,56 @@
+"""
+User-defined setups, loaded from ModeSpec JSON files.
+
+Every .json file in %APPDATA%/RLBot/Dojo/Modes holds one spec, see spec.py for
+the format. A file that doesn't parse or compile is skipped with a message, so
+one typo doesn't take the others down.
+"""
+
+import os
+from typing import Dict, Optional
+
+from pydantic import ValidationError
+
+from .spec import ModeSpec, CompiledMode, compile_mode
+
+_user_modes: Optional[Dict[str, CompiledMode]] = None
+
+
+def get_user_modes(reload: bool = False) -> Dict[str, CompiledMode]:
+    """Compiled user setups by name, loaded from disk on first use"""
+    global _user_modes
+    if _user_modes is None or reload:
+        _user_modes = {}
+        modes_path = _get_modes_path()
+        for file_name in sorted(os.listdir(modes_path)):
+            if not file_name.endswith(".json"):
+                continue
+            mode = load_mode_file(os.path.join(modes_path, file_name))
+            if mode is not None:
+                _user_modes[mode.name] = mode
+    return _user_modes
+
+
+def load_mode_file(file_path: str) -> Optional[CompiledMode]:
+    """Load and compile one spec file, or print why it can't be used and return None"""
+    try:
+        with open(file_path, "r") as f:
+            return compile_mode(ModeSpec.model_validate_json(f.read()))
+    except (OSError, ValidationError, ValueError) as e:
+        print(f"Skipping mode file {os.path.basename(file_path)}: {e}")
+        return None
+
+
+def store_mode(spec: ModeSpec):
+    """Write a spec to the modes folder, after checking that it compiles"""
+    mode = compile_mode(spec)
+    with open(os.path.join(_get_modes_path(), f"{spec.name}.json"), "w") as f:
+        f.write(spec.model_dump_json(indent=4))
+    get_user_modes()[spec.name] = mode
+
+
+def _get_modes_path():
+    appdata_path = os.path.expandvars("%APPDATA%")
+    if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "Modes")):
+        os.makedirs(os.path.join(appdata_path, "RLBot", "Dojo", "Modes"))
+    return os.path.join(appdata_path, "RLBot", "Dojo", "Modes")
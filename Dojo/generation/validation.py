@@ -0,0 +1,333 @@
+"""
+Validity fuzzing of scenario generation.
+
+Every offensive and defensive mode pair is generated for both player roles,
+along with every preset entry of every registered playlist, with the
+playlist's boost range. Batches are spread over a process pool. Saved custom
+scenarios are checked as they are. Each scenario is checked for:
+
+- unset values: a location, velocity or car yaw left NaN
+- out of bounds: an object outside the arena, or below the floor or above the ceiling
+- overlapping: cars or the ball spawning inside each other
+- ball in goal, car in goal: past a goal line, except defenders in their own net
+- ball heading into net, ball into wall: ScenarioMode rerolls these, see MIN_GOAL_TIME and MIN_WALL_TIME
+- unfair: the defense gets to the ball well before the offense, also rerolled
+
+The report counts each violation per batch, times generation per mode and
+keeps spawn location histograms of every object, and of the ball in invalid
+scenarios. Save it with --output. To check a generator change for
+regressions, compare against a saved report with --baseline. Any violation
+rate that grows beyond the tolerance fails the run.
+
+Usage, from the Dojo folder:
+    python -m generation.validation --count 100000 --output validity.json
+    python -m generation.validation --count 100000 --baseline validity.json
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+import collision
+import utils
+from constants import (SIDE_WALL, BACK_WALL, BALL_RADIUS, CEILING_HEIGHT, GOAL_DEPTH, MIN_GOAL_TIME, MIN_WALL_TIME,
+                       MAX_DEFENSE_LEAD, TICK_RATE)
+from playlist import PlaylistRegistry, PlayerRole
+from scenario import (Scenario, OffensiveMode, DefensiveMode, CarRole, support_roles, BALL_ROW, OFFENSE_ROW,
+                      DEFENSE_ROW, LOCATION, VELOCITY, X, Y, Z, YAW, MIRROR_Y_COLUMNS)
+from simulator import simulate_balls, times_to_ball_from_states, unfair, DEFAULT_DURATION
+from .generator import generate_states
+
+VIOLATIONS = ("unset values", "out of bounds", "overlapping", "ball in goal", "car in goal",
+              "ball heading into net", "ball into wall", "unfair")
+# Scenarios are generated and checked this many at a time, to bound the memory of a batch
+CHUNK_SIZE = 20000
+# Location histograms cover the arena and both goals
+HISTOGRAM_BINS = (32, 48)
+HISTOGRAM_RANGE = ((-SIDE_WALL, SIDE_WALL), (BACK_WALL - GOAL_DEPTH, -BACK_WALL + GOAL_DEPTH))
+HISTOGRAMS = ("ball", "offense", "defense", "invalid ball")
+# A violation rate may grow this much over the baseline before it counts as a regression
+REGRESSION_TOLERANCE = 0.002
+_SHADES = " .:-=+*#%@"
+
+
+class BatchResult(BaseModel):
+    """Violations found in the scenarios of one mode pair, role and boost range"""
+    label: str
+    offensive_mode: Optional[str] = None
+    defensive_mode: Optional[str] = None
+    role: Optional[str] = None
+    scenarios: int = 0
+    invalid: int = 0
+    violations: Dict[str, int] = Field(default_factory=dict)
+    generation_seconds: float = 0.0
+
+    def rate(self, violation: str) -> float:
+        return self.violations.get(violation, 0) / self.scenarios if self.scenarios else 0.0
+
+
+class ValidityReport(BaseModel):
+    """Violation counts of every batch, with spawn histograms in the default perspective"""
+    batches: List[BatchResult] = Field(default_factory=list)
+    histograms: Dict[str, List[List[int]]] = Field(default_factory=dict)
+
+    def totals(self) -> BatchResult:
+        total = BatchResult(label="all")
+        for batch in self.batches:
+            total.scenarios += batch.scenarios
+            total.invalid += batch.invalid
+            total.generation_seconds += batch.generation_seconds
+            for violation, count in batch.violations.items():
+                total.violations[violation] = total.violations.get(violation, 0) + count
+        return total
+
+
+def find_violations(states, roles, attack_sign) -> Dict[str, np.ndarray]:
+    """
+    Check stacked (N, rows, 13) scenario arrays, returning a mask of the offending scenarios for every violation
+    roles are the CarRole values of the car rows, attack_sign the sign of y of the goal each offense attacks
+    """
+    ball = states[:, BALL_ROW]
+    cars = states[:, OFFENSE_ROW:]
+    is_defense = np.asarray(roles) == CarRole.DEFENSE.value
+    violations = {}
+
+    with np.errstate(invalid="ignore"):
+        unset = np.isnan(states[:, :, LOCATION]).any(axis=(1, 2)) | np.isnan(states[:, :, VELOCITY]).any(axis=(1, 2))
+        violations["unset values"] = unset | np.isnan(cars[..., YAW]).any(axis=1)
+
+        ball_out = (~utils.in_field(ball[:, X], ball[:, Y], BALL_RADIUS, allow_goal=True)
+                    | (ball[:, Z] < BALL_RADIUS - 1) | (ball[:, Z] > CEILING_HEIGHT - BALL_RADIUS))
+        cars_out = ~utils.in_field(cars[..., X], cars[..., Y], allow_goal=True) | (cars[..., Z] < 0) | (cars[..., Z] > CEILING_HEIGHT)
+        violations["out of bounds"] = ball_out | cars_out.any(axis=1)
+
+        violations["overlapping"] = collision.find_overlaps(ball[:, LOCATION].copy(), cars[..., LOCATION].copy(), cars[..., YAW])
+
+        violations["ball in goal"] = np.abs(ball[:, Y]) > -BACK_WALL
+        # Defenders may start in the net they defend
+        in_goal = np.abs(cars[..., Y]) > -BACK_WALL
+        own_net = is_defense & (np.sign(cars[..., Y]) == attack_sign[:, np.newaxis])
+        violations["car in goal"] = (in_goal & ~own_net).any(axis=1)
+
+    # As long as ScenarioMode predicts, so a wall bounce it lets through for being unfair is let through here too
+    prediction = simulate_balls(ball[:, LOCATION], ball[:, VELOCITY], duration=DEFAULT_DURATION,
+                                sample_every=int(DEFAULT_DURATION * TICK_RATE))
+    with np.errstate(invalid="ignore"):
+        violations["ball heading into net"] = prediction.goal_time < MIN_GOAL_TIME
+        violations["ball into wall"] = prediction.wall_time < MIN_WALL_TIME
+    times = times_to_ball_from_states(states[:, :DEFENSE_ROW + 1])
+    violations["unfair"] = unfair(times, prediction.wall_time, MAX_DEFENSE_LEAD)
+    return violations
+
+
+def validate_states(label, states, roles, attack_sign, generation_seconds=0.0, histograms=None, **fields) -> BatchResult:
+    """Check a batch of scenarios, adding their locations to histograms when given"""
+    violations = find_violations(states, roles, attack_sign)
+    invalid = np.logical_or.reduce(list(violations.values()))
+    if histograms is not None:
+        # Back to the default perspective, with the offense attacking negative y
+        flip = -attack_sign[:, np.newaxis]
+        _add_histogram(histograms, "ball", states[:, BALL_ROW, X], states[:, BALL_ROW, Y] * flip[:, 0])
+        _add_histogram(histograms, "offense", states[:, OFFENSE_ROW, X], states[:, OFFENSE_ROW, Y] * flip[:, 0])
+        _add_histogram(histograms, "defense", states[:, DEFENSE_ROW, X], states[:, DEFENSE_ROW, Y] * flip[:, 0])
+        _add_histogram(histograms, "invalid ball", states[invalid, BALL_ROW, X], states[invalid, BALL_ROW, Y] * flip[invalid, 0])
+    return BatchResult(label=label, scenarios=len(states), invalid=int(np.count_nonzero(invalid)),
+                       violations={name: int(np.count_nonzero(mask)) for name, mask in violations.items()},
+                       generation_seconds=generation_seconds, **fields)
+
+
+def _add_histogram(histograms, name, x, y):
+    finite = np.isfinite(x) & np.isfinite(y)
+    counts, _, _ = np.histogram2d(x[finite], y[finite], bins=HISTOGRAM_BINS, range=HISTOGRAM_RANGE)
+    histograms[name] = histograms.get(name, 0) + counts.astype(np.int64)
+
+
+def _validate_batch(task) -> Tuple[BatchResult, Dict[str, np.ndarray]]:
+    """Pool worker: generate and check one mode pair for one role, in chunks"""
+    label, offensive_mode, defensive_mode, role, boost_range, cars, count, seed = task
+    np.random.seed(seed)
+    roles = [CarRole.OFFENSE.value, CarRole.DEFENSE.value, *support_roles(cars, cars)]
+    histograms = {}
+    result = BatchResult(label=label, offensive_mode=offensive_mode.name, defensive_mode=defensive_mode.name, role=role.name)
+    for start in range(0, count, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, count - start)
+        generation_start = time.perf_counter()
+        states, _ = generate_states(offensive_mode, defensive_mode, size, boost_range, cars, cars)
+        generation_seconds = time.perf_counter() - generation_start
+        # The player's side is always the one defending negative y, so offense players get the whole field flipped
+        attack_sign = np.full(size, -1.0)
+        if role == PlayerRole.OFFENSE:
+            states[:, :, MIRROR_Y_COLUMNS] *= -1
+            attack_sign[:] = 1.0
+        chunk = validate_states(label, states, roles, attack_sign, generation_seconds, histograms)
+        result.scenarios += chunk.scenarios
+        result.invalid += chunk.invalid
+        result.generation_seconds += chunk.generation_seconds
+        for violation, found in chunk.violations.items():
+            result.violations[violation] = result.violations.get(violation, 0) + found
+    return result, histograms
+
+
+def _custom_scenario_states(registry: PlaylistRegistry):
+    """
+    Saved custom scenarios by name, as scenario arrays with their roles and attack sign
+    Playlists refer to the library, loading the registry moved any scenario they held into it
+    """
+    from custom_scenario import get_custom_scenarios
+    checked = []
+    for name, custom_scenario in sorted(get_custom_scenarios().items()):
+        # Unrepaired, so objects the scenario saved outside the arena count as out of bounds
+        scenario = Scenario.FromGameState(custom_scenario.to_rlbot_game_state(), sanity_check=False)
+        checked.append((name, scenario.ToArray(np.float64)[np.newaxis], scenario.roles.tolist(),
+                        np.array([-1.0 if scenario.offensive_team == 0 else 1.0])))
+    return checked
+
+
+def _build_tasks(registry: PlaylistRegistry, count: int, team_sizes: List[int], base_seed: int):
+    tasks = []
+    for cars in team_sizes:
+        suffix = f" {cars}v{cars}" if len(team_sizes) > 1 else ""
+        for offensive_mode in OffensiveMode:
+            for defensive_mode in DefensiveMode:
+                for role in PlayerRole:
+                    tasks.append((f"modes{suffix}", offensive_mode, defensive_mode, role, None, cars, count))
+        for name in registry.list_playlists():
+            playlist = registry.get_playlist(name)
+            for config in playlist.scenarios or []:
+                tasks.append((f"{name}{suffix}", config.offensive_mode, config.defensive_mode, config.player_role,
+                              playlist.settings.boost_range, cars, count))
+    # Every batch gets its own seed, so a run can be reproduced
+    return [task + (base_seed + index,) for index, task in enumerate(tasks)]
+
+
+def validate_generation(count: int = 10000, team_sizes=(1,), base_seed: int = 0, processes: Optional[int] = None,
+                        registry: Optional[PlaylistRegistry] = None) -> ValidityReport:
+    """Generate and check count scenarios of every mode pair, role and playlist entry, plus every custom scenario"""
+    if registry is None:
+        registry = _load_registry()
+    tasks = _build_tasks(registry, count, list(team_sizes), base_seed)
+    report = ValidityReport()
+    histograms = {}
+    print(f"Checking {len(tasks)} batches of {count} scenarios")
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for result, batch_histograms in pool.map(_validate_batch, tasks):
+            report.batches.append(result)
+            for name, counts in batch_histograms.items():
+                histograms[name] = histograms.get(name, 0) + counts
+
+    for name, states, roles, attack_sign in _custom_scenario_states(registry):
+        report.batches.append(validate_states(f"custom: {name}", states, roles, attack_sign))
+    report.histograms = {name: histograms[name].tolist() for name in HISTOGRAMS if name in histograms}
+    return report
+
+
+def find_regressions(report: ValidityReport, baseline: ValidityReport, tolerance: float = REGRESSION_TOLERANCE) -> List[str]:
+    """Describe every batch whose violation rate grew more than tolerance over the same batch of the baseline"""
+    baseline_batches = {_batch_key(batch): batch for batch in baseline.batches}
+    regressions = []
+    for batch in report.batches:
+        previous = baseline_batches.get(_batch_key(batch))
+        if previous is None:
+            continue
+        for violation in VIOLATIONS:
+            if batch.rate(violation) > previous.rate(violation) + tolerance:
+                regressions.append(f"{_describe(batch)}: {violation} {previous.rate(violation):.2%} -> {batch.rate(violation):.2%}")
+    return regressions
+
+
+def _batch_key(batch: BatchResult):
+    return batch.label, batch.offensive_mode, batch.defensive_mode, batch.role
+
+
+def _describe(batch: BatchResult) -> str:
+    if batch.offensive_mode is None:
+        return batch.label
+    return f"{batch.label}: {batch.offensive_mode} vs {batch.defensive_mode} ({batch.role.lower()})"
+
+
+def format_report(report: ValidityReport, worst: int = 20, maps: bool = False) -> str:
+    """Summarize a report: totals, the worst batches, generation time per mode and optionally the spawn maps"""
+    total = report.totals()
+    lines = [f"{total.scenarios} scenarios, {total.invalid} with a violation ({total.invalid / max(total.scenarios, 1):.3%})"]
+    lines.extend(f"  {violation:<22} {total.violations.get(violation, 0):>10}  {total.rate(violation):8.3%}" for violation in VIOLATIONS)
+
+    failing = sorted((batch for batch in report.batches if batch.invalid),
+                     key=lambda batch: -batch.invalid / batch.scenarios)
+    if failing:
+        lines.append(f"Worst batches ({len(failing)} with violations):")
+        for batch in failing[:worst]:
+            found = ", ".join(f"{violation} {batch.rate(violation):.2%}" for violation in VIOLATIONS if batch.violations.get(violation))
+            lines.append(f"  {_describe(batch)}: {found}")
+
+    lines.append("Generation time per scenario:")
+    for field, modes in (("offensive_mode", OffensiveMode), ("defensive_mode", DefensiveMode)):
+        for mode in modes:
+            batches = [batch for batch in report.batches if getattr(batch, field) == mode.name]
+            scenarios = sum(batch.scenarios for batch in batches)
+            if scenarios:
+                seconds = sum(batch.generation_seconds for batch in batches)
+                lines.append(f"  {type(mode).__name__}.{mode.name:<22} {seconds / scenarios * 1e6:7.2f}us")
+
+    if maps:
+        for name, counts in report.histograms.items():
+            lines.append(f"{name} spawns, offense attacking down:")
+            lines.extend(render_histogram(np.array(counts)))
+    return "\n".join(lines)
+
+
+def render_histogram(counts: np.ndarray) -> List[str]:
+    """Draw a location histogram as text, one character per bin, with positive y at the top"""
+    if not counts.any():
+        return ["  (empty)"]
+    # Square root shading, so sparse areas still show up next to dense ones
+    levels = np.sqrt(counts / counts.max())
+    shades = np.minimum((levels * len(_SHADES)).astype(int), len(_SHADES) - 1)
+    shades[counts > 0] = np.maximum(shades[counts > 0], 1)
+    return ["  |" + "".join(_SHADES[shade] for shade in shades[:, row]) + "|" for row in range(counts.shape[1] - 1, -1, -1)]
+
+
+def _load_registry() -> PlaylistRegistry:
+    from custom_playlist import CustomPlaylistManager
+    registry = PlaylistRegistry()
+    registry.set_custom_playlist_manager(CustomPlaylistManager(renderer=None, main_menu_renderer=None))
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check generated scenarios of every mode, playlist and custom scenario for violations")
+    parser.add_argument("--count", type=int, default=10000, help="Scenarios generated per mode pair, role and playlist entry")
+    parser.add_argument("--cars", type=int, nargs="+", default=[1], help="Team sizes to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first batch")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--worst", type=int, default=20, help="Batches listed with their violations")
+    parser.add_argument("--maps", action="store_true", help="Print the spawn location histograms")
+    parser.add_argument("--output", default=None, help="Save the report as JSON")
+    parser.add_argument("--baseline", default=None, help="Saved report to compare against, fails on regressions")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = validate_generation(args.count, args.cars, args.seed, args.processes)
+    print(format_report(report, args.worst, args.maps))
+    print(f"Checked in {time.perf_counter() - start:.1f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report.model_dump_json())
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = ValidityReport.model_validate_json(f.read())
+        regressions = find_regressions(report, baseline)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
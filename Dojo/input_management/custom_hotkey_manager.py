@@ -13,6 +13,8 @@ class HotkeyAction(Enum):
     RESET_SHOT = "Reset shot"
     TOGGLE_TIMEOUT = "Toggle timeout"
     TOGGLE_FREEZE_SCENARIO = "Toggle freeze scenario"
+    REWIND = "Rewind"
+    CAPTURE_SCENARIO = "Capture scenario"
 
 
 class HotkeyConfig(BaseModel):
@@ -47,7 +47,8 @@ class UIElement():
         
 class MenuRenderer():
     def __init__(self, renderer, columns=1, text_input=False, 
-    text_input_callback=None, render_function=None, show_selections=False, disable_menu_render=False):
+    text_input_callback=None, render_function=None, show_selections=False, disable_menu_render=False,
+    text_input_change_callback=None, text_input_prompt="Enter a name:"):
         self.renderer = renderer
         # Each column has its own list of elements
         self.elements = [[] for _ in range(columns)]
@@ -59,82 +60,200 @@ class MenuRenderer():
         self.is_text_input_menu = text_input
         self.text_input_value = ""
         self.text_input_callback = text_input_callback
+        # Called with the current value after every keystroke, used by filter-as-you-type menus
+        self.text_input_change_callback = text_input_change_callback
+        self.text_input_prompt = text_input_prompt
         self.show_selections = show_selections
         self.disable_menu_render = disable_menu_render
         
         # Allows for an element to be rendered outside of the menu when selected
         self.render_function = render_function
+
+        # Navigation state. Each column has an integer cursor (None until something is selected),
+        # and the menu keeps a stack of entered menus with itself at the bottom, so the deepest
+        # menu is always self._menu_stack[-1] without walking the tree.
+        self.cursor = [None for _ in range(columns)]
+        self._chosen_index = [None for _ in range(columns)]
+        self._menu_stack = [self]
+        self._entered_element = None
+        # Skip tables mapping an index to the next/previous selectable index (headers and spacers
+        # are skipped), rebuilt lazily after the elements of a column change
+        self._next_selectable = [None for _ in range(columns)]
+        self._prev_selectable = [None for _ in range(columns)]
+
+        # Retained render output. Draw commands are only rebuilt when navigation, text input
+        # or one of the visible display values changes; otherwise the cached list is replayed.
+        self._render_version = 0
+        self._rendered_version = None
+        self._rendered_display_values = None
+        self._display_value_elements = []
+        self._draw_commands = []
         
     def add_element(self, element, column=0):
         self.elements[column].append(element)
+        self._next_selectable[column] = None
+        self._prev_selectable[column] = None
+        self.invalidate()
+
+    def set_elements(self, elements, column=0):
+        """Replace all elements of a column, resetting its cursor and scroll position"""
+        self._set_cursor(column, None)
+        self.elements[column] = list(elements)
+        self.scroll_offset[column] = 0
+        self._chosen_index[column] = None
+        self._next_selectable[column] = None
+        self._prev_selectable[column] = None
+        self.invalidate()
+
+    def invalidate(self):
+        """Mark the retained render output as stale so it is rebuilt on the next frame"""
+        self._render_version += 1
+
+    def get_active_menu(self):
+        """Get the deepest entered menu, which receives all navigation and text input"""
+        return self._menu_stack[-1]
+
+    def get_selected_element(self):
+        """Get the selected element of this menu's active column, or None"""
+        index = self.cursor[self.active_column]
+        if index is None:
+            return None
+        return self.elements[self.active_column][index]
+
+    ### Skip tables
+    def _get_skip_tables(self, column):
+        if self._next_selectable[column] is None:
+            self._build_skip_tables(column)
+        return self._next_selectable[column], self._prev_selectable[column]
+
+    def _build_skip_tables(self, column):
+        """Precompute the next/previous selectable index for every index of a column, wrapping around"""
+        elements = self.elements[column]
+        selectable = [not element.header and not element.spacer for element in elements]
+        next_selectable = [None] * len(elements)
+        prev_selectable = [None] * len(elements)
+        if any(selectable):
+            upcoming = selectable.index(True)
+            for index in range(len(elements) - 1, -1, -1):
+                next_selectable[index] = upcoming
+                if selectable[index]:
+                    upcoming = index
+            previous = len(selectable) - 1 - selectable[::-1].index(True)
+            for index in range(len(elements)):
+                prev_selectable[index] = previous
+                if selectable[index]:
+                    previous = index
+        self._next_selectable[column] = next_selectable
+        self._prev_selectable[column] = prev_selectable
+
+    def _first_selectable(self, column):
+        next_selectable, _ = self._get_skip_tables(column)
+        if not next_selectable:
+            return None
+        # The entry for the last index wraps around to the first selectable index
+        return next_selectable[-1]
+
+    ### Cursor helpers
+    def _set_cursor(self, column, index):
+        previous_index = self.cursor[column]
+        if previous_index is not None and previous_index < len(self.elements[column]):
+            self.elements[column][previous_index].selected = False
+        self.cursor[column] = index
+        if index is not None:
+            self.elements[column][index].selected = True
+        self.invalidate()
+
+    def _step_cursor(self, table_index):
+        column = self.active_column
+        index = self.cursor[column]
+        if index is None:
+            self._set_cursor(column, self._first_selectable(column))
+        else:
+            self._set_cursor(column, self._get_skip_tables(column)[table_index][index])
+        self._ensure_selected_visible()
+
+    def _switch_column(self, step):
+        prev_column = self.active_column
+        prev_index = self.cursor[prev_column]
+        for _ in range(self.columns):
+            self.active_column = (self.active_column + step) % self.columns
+            if self._first_selectable(self.active_column) is not None:
+                break
+
+        if self.active_column == prev_column:
+            return
+
+        # Keep the cursor on the same row, clamped to the new column and snapped to a selectable element
+        self._set_cursor(prev_column, None)
+        column_length = len(self.elements[self.active_column])
+        index = min(prev_index if prev_index is not None else 0, column_length - 1)
+        element = self.elements[self.active_column][index]
+        if element.header or element.spacer:
+            index = self._get_skip_tables(self.active_column)[0][index]
+        self._set_cursor(self.active_column, index)
+        self._ensure_selected_visible()
+
+    def _choose(self, index):
+        """Mark an element as chosen, unchoosing the previously chosen element in the column"""
+        column = self.active_column
+        previous_index = self._chosen_index[column]
+        if previous_index is not None and previous_index != index:
+            self.elements[column][previous_index].chosen = False
+        self.elements[column][index].chosen = True
+        self._chosen_index[column] = index
+
+    def _clear_chosen(self):
+        for column in range(self.columns):
+            index = self._chosen_index[column]
+            if index is not None:
+                self.elements[column][index].chosen = False
+                self._chosen_index[column] = None
         
+    ### Text input
     def handle_text_input(self, key):
-        if self.is_text_input_menu:
-            self.text_input_value += key
-        else:
-            for element in self.elements[self.active_column]:
-                if element.entered:
-                    element.submenu.handle_text_input(key)
+        menu = self.get_active_menu()
+        if menu.is_text_input_menu:
+            menu.text_input_value += key
+            menu._text_input_changed()
                     
     def handle_text_backspace(self):
-        if self.is_text_input_menu:
-            if len(self.text_input_value) > 0:
-                self.text_input_value = self.text_input_value[:-1]
-        else:
-            for element in self.elements[self.active_column]:
-                if element.entered:
-                    element.submenu.handle_text_backspace()
+        menu = self.get_active_menu()
+        if menu.is_text_input_menu and len(menu.text_input_value) > 0:
+            menu.text_input_value = menu.text_input_value[:-1]
+            menu._text_input_changed()
+
+    def _text_input_changed(self):
+        if self.text_input_change_callback:
+            self.text_input_change_callback(self.text_input_value)
+        self.invalidate()
     
     def complete_text_input(self):
-        print("entering complete text input: ", self.is_text_input_menu)
-        if self.is_text_input_menu:
-            print("completing text input: ", self.text_input_value)
-            if self.text_input_callback:
-                self.text_input_callback(self.text_input_value)
-            self.text_input_value = ""
-            self.is_text_input_menu = False
-            self.text_input_callback = None
-        else:
-            for element in self.elements[self.active_column]:
-                if element.entered:
-                    element.submenu.complete_text_input()
-    
-    def _back_deepest_entered_element(self):
-        has_entered_element = False
-        for column in range(self.columns):
-            for element in self.elements[column]:
-                if element.entered:
-                    has_entered_element = True
-                    deepest_element = element.submenu._back_deepest_entered_element()
-                    if deepest_element:
-                        # Unchoose all of the element's submenu's elements, for all columns
-                        for column in range(element.submenu.columns):
-                            for submenu_element in element.submenu.elements[column]:
-                                submenu_element.chosen = False
-                        element.back()
-                        return False
-        if not has_entered_element:
-            return True
-        return False
+        menu = self.get_active_menu()
+        print("entering complete text input: ", menu.is_text_input_menu)
+        if menu.is_text_input_menu:
+            print("completing text input: ", menu.text_input_value)
+            if menu.text_input_callback:
+                menu.text_input_callback(menu.text_input_value)
+            menu.text_input_value = ""
+            menu.is_text_input_menu = False
+            menu.text_input_callback = None
+            menu.invalidate()
 
     def _get_max_visible_elements(self):
         """Calculate maximum number of elements that can fit in the menu"""
         MENU_HEIGHT = 500
         available_height = MENU_HEIGHT - 20  # Account for padding
-        return available_height // units_y_per_line
+        return available_height // units_y_per_line - self._get_list_start_row()
+
+    def _get_list_start_row(self):
+        """Text input menus show the prompt and current input above the list"""
+        return 2 if self.is_text_input_menu else 0
 
     def _ensure_selected_visible(self):
         """Ensure the selected element is visible by adjusting scroll offset"""
         max_visible = self._get_max_visible_elements()
-        
-        # Find selected element index
-        selected_index = -1
-        for index, element in enumerate(self.elements[self.active_column]):
-            if element.selected:
-                selected_index = index
-                break
-        
-        if selected_index == -1:
+        selected_index = self.cursor[self.active_column]
+        if selected_index is None:
             return
         
         # Adjust scroll offset to keep selected element visible
@@ -145,165 +264,107 @@ class MenuRenderer():
             # Selected element is below visible area
             self.scroll_offset[self.active_column] = selected_index - max_visible + 1
 
+    ### Navigation, always applied to the deepest entered menu
     def select_next_element(self):
-        # If an element is currently entered, call its select_next_element function
-        for element in self.elements[self.active_column]:
-            if element.entered:
-                element.submenu.select_next_element()
-                return
-        for index, element in enumerate(self.elements[self.active_column]):
-            if element.selected:
-                element.selected = False
-                if index < len(self.elements[self.active_column]) - 1:
-                    self.elements[self.active_column][index + 1].selected = True
-                else:
-                    if not self.elements[self.active_column][0].header:
-                        self.elements[self.active_column][0].selected = True
-                    else:
-                        self.elements[self.active_column][1].selected = True
-                break
-        self._ensure_selected_visible()
+        self.get_active_menu()._step_cursor(0)
 
     def select_last_element(self):
-        # If an element is currently entered, call its select_last_element function
-        for element in self.elements[self.active_column]:
-            if element.entered:
-                element.submenu.select_last_element()
-                return
-        for index, element in enumerate(self.elements[self.active_column]):
-            if element.selected:
-                element.selected = False
-                if index > 0:
-                    if not self.elements[self.active_column][index - 1].header:
-                        self.elements[self.active_column][index - 1].selected = True
-                    else:
-                        if index == 1:
-                            self.elements[self.active_column][len(self.elements[self.active_column]) - 1].selected = True
-                        else:
-                            self.elements[self.active_column][index - 2].selected = True
-                else:
-                    self.elements[self.active_column][len(self.elements[self.active_column]) - 1].selected = True
-                break
-        self._ensure_selected_visible()
+        self.get_active_menu()._step_cursor(1)
 
     def move_to_next_column(self):
-        print("move_to_next_column")
-        for column in range(self.columns):
-            for element in self.elements[column]:
-                if element.entered:
-                    element.submenu.move_to_next_column()
-                    return
-        prev_column = self.active_column
-        self.active_column += 1
-        if self.active_column >= self.columns:
-            self.active_column = 0
-
-        # Update selected element
-        for index, element in enumerate(self.elements[prev_column]):
-            if element.selected:
-                if index < len(self.elements[self.active_column]):
-                    self.elements[self.active_column][index].selected = True
-                else:
-                    self.elements[self.active_column][len(self.elements[self.active_column]) - 1].selected = True
-                element.selected = False
-                break
-        print(self.active_column)
+        self.get_active_menu()._switch_column(1)
 
     def move_to_prev_column(self):
-        for column in range(self.columns):
-            for element in self.elements[column]:
-                if element.entered:
-                    element.submenu.move_to_prev_column()
-                    return
-        prev_column = self.active_column
-        self.active_column -= 1
-        if self.active_column < 0:
-            self.active_column = self.columns - 1
-
-        # Update selected element
-        for index, element in enumerate(self.elements[prev_column]):
-            if element.selected:
-                if index < len(self.elements[self.active_column]):
-                    self.elements[self.active_column][index].selected = True
-                else:
-                    self.elements[self.active_column][len(self.elements[self.active_column]) - 1].selected = True
-                element.selected = False
-                break
+        self.get_active_menu()._switch_column(-1)
 
     def enter_element(self):
-        # If an element is currently entered, call its enter_element function
-        for element in self.elements[self.active_column]:
-            if element.entered:
-                element.submenu.enter_element()
-                return
-        for element in self.elements[self.active_column]:
-            if element.selected:
-                if element.function:
-                    if element.function_args:
-                        element.function(*element.function_args)
-                    else:
-                        element.function()
-                if element.submenu:
-                    print("entering submenu: ", element.submenu)
-                    element.enter()
-                elif element.chooseable:
-                    element.chosen = True
-                    # Unchoose all other elements in the column
-                    for other_element in self.elements[self.active_column]:
-                        if other_element != element:
-                            other_element.chosen = False
-                break
+        menu = self.get_active_menu()
+        element = menu.get_selected_element()
+        if element is None:
+            return
+        if element.function:
+            if element.function_args:
+                element.function(*element.function_args)
+            else:
+                element.function()
+        if element.submenu:
+            print("entering submenu: ", element.submenu)
+            element.enter()
+            menu._entered_element = element
+            self._menu_stack.append(element.submenu)
+        elif element.chooseable:
+            menu._choose(menu.cursor[menu.active_column])
+        menu.invalidate()
 
     def handle_back_key(self):
         """Handle the 'b' key press to go back in menus"""
-        self._back_deepest_entered_element()
+        if len(self._menu_stack) <= 1:
+            return
+        menu = self._menu_stack.pop()
+        # Unchoose all of the submenu's elements, for all columns
+        menu._clear_chosen()
+        menu.invalidate()
+        parent = self._menu_stack[-1]
+        if parent._entered_element is not None:
+            parent._entered_element.back()
+            parent._entered_element = None
+        parent.invalidate()
         
     def is_in_text_input_mode(self):
-        if self.is_text_input_menu:
-            return True
-        for column in range(self.columns):
-            for element in self.elements[column]:
-                if element.entered:
-                    return element.submenu.is_in_text_input_mode()
-        return False
+        return self.get_active_menu().is_text_input_menu
     
     def render_text_input_menu(self, callback):
-        # Set current entered menu as a text input menu, recursively finding the deepest entered menu
-        for column in range(self.columns):
-            for element in self.elements[column]:
-                if element.entered:
-                    element.submenu.render_text_input_menu(callback)
-                    return
-        self.text_input_callback = callback
-        self.is_text_input_menu = True
-        return
+        # Set current entered menu as a text input menu
+        menu = self.get_active_menu()
+        menu.text_input_callback = callback
+        menu.is_text_input_menu = True
+        menu.invalidate()
 
     def render_menu(self):
-        # If no elements are selected the first time we render the menu, select the first non-header element
-        if not any(element.selected for element in self.elements[self.active_column]):
-            for element in self.elements[self.active_column]:
-                if not element.header:
-                    element.selected = True
-                    break
-
-        # First, check if any submenu is entered
-        for element in self.elements[self.active_column]:
-            if element.entered:
-                element.submenu.render_menu()
-                return
-
-        # If selected element is a spacer, move to the next element
-        for element in self.elements[self.active_column]:
-            if element.selected:
-                if element.spacer:
-                    self.select_next_element()
-                    return
-                else:
-                    break
-        
+        # The deepest entered menu is the one on screen
+        menu = self.get_active_menu()
+        if menu is not self:
+            menu.render_menu()
+            return
+
+        # If menu renderer is disabled, only render the external function
+        if self.disable_menu_render and self.render_function and not self.is_text_input_menu:
+            self.render_function()
+            return
+
+        # Only rebuild the draw commands if something visible has changed
+        display_values = tuple(element.get_display_value() for element in self._display_value_elements)
+        if self._rendered_version != self._render_version or self._rendered_display_values != display_values:
+            self._prepare_for_render()
+            self._draw_commands = self._build_draw_commands()
+            self._rendered_version = self._render_version
+            display_values = tuple(element.get_display_value() for element in self._display_value_elements)
+            self._rendered_display_values = display_values
+
+        self.renderer.begin_rendering()
+        # If this menu has an external render function, call it in addition to the normal rendering
+        if self.render_function and not self.is_text_input_menu:
+            self.render_function()
+        for draw_function, args in self._draw_commands:
+            draw_function(*args)
+        self.renderer.end_rendering()
+
+    def _prepare_for_render(self):
+        """Normalize selection state after a change, before the draw commands are rebuilt"""
+        # If no elements are selected the first time we render the menu, select the first selectable element
+        if self.cursor[self.active_column] is None:
+            first_index = self._first_selectable(self.active_column)
+            if first_index is not None:
+                self._set_cursor(self.active_column, first_index)
+
         # Ensure selected element is visible
         self._ensure_selected_visible()
 
+    def _build_draw_commands(self):
+        """Build the list of draw calls for the visible part of the menu"""
+        commands = []
+        self._display_value_elements = []
+
         # Draw a rectangle around the menu
         MENU_START_X = 20
         MENU_START_Y = 400
@@ -311,27 +372,31 @@ class MenuRenderer():
         MENU_HEIGHT = 500
         COLUMN_WIDTH = MENU_WIDTH / self.columns
         max_visible_elements = self._get_max_visible_elements()
-        
-        # If menu renderer is disabled, only render the external function
-        if self.disable_menu_render and self.render_function and not self.is_text_input_menu:
-            self.render_function()
-            return
-        
-        self.renderer.begin_rendering()
-        self.renderer.draw_rect_2d(MENU_START_X, MENU_START_Y, MENU_WIDTH, MENU_HEIGHT, False, self.renderer.black())
-        print_x = MENU_START_X + 10
-        print_y = MENU_START_Y + 10
-        text_color = self.renderer.white()
-
-        # Render the list of options, if this menu isn't a text input
-        if not self.is_text_input_menu:
-            # If this menu has an external render function, call it in addition to the normal rendering
-            if self.render_function:
-                self.render_function()
-                
+
+        white = self.renderer.white()
+        black = self.renderer.black()
+        blue = self.renderer.blue()
+        draw_rect_2d = self.renderer.draw_rect_2d
+        draw_string_2d = self.renderer.draw_string_2d
+
+        commands.append((draw_rect_2d, (MENU_START_X, MENU_START_Y, MENU_WIDTH, MENU_HEIGHT, False, black)))
+
+        if self.is_text_input_menu:
+            # Prompt user to enter a name for the entity
+            commands.append((draw_string_2d, (MENU_START_X + 10, MENU_START_Y + 10, 1, 1, self.text_input_prompt, white)))
+            
+            # Display user's current input
+            commands.append((draw_string_2d, (MENU_START_X + 10, MENU_START_Y + 30, 1, 1, self.text_input_value, white)))
+            
+            # Show a cursor
+            commands.append((draw_rect_2d, (MENU_START_X + 10 + len(self.text_input_value) * units_x_per_char, MENU_START_Y + 30, 2, units_y_per_line, False, white)))
+
+        # Render the list of options, if this menu isn't a plain text input. Filter menus show their results below the input.
+        if not self.is_text_input_menu or self.text_input_change_callback:
+            list_start_y = MENU_START_Y + 10 + self._get_list_start_row() * units_y_per_line
             for column in range(self.columns):
                 print_x = MENU_START_X + COLUMN_WIDTH * column + 10
-                print_y = MENU_START_Y + 10
+                print_y = list_start_y
                 
                 # Calculate which elements to show based on scroll offset
                 start_index = self.scroll_offset[column]
@@ -340,6 +405,8 @@ class MenuRenderer():
                 # Render only visible elements
                 for i in range(start_index, end_index):
                     element = self.elements[column][i]
+                    if element.display_value_function:
+                        self._display_value_elements.append(element)
                     
                     display_value = element.get_display_value()
                     
@@ -352,18 +419,18 @@ class MenuRenderer():
                     
                     # If header, draw a smaller rectangle
                     if element.header:
-                        self.renderer.draw_rect_2d(print_x, print_y - 10, len(element.text) * units_x_per_char, units_y_per_line, False, self.renderer.blue())
+                        commands.append((draw_rect_2d, (print_x, print_y - 10, len(element.text) * units_x_per_char, units_y_per_line, False, blue)))
                     # If selected, draw a rectangle around the element
                     if element.selected:
-                        self.renderer.draw_rect_2d(print_x, print_y - 10, len(text) * units_x_per_char, units_y_per_line, False, self.renderer.white())
-                        color = self.renderer.black()
+                        commands.append((draw_rect_2d, (print_x, print_y - 10, len(text) * units_x_per_char, units_y_per_line, False, white)))
+                        color = black
                     else:
-                        color = text_color
+                        color = white
                     # If header, draw text in green
                     if element.header:
-                        self.renderer.draw_string_2d(print_x + 5, print_y, 1, 1, element.text, self.renderer.white())
+                        commands.append((draw_string_2d, (print_x + 5, print_y, 1, 1, element.text, white)))
                     else:
-                        self.renderer.draw_string_2d(print_x + 5, print_y, 1, 1, text, color)
+                        commands.append((draw_string_2d, (print_x + 5, print_y, 1, 1, text, color)))
                     print_y += units_y_per_line
                 
                 # Draw scroll indicators if needed
@@ -371,27 +438,46 @@ class MenuRenderer():
                     # Draw scroll up indicator
                     if self.scroll_offset[column] > 0:
                         indicator_x = print_x + COLUMN_WIDTH - 30
-                        indicator_y = MENU_START_Y + 10
-                        self.renderer.draw_string_2d(indicator_x, indicator_y, 1, 1, "↑", self.renderer.white())
+                        indicator_y = list_start_y
+                        commands.append((draw_string_2d, (indicator_x, indicator_y, 1, 1, "↑", white)))
                     
                     # Draw scroll down indicator
                     if end_index < len(self.elements[column]):
                         indicator_x = print_x + COLUMN_WIDTH - 30
                         indicator_y = MENU_START_Y + MENU_HEIGHT - 30
-                        self.renderer.draw_string_2d(indicator_x, indicator_y, 1, 1, "↓", self.renderer.white())
-        else:
-            # Prompt user to enter a name for the entity
-            self.renderer.draw_string_2d(MENU_START_X + 10, MENU_START_Y + 10, 1, 1, "Enter a name:", self.renderer.white())
-            
-            # Display user's current input
-            self.renderer.draw_string_2d(MENU_START_X + 10, MENU_START_Y + 30, 1, 1, self.text_input_value, self.renderer.white())
-            
-            # Show a cursor
-            self.renderer.draw_rect_2d(MENU_START_X + 10 + len(self.text_input_value) * units_x_per_char, MENU_START_Y + 30, 2, units_y_per_line, False, self.renderer.white())
+                        commands.append((draw_string_2d, (indicator_x, indicator_y, 1, 1, "↓", white)))
 
         instruction_text = "Press 'b' to go back" if not self.is_root else "Press 'm' to exit menu"
         instruction_x = MENU_START_X + (MENU_WIDTH - len(instruction_text) * units_x_per_char) // 2
         instruction_y = MENU_START_Y + MENU_HEIGHT - 30
-        self.renderer.draw_string_2d(instruction_x, instruction_y, 1, 1, instruction_text, self.renderer.white())
-        
-        self.renderer.end_rendering()
+        commands.append((draw_string_2d, (instruction_x, instruction_y, 1, 1, instruction_text, white)))
+
+        return commands
+
+
+def create_filter_menu(renderer, search_function, element_function, prompt="Search:", max_results=100, render_function=None):
+    """
+    Create a filter-as-you-type menu on top of the text input plumbing.
+    Every keystroke replaces the listed elements with element_function(key) for each key returned by
+    search_function(query, max_results). Arrow keys move through the results, and completing the text
+    input (enter) runs the selected result.
+    """
+    menu = MenuRenderer(renderer, columns=1, text_input=True, text_input_prompt=prompt, render_function=render_function)
+
+    def update_results(query):
+        menu.set_elements(element_function(key) for key in search_function(query, max_results))
+
+    def run_selected_result(query):
+        element = menu.get_selected_element()
+        if element is None:
+            element = menu.elements[0][0] if menu.elements[0] else None
+        if element and element.function:
+            if element.function_args:
+                element.function(*element.function_args)
+            else:
+                element.function()
+
+    menu.text_input_change_callback = update_results
+    menu.text_input_callback = run_selected_result
+    update_results("")
+    return menu
@@ -0,0 +1,231 @@
+"""
+Outcome statistics of every scenario type, kept across sessions.
+
+Reps are grouped by scenario key: the offensive and defensive mode and the
+player's role, or the name of a custom scenario. Each key keeps counts of
+wins, losses, timeouts and manual resets from the player's side, and the
+number of reps that rule zero extended past their timeout. It also keeps
+quantile sketches of rep durations and of the time to a goal. Memory per key
+is fixed, and recording a rep is O(1).
+
+The sketches bucket values on a log scale, so every quantile is within
+RELATIVE_ACCURACY of the true value. Merging two sketches adds their
+buckets, which is how stats from different sessions are combined.
+
+Every rep is appended to a journal of the running session as soon as it
+ends. On the next start, journals are merged into the saved totals and
+removed, including those of sessions that never closed cleanly.
+"""
+
+import math
+import os
+import time
+from enum import Enum
+from typing import Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+# Sketched values are clamped to this range, in seconds
+MIN_SKETCH_VALUE = 0.05
+MAX_SKETCH_VALUE = 600.0
+RELATIVE_ACCURACY = 0.02
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_MIN_BUCKET = math.floor(math.log(MIN_SKETCH_VALUE) / _LOG_GAMMA)
+SKETCH_BUCKETS = math.ceil(math.log(MAX_SKETCH_VALUE) / _LOG_GAMMA) - _MIN_BUCKET + 1
+
+
+class Outcome(Enum):
+    WIN = 0
+    LOSS = 1
+    TIMEOUT = 2
+    RESET = 3
+
+
+class QuantileSketch:
+    """Counts of values in log-spaced buckets, every quantile is within RELATIVE_ACCURACY of the true value"""
+
+    def __init__(self, counts: Optional[np.ndarray] = None):
+        self.counts = counts if counts is not None else np.zeros(SKETCH_BUCKETS, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def add(self, value: float):
+        value = min(max(value, MIN_SKETCH_VALUE), MAX_SKETCH_VALUE)
+        self.counts[math.ceil(math.log(value) / _LOG_GAMMA) - _MIN_BUCKET] += 1
+
+    def merge(self, other: "QuantileSketch"):
+        self.counts += other.counts
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if total == 0:
+            return None
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * (total - 1), side="right"))
+        # Middle of the bucket in the log sense, which bounds the relative error
+        return 2 * _GAMMA ** (bucket + _MIN_BUCKET) / (_GAMMA + 1)
+
+    def to_dict(self) -> Dict[int, int]:
+        """Non-empty buckets only, most of them are"""
+        return {int(bucket): int(self.counts[bucket]) for bucket in np.flatnonzero(self.counts)}
+
+    @staticmethod
+    def from_dict(buckets: Dict[int, int]) -> "QuantileSketch":
+        sketch = QuantileSketch()
+        for bucket, count in buckets.items():
+            sketch.counts[bucket] = count
+        return sketch
+
+
+class ScenarioStats:
+    """Outcomes, rule zero extensions, durations and times to goal of one scenario key"""
+
+    def __init__(self):
+        self.outcomes = np.zeros(len(Outcome), dtype=np.int64)
+        self.extended = 0
+        self.durations = QuantileSketch()
+        self.goal_times = QuantileSketch()
+
+    @property
+    def reps(self) -> int:
+        return int(self.outcomes.sum())
+
+    def add_rep(self, outcome: Outcome, duration: float, extended: bool = False):
+        self.outcomes[outcome.value] += 1
+        self.extended += int(extended)
+        self.durations.add(duration)
+        if outcome in (Outcome.WIN, Outcome.LOSS):
+            self.goal_times.add(duration)
+
+    def merge(self, other: "ScenarioStats"):
+        self.outcomes += other.outcomes
+        self.extended += other.extended
+        self.durations.merge(other.durations)
+        self.goal_times.merge(other.goal_times)
+
+    def win_rate(self) -> Optional[float]:
+        return self.outcomes[Outcome.WIN.value] / self.reps if self.reps else None
+
+    def summary(self) -> str:
+        wins, losses, timeouts, resets = self.outcomes.tolist()
+        text = f"W {wins}  L {losses}  T {timeouts}"
+        if resets:
+            text += f"  R {resets}"
+        median_goal_time = self.goal_times.quantile(0.5)
+        if median_goal_time is not None:
+            text += f"  goal in {median_goal_time:.1f}s"
+        return text
+
+
+class ScenarioStatsModel(BaseModel):
+    outcomes: List[int] = Field(default_factory=lambda: [0] * len(Outcome))
+    extended: int = 0
+    durations: Dict[int, int] = Field(default_factory=dict)
+    goal_times: Dict[int, int] = Field(default_factory=dict)
+
+
+class StatsSnapshot(BaseModel):
+    sketch_buckets: int = SKETCH_BUCKETS
+    scenarios: Dict[str, ScenarioStatsModel] = Field(default_factory=dict)
+
+
+class RepResult(BaseModel):
+    """One journal line"""
+    key: str
+    outcome: Outcome
+    duration: float
+    extended: bool = False
+
+
+def scenario_key(offensive_mode=None, defensive_mode=None, player_offense=True, custom_name=None) -> str:
+    """Key of a preset scenario type, or of a custom scenario"""
+    if custom_name is not None:
+        return f"custom:{custom_name}"
+    return f"{offensive_mode.name}:{defensive_mode.name}:{'offense' if player_offense else 'defense'}"
+
+
+class OutcomeStats:
+    """Stats of every scenario key, merged from every past session and journaled as reps end"""
+
+    def __init__(self, stats_path: Optional[str] = None):
+        self._stats_path = stats_path or _get_stats_path()
+        self.scenarios: Dict[str, ScenarioStats] = {}
+        self._journal_path = None
+        self._journal = None
+        self._load()
+
+    def get(self, key: str) -> Optional[ScenarioStats]:
+        return self.scenarios.get(key)
+
+    def record_rep(self, key: str, outcome: Outcome, duration: float, extended: bool = False):
+        """Count a finished rep and append it to this session's journal"""
+        stats = self.scenarios.get(key)
+        if stats is None:
+            stats = self.scenarios[key] = ScenarioStats()
+        stats.add_rep(outcome, duration, extended)
+
+        if self._journal is None:
+            self._journal_path = os.path.join(self._stats_path, f"journal_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+            self._journal = open(self._journal_path, "a")
+        self._journal.write(RepResult(key=key, outcome=outcome, duration=duration, extended=extended).model_dump_json() + "\n")
+        self._journal.flush()
+
+    def merge(self, other: "OutcomeStats"):
+        for key, stats in other.scenarios.items():
+            self.scenarios.setdefault(key, ScenarioStats()).merge(stats)
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _load(self):
+        snapshot_path = os.path.join(self._stats_path, "stats.json")
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "r") as f:
+                snapshot = StatsSnapshot.model_validate_json(f.read())
+            if snapshot.sketch_buckets == SKETCH_BUCKETS:
+                for key, model in snapshot.scenarios.items():
+                    stats = self.scenarios[key] = ScenarioStats()
+                    stats.outcomes[:] = model.outcomes
+                    stats.extended = model.extended
+                    stats.durations = QuantileSketch.from_dict(model.durations)
+                    stats.goal_times = QuantileSketch.from_dict(model.goal_times)
+            else:
+                print("Outcome stats were saved with other sketch settings, starting over")
+
+        journals = sorted(file for file in os.listdir(self._stats_path) if file.startswith("journal_"))
+        for file in journals:
+            with open(os.path.join(self._stats_path, file), "r") as f:
+                for line in f:
+                    # The last line of a session that crashed may be cut short
+                    try:
+                        rep = RepResult.model_validate_json(line)
+                    except ValueError:
+                        continue
+                    self.scenarios.setdefault(rep.key, ScenarioStats()).add_rep(rep.outcome, rep.duration, rep.extended)
+        if journals:
+            self._save_snapshot(snapshot_path)
+            for file in journals:
+                os.remove(os.path.join(self._stats_path, file))
+
+    def _save_snapshot(self, snapshot_path: str):
+        snapshot = StatsSnapshot(scenarios={
+            key: ScenarioStatsModel(outcomes=stats.outcomes.tolist(), extended=stats.extended,
+                                    durations=stats.durations.to_dict(), goal_times=stats.goal_times.to_dict())
+            for key, stats in self.scenarios.items()
+        })
+        # Written aside and swapped in, so a crash never leaves a half-written snapshot
+        with open(snapshot_path + ".tmp", "w") as f:
+            f.write(snapshot.model_dump_json())
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+
+
+def _get_stats_path():
+    appdata_path = os.path.expandvars("%APPDATA%")
+    if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "Stats")):
+        os.makedirs(os.path.join(appdata_path, "RLBot", "Dojo", "Stats"))
+    return os.path.join(appdata_path, "RLBot", "Dojo", "Stats")
@@ -9,6 +9,17 @@ around specific themes or training goals. Playlists can specify:
 - Custom settings like timeout, shuffle, boost ranges, and rule zero
 - Weighted scenario selection
 
+Scenario Selection:
+- Preset scenarios and custom scenarios share one weighted pool; an entry with
+  weight 0 is never played
+- shuffle=True draws entries at random by weight, from an alias table built once
+  when the playlist is set, so each draw is O(1)
+- shuffle_bag=True deals every entry once (in a weighted random order) before
+  dealing a new bag, so nothing repeats until the whole playlist has been played
+- avoid_recent=N keeps the last N scenarios from being picked again
+- shuffle=False plays the entries in order
+- loop=False ends the playlist after one pass over the entries
+
 Boost Range Feature:
 - If a playlist specifies boost_range=(min, max), it overrides the default
   random boost generation (12-100) that happens in scenario creation
@@ -22,17 +33,21 @@ Rule Zero Feature:
 - Useful for training scenarios where timing and ball control are critical
 """
 
+from collections import deque
 from enum import Enum
 import numpy as np
 from scenario import OffensiveMode, DefensiveMode
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError, model_validator
 from typing import List, Optional, Tuple
-from custom_scenario import CustomScenario
+from custom_scenario import (CustomScenario, resolve_custom_scenario, unique_scenario_name,
+                             get_custom_scenario_similarity_index)
+from search_index import SearchIndex
 
 EXTERNAL_MENU_START_X = 1200
 EXTERNAL_MENU_START_Y = 200
 EXTERNAL_MENU_WIDTH = 500
 EXTERNAL_MENU_HEIGHT = 800
+EXTERNAL_MENU_LINE_HEIGHT = 20
 
 class PlayerRole(Enum):
     OFFENSE = 0
@@ -44,43 +59,222 @@ class ScenarioConfig(BaseModel):
     player_role: PlayerRole
     weight: float = 1.0
 
+class CustomScenarioRef(BaseModel):
+    """A custom scenario of the library, by name, with its content hash to find it again if it is renamed"""
+    name: str
+    content_hash: Optional[str] = None
+    weight: float = 1.0
+
+    @staticmethod
+    def to(custom_scenario: CustomScenario) -> 'CustomScenarioRef':
+        return CustomScenarioRef(name=custom_scenario.name, content_hash=custom_scenario.content_hash(),
+                                 weight=custom_scenario.weight)
+
+    def resolve(self) -> Optional[CustomScenario]:
+        return resolve_custom_scenario(self.name, self.content_hash)
+
 class PlaylistSettings(BaseModel):
     timeout: float = 7.0
     shuffle: bool = True
+    shuffle_bag: bool = False
+    avoid_recent: int = 0
     loop: bool = True
     boost_range: Tuple[int, int] = (12, 100)
     rule_zero: bool = False
 
+    def sampler_signature(self):
+        return (self.shuffle, self.shuffle_bag, self.avoid_recent, self.loop)
+
+# Redraws allowed when a random draw lands on a recently played entry
+MAX_RECENT_REDRAWS = 16
+
+class PlaylistSampler:
+    """Picks the next entry of a playlist's scenario pool according to its settings"""
+
+    def __init__(self, weights, settings):
+        weights = np.asarray(weights, dtype=np.float64)
+        self.settings = settings
+        # Only entries with a positive weight can be played
+        self.pool = np.flatnonzero(weights > 0)
+        self.weights = weights[self.pool]
+        self.recent = deque(maxlen=max(0, min(settings.avoid_recent, len(self.pool) - 1)))
+        self._build_alias_table()
+        self.restart()
+
+    def _build_alias_table(self):
+        """Vose's alias method: one uniform draw picks a column, then either it or its alias"""
+        count = len(self.pool)
+        self.alias_probability = np.ones(count)
+        self.alias = np.arange(count)
+        if count == 0:
+            return
+
+        scaled = self.weights * count / self.weights.sum()
+        small = [i for i in range(count) if scaled[i] < 1.0]
+        large = [i for i in range(count) if scaled[i] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.alias_probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left only differs from 1 by rounding error
+        self.alias_probability = self.alias_probability.tolist()
+        self.alias = self.alias.tolist()
+
+    def restart(self):
+        """Start over from the beginning of the playlist"""
+        self.bag = []
+        self.dealt = 0
+        self.recent.clear()
+
+    def next(self):
+        """Get the pool index of the next entry, or None once a non-looping playlist is finished"""
+        count = len(self.pool)
+        if count == 0:
+            return None
+
+        if not self.settings.loop and self.dealt >= count:
+            return None
+
+        if not self.settings.shuffle:
+            entry = self.dealt % count
+        elif self.settings.shuffle_bag or not self.settings.loop:
+            entry = self._deal_from_bag()
+        else:
+            entry = self._draw()
+
+        self.dealt += 1
+        if self.recent.maxlen:
+            self.recent.append(entry)
+        return int(self.pool[entry])
+
+    def _draw_once(self):
+        column_position = np.random.random_sample() * len(self.alias)
+        column = int(column_position)
+        if column_position - column < self.alias_probability[column]:
+            return column
+        return self.alias[column]
+
+    def _draw(self):
+        for _ in range(MAX_RECENT_REDRAWS):
+            entry = self._draw_once()
+            if entry not in self.recent:
+                return entry
+
+        # Recent entries hold most of the weight, pick directly from the rest
+        allowed = [i for i in range(len(self.pool)) if i not in self.recent]
+        allowed_weights = self.weights[allowed]
+        return allowed[np.random.choice(len(allowed), p=allowed_weights / allowed_weights.sum())]
+
+    def _deal_from_bag(self):
+        if not self.bag:
+            # Weighted random permutation (Efraimidis-Spirakis): sort by u^(1/w), dealt from the end of the list
+            keys = np.random.random_sample(len(self.weights)) ** (1.0 / self.weights)
+            self.bag = np.argsort(keys).tolist()
+            # Don't start a new bag with something that was just played
+            for position in range(len(self.bag) - 1, -1, -1):
+                if self.bag[position] not in self.recent:
+                    self.bag[position], self.bag[-1] = self.bag[-1], self.bag[position]
+                    break
+        return self.bag.pop()
+
 class Playlist(BaseModel):
     name: str
     description: str
     scenarios: Optional[List[ScenarioConfig]] = Field(default_factory=list)
-    custom_scenarios: Optional[List[CustomScenario]] = Field(default_factory=list)
+    custom_scenarios: Optional[List[CustomScenarioRef]] = Field(default_factory=list)
     settings: Optional[PlaylistSettings] = Field(default_factory=PlaylistSettings)
     offensive_modes: Optional[List[OffensiveMode]] = Field(default_factory=list)
     defensive_modes: Optional[List[DefensiveMode]] = Field(default_factory=list)
     player_role: Optional[PlayerRole] = None
+    tags: List[str] = Field(default_factory=list)
 
-    
-    def get_next_scenario(self):
-        """Get next scenario, considering weights"""
-        if not self.scenarios and not self.custom_scenarios:
+    # Cached lines for render_details, playlists don't change once they are built
+    _details_lines: Optional[List[str]] = PrivateAttr(default=None)
+    # Compiled scenario sampler and the weights/settings it was compiled from
+    _sampler: Optional[PlaylistSampler] = PrivateAttr(default=None)
+    _sampler_signature: Optional[tuple] = PrivateAttr(default=None)
+    # Full scenario copies found in a file saved before playlists referred to the library, see migrate_embedded_scenarios
+    _embedded_scenarios: List[Tuple[int, CustomScenario]] = PrivateAttr(default_factory=list)
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _refer_to_custom_scenarios(cls, data, handler):
+        """Turn custom scenarios given whole, by older playlist files or by code, into references"""
+        embedded = []
+        if isinstance(data, dict) and data.get("custom_scenarios"):
+            refs = []
+            for index, entry in enumerate(data["custom_scenarios"]):
+                if isinstance(entry, dict) and "game_state" in entry:
+                    entry = CustomScenario.model_validate(entry)
+                    embedded.append((index, entry))
+                refs.append(CustomScenarioRef.to(entry) if isinstance(entry, CustomScenario) else entry)
+            data = {**data, "custom_scenarios": refs}
+        playlist = handler(data)
+        playlist._embedded_scenarios = embedded
+        return playlist
+
+    def migrate_embedded_scenarios(self) -> Optional[List[str]]:
+        """
+        Make sure every scenario this playlist embedded is in the library, and refer to it there.
+        A library scenario with the same content is referred to, whatever its name. Otherwise the
+        scenario is saved, under a new name if the library has a different scenario by its name.
+        Returns the names of the scenarios saved, or None if the playlist embedded none.
+        """
+        if not self._embedded_scenarios:
             return None
-            
-        # Use weighted random selection
-        # weights = [s.weight for s in self.scenarios]
-        
-        total_num_scenarios = len(self.scenarios) + len(self.custom_scenarios)
-        # scenario = np.random.choice(self.scenarios, p=np.array(weights)/sum(weights))
-        # Ignore weights
-        scenario_index = np.random.randint(0, total_num_scenarios)
-        is_custom = False
-        if scenario_index < len(self.scenarios):
-            scenario = self.scenarios[scenario_index]
+        saved = []
+        library = get_custom_scenario_similarity_index()
+        for index, embedded in self._embedded_scenarios:
+            ref = self.custom_scenarios[index]
+            same_content = library.names_with_hash(ref.content_hash)
+            if ref.name in same_content:
+                continue
+            if same_content:
+                ref.name = same_content[0]
+                continue
+            embedded.name = ref.name = unique_scenario_name(ref.name)
+            embedded.save()
+            saved.append(embedded.name)
+        self._embedded_scenarios = []
+        self._details_lines = None
+        return saved
+
+    def compile_sampler(self):
+        """
+        Build the scenario sampler, called when the playlist is set.
+        The alias table is only rebuilt if the scenarios, weights or settings changed,
+        otherwise the existing sampler just starts over.
+        """
+        weights = tuple(s.weight for s in self.scenarios) + tuple(s.weight for s in self.custom_scenarios)
+        signature = (weights, self.settings.sampler_signature())
+        if self._sampler is not None and signature == self._sampler_signature:
+            self._sampler.restart()
         else:
-            is_custom = True
-            scenario = self.custom_scenarios[scenario_index - len(self.scenarios)]
-        return scenario, is_custom
+            self._sampler = PlaylistSampler(weights, self.settings)
+            self._sampler_signature = signature
+        return self._sampler
+    
+    def get_next_scenario(self):
+        """Get next scenario, considering weights. Returns None when there is nothing left to play."""
+        if self._sampler is None:
+            self.compile_sampler()
+
+        # A custom scenario deleted from the library is skipped
+        for _ in range(len(self.scenarios) + len(self.custom_scenarios)):
+            scenario_index = self._sampler.next()
+            if scenario_index is None:
+                return None
+
+            if scenario_index < len(self.scenarios):
+                return self.scenarios[scenario_index], False
+            ref = self.custom_scenarios[scenario_index - len(self.scenarios)]
+            custom_scenario = ref.resolve()
+            if custom_scenario is not None:
+                return custom_scenario, True
+            print(f"Custom scenario {ref.name} of playlist {self.name} is not in the library")
+        return None
     
         
     def render_details(self, renderer):
@@ -88,37 +282,39 @@ class Playlist(BaseModel):
         if not renderer:
             return
         
+        if self._details_lines is None:
+            self._details_lines = self._build_details_lines()
+
         renderer.draw_rect_2d(EXTERNAL_MENU_START_X, EXTERNAL_MENU_START_Y, EXTERNAL_MENU_WIDTH, EXTERNAL_MENU_HEIGHT, False, renderer.black())
         print_start_x = EXTERNAL_MENU_START_X + 10
         print_start_y = EXTERNAL_MENU_START_Y + 10
         text_color = renderer.white()
-        renderer.draw_string_2d(print_start_x, print_start_y, 1, 1, "Playlist Details", text_color)
-        print_start_y += 20
-        renderer.draw_string_2d(print_start_x, print_start_y, 1, 1, f"Name: {self.name}", text_color)
-        print_start_y += 20
-        num_scenarios = len(self.scenarios)
-        num_scenarios_text = str(num_scenarios)
-        renderer.draw_string_2d(print_start_x, print_start_y, 1, 1, f"Scenarios: {num_scenarios_text}", text_color)
-        print_start_y += 20
-        for scenario in self.scenarios:
-            renderer.draw_string_2d(print_start_x, print_start_y, 1, 1, f"{scenario.offensive_mode.name} vs {scenario.defensive_mode.name}", text_color)
-            print_start_y += 20
+        for line in self._details_lines:
+            renderer.draw_string_2d(print_start_x, print_start_y, 1, 1, line, text_color)
+            print_start_y += EXTERNAL_MENU_LINE_HEIGHT
+
+    def _build_details_lines(self):
+        """Build the lines shown by render_details, truncated to what fits in the details box"""
+        lines = ["Playlist Details", f"Name: {self.name}", f"Scenarios: {len(self.scenarios)}"]
+        lines.extend(f"{scenario.offensive_mode.name} vs {scenario.defensive_mode.name}" for scenario in self.scenarios)
         if self.settings:
-            renderer.draw_string_2d(print_start_x, print_start_y, 1, 1, f"Boost Range: {self.settings.boost_range[0]}-{self.settings.boost_range[1]}", text_color)
-            print_start_y += 20
-            renderer.draw_string_2d(print_start_x, print_start_y, 1, 1, f"Timeout: {self.settings.timeout}s", text_color)
-            print_start_y += 20
+            lines.append(f"Boost Range: {self.settings.boost_range[0]}-{self.settings.boost_range[1]}")
+            lines.append(f"Timeout: {self.settings.timeout}s")
         if self.custom_scenarios:
-            renderer.draw_string_2d(print_start_x, print_start_y, 1, 1, f"Custom Scenarios: {len(self.custom_scenarios)}", text_color)
-            print_start_y += 20
-            for scenario in self.custom_scenarios:
-                renderer.draw_string_2d(print_start_x, print_start_y, 1, 1, f"{scenario.name}", text_color)
-                print_start_y += 20
+            lines.append(f"Custom Scenarios: {len(self.custom_scenarios)}")
+            lines.extend(f"{scenario.name}" for scenario in self.custom_scenarios)
+
+        max_lines = (EXTERNAL_MENU_HEIGHT - 20) // EXTERNAL_MENU_LINE_HEIGHT
+        if len(lines) > max_lines:
+            hidden_lines = len(lines) - max_lines + 1
+            lines = lines[:max_lines - 1] + [f"... and {hidden_lines} more"]
+        return lines
 
 class PlaylistRegistry:
     def __init__(self, renderer=None):
         self.playlists = {}
         self.custom_playlist_manager = None
+        self.search_index = SearchIndex()
         self._register_default_playlists()
     
     def set_custom_playlist_manager(self, manager):
@@ -132,9 +328,11 @@ class PlaylistRegistry:
             custom_playlists = self.custom_playlist_manager.get_custom_playlists()
             for name, playlist in custom_playlists.items():
                 self.playlists[name] = playlist
+                self.search_index.add(name, playlist.name, playlist.tags)
     
     def register_playlist(self, playlist):
         self.playlists[playlist.name] = playlist
+        self.search_index.add(playlist.name, playlist.name, playlist.tags)
     
     def get_playlist(self, name):
         return self.playlists.get(name)
@@ -150,9 +348,9 @@ class PlaylistRegistry:
             for name in custom_names:
                 if name in self.playlists:
                     del self.playlists[name]
+                    self.search_index.remove(name)
             
             # Reload custom playlists
-            self.custom_playlist_manager.load_custom_playlists()
             self._load_custom_playlists()
     
     def _register_default_playlists(self):
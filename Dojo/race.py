@@ -25,7 +25,7 @@ class Race:
 
         self.ball_state = BallState(Physics(location=Vector3(x_loc, y_loc, z_loc), velocity=ball_velocity))
 
-        utils.sanity_check_objects([self.ball_state])
+        utils.sanity_check_objects([self.ball_state], utils.FIELD_MARGIN)
 
         
     def BallState(self):
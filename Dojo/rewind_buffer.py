@@ -0,0 +1,118 @@
+"""
+Rewind of the last seconds of a rep.
+
+Every tick the full ball and car physics are written to one row of a ring
+buffer: a float32 array of REWIND_SECONDS of ticks, allocated once. Writing a
+tick fills the next row in place, and finding a past tick is an index
+computation, so both are O(1) whatever the length of the buffer.
+
+Rewinding sets a past tick back into the game and drops the ticks after it,
+so play resumes from there and pressing again steps further back.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+from rlbot.utils.game_state_util import GameState, BallState, CarState, Physics, Vector3, Rotator
+
+from constants import TICK_RATE
+
+REWIND_SECONDS = 10
+# How far back each press of the rewind hotkey goes
+REWIND_STEP = 1.0
+MAX_CARS = 8
+
+# location, velocity, rotation and angular velocity
+PHYSICS_FIELDS = 12
+CAR_FIELDS = PHYSICS_FIELDS + 1
+TIME = 0
+NUM_CARS = 1
+BALL = 2
+CARS = BALL + PHYSICS_FIELDS
+BOOST = PHYSICS_FIELDS
+FIELDS = CARS + MAX_CARS * CAR_FIELDS
+
+
+class RewindBuffer:
+    """Ring buffer of the physics of the last ticks"""
+
+    def __init__(self, seconds: float = REWIND_SECONDS):
+        self.capacity = int(seconds * TICK_RATE)
+        self._states = np.zeros((self.capacity, FIELDS), dtype=np.float32)
+        # Views of every row, made once so writing a tick allocates no array
+        self._rows = list(self._states)
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def record(self, packet):
+        row = self._rows[self._head]
+        row[TIME] = packet.game_info.seconds_elapsed
+        num_cars = min(packet.num_cars, MAX_CARS)
+        row[NUM_CARS] = num_cars
+        _write_physics(row, BALL, packet.game_ball.physics)
+        for index in range(num_cars):
+            car = packet.game_cars[index]
+            offset = CARS + index * CAR_FIELDS
+            _write_physics(row, offset, car.physics)
+            row[offset + BOOST] = car.boost
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def index(self, ticks_back: int) -> int:
+        """Row of the tick ticks_back before the latest, clamped to the oldest one kept"""
+        ticks_back = min(max(ticks_back, 0), self._count - 1)
+        return (self._head - 1 - ticks_back) % self.capacity
+
+    def rewind(self, seconds: float) -> Optional[Tuple[GameState, float]]:
+        """
+        Game state of the tick seconds before the latest, with its time
+        The ticks after it are dropped, so the next rewind goes further back
+        """
+        if self._count == 0:
+            return None
+        ticks_back = min(int(round(seconds * TICK_RATE)), self._count - 1)
+        index = self.index(ticks_back)
+        self._head = (index + 1) % self.capacity
+        self._count -= ticks_back
+        row = self._rows[index]
+        return self._game_state(row), float(row[TIME])
+
+    @staticmethod
+    def _game_state(row: np.ndarray) -> GameState:
+        cars = {}
+        for index in range(int(row[NUM_CARS])):
+            offset = CARS + index * CAR_FIELDS
+            cars[index] = CarState(physics=_read_physics(row, offset), boost_amount=float(row[offset + BOOST]))
+        return GameState(ball=BallState(physics=_read_physics(row, BALL)), cars=cars)
+
+
+def _write_physics(row: np.ndarray, offset: int, physics):
+    location = physics.location
+    velocity = physics.velocity
+    rotation = physics.rotation
+    angular_velocity = physics.angular_velocity
+    row[offset] = location.x
+    row[offset + 1] = location.y
+    row[offset + 2] = location.z
+    row[offset + 3] = velocity.x
+    row[offset + 4] = velocity.y
+    row[offset + 5] = velocity.z
+    row[offset + 6] = rotation.pitch
+    row[offset + 7] = rotation.yaw
+    row[offset + 8] = rotation.roll
+    row[offset + 9] = angular_velocity.x
+    row[offset + 10] = angular_velocity.y
+    row[offset + 11] = angular_velocity.z
+
+
+def _read_physics(row: np.ndarray, offset: int) -> Physics:
+    values = row[offset:offset + PHYSICS_FIELDS].tolist()
+    return Physics(location=Vector3(*values[0:3]), velocity=Vector3(*values[3:6]),
+                   rotation=Rotator(*values[6:9]), angular_velocity=Vector3(*values[9:12]))
@@ -0,0 +1,159 @@
+"""
+Sampling of scenario setups inside the feasible part of the field.
+
+Each game mode declares the constraints its setups have to meet, like
+staying in bounds or keeping the ball ahead of the car. Candidates are drawn
+as stacked (N, rows, 13) scenario arrays, checked with array operations and
+only the rejected ones are drawn again, for a bounded number of rounds.
+Whatever is still infeasible after that is left for the caller to repair.
+Single scenarios go through the same loop with plain floats instead of
+arrays, see sample_feasible_one.
+
+Acceptance is tracked per mode, so setups that waste most of their draws show
+up in the report:
+    python sampling.py --scenarios 2000
+"""
+
+import argparse
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from constants import SAMPLE_ROUNDS
+
+
+@dataclass(frozen=True)
+class Constraint:
+    """
+    A named check over stacked scenario arrays, returning a mask of the feasible ones
+    check_one is the same check of a single scenario given as a list of row lists
+    """
+    name: str
+    check: Callable[[np.ndarray], np.ndarray]
+    check_one: Optional[Callable[[List[List[float]]], bool]] = None
+
+    def passes(self, state: List[List[float]]) -> bool:
+        if self.check_one is not None:
+            return self.check_one(state)
+        return bool(self.check(np.array([state]))[0])
+
+
+@dataclass
+class SamplerStats:
+    """How many draws one mode needed to produce its scenarios"""
+    drawn: int = 0
+    accepted: int = 0
+    fallbacks: int = 0
+    rejections: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, other: "SamplerStats"):
+        self.drawn += other.drawn
+        self.accepted += other.accepted
+        self.fallbacks += other.fallbacks
+        for name, count in other.rejections.items():
+            self.rejections[name] = self.rejections.get(name, 0) + count
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.drawn if self.drawn else 1.0
+
+    def summary(self) -> str:
+        rejections = ", ".join(f"{name} {count}" for name, count in sorted(self.rejections.items(), key=lambda item: -item[1]))
+        return (f"accepted {self.accepted}/{self.drawn} ({self.acceptance_rate:6.1%}), "
+                f"fallbacks {self.fallbacks}" + (f", rejected by {rejections}" if rejections else ""))
+
+
+# Sampling stats of every mode since startup
+SAMPLER_STATS: Dict[Enum, SamplerStats] = {}
+
+
+def sample_feasible(draw: Callable[[int], np.ndarray], constraints: Sequence[Constraint], count: int = 1,
+                    modes: Sequence[Enum] = (), max_rounds: int = SAMPLE_ROUNDS):
+    """
+    Draw count candidates with draw(n) -> (n, rows, 13) and redraw the ones that break a constraint
+    The draws are counted in the stats of every mode in modes
+    Returns the states and a mask of the ones that were still infeasible after max_rounds draws
+    """
+    stats = SamplerStats()
+    states = None
+    pending = np.arange(count)
+    for _ in range(max_rounds):
+        candidates = draw(len(pending))
+        if states is None:
+            states = candidates
+        else:
+            states[pending] = candidates
+        stats.drawn += len(pending)
+
+        feasible = np.ones(len(pending), dtype=bool)
+        for constraint in constraints:
+            passed = constraint.check(candidates)
+            rejected = int(np.count_nonzero(feasible & ~passed))
+            if rejected:
+                stats.rejections[constraint.name] = stats.rejections.get(constraint.name, 0) + rejected
+            feasible &= passed
+        stats.accepted += int(np.count_nonzero(feasible))
+
+        pending = pending[~feasible]
+        if not len(pending):
+            break
+
+    infeasible = np.zeros(count, dtype=bool)
+    infeasible[pending] = True
+    stats.fallbacks += len(pending)
+    for mode in modes:
+        SAMPLER_STATS.setdefault(mode, SamplerStats()).add(stats)
+    return states, infeasible
+
+
+def sample_feasible_one(draw: Callable[[], List[List[float]]], constraints: Sequence[Constraint],
+                        modes: Sequence[Enum] = (), max_rounds: int = SAMPLE_ROUNDS):
+    """
+    sample_feasible for a single candidate drawn by draw() as a list of row lists, without array overhead
+    Returns the state and whether it was still infeasible after max_rounds draws
+    """
+    stats = SamplerStats()
+    feasible = False
+    for _ in range(max_rounds):
+        state = draw()
+        stats.drawn += 1
+        # Like a batch, a draw is counted against the first constraint it breaks
+        rejected = next((constraint for constraint in constraints if not constraint.passes(state)), None)
+        if rejected is None:
+            feasible = True
+            stats.accepted += 1
+            break
+        stats.rejections[rejected.name] = stats.rejections.get(rejected.name, 0) + 1
+
+    stats.fallbacks += not feasible
+    for mode in modes:
+        SAMPLER_STATS.setdefault(mode, SamplerStats()).add(stats)
+    return state, not feasible
+
+
+def report() -> str:
+    """Acceptance of every mode sampled so far"""
+    return "\n".join(f"{type(mode).__name__}.{mode.name:<22} {stats.summary()}" for mode, stats in SAMPLER_STATS.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how many draws each scenario setup needs")
+    parser.add_argument("--scenarios", type=int, default=1000, help="Scenarios generated per offensive and defensive mode")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Run as a script this is __main__, while Scenario records its stats in the imported sampling module
+    import sampling
+    from scenario import Scenario, OffensiveMode, DefensiveMode
+    np.random.seed(args.seed)
+    for offensive_mode in OffensiveMode:
+        for defensive_mode in DefensiveMode:
+            for _ in range(args.scenarios // len(DefensiveMode)):
+                Scenario(offensive_mode, defensive_mode)
+    print(sampling.report())
+
+
+if __name__ == "__main__":
+    main()
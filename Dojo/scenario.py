@@ -3,6 +3,8 @@ from rlbot.utils.game_state_util import GameState, BallState, CarState, Physics,
 import matplotlib.pyplot as plt
 from enum import Enum
 import utils
+from car_layout import CarLayout, DEFAULT_LAYOUT
+import collision
 
 class OffensiveMode(Enum):
     POSSESSION = 0
@@ -28,790 +30,298 @@ class DefensiveMode(Enum):
     RECOVERING = 4
     FRONT_INTERCEPT = 5
 
+class CarRole(Enum):
+    OFFENSE = 0
+    DEFENSE = 1
+
+# Bump whenever a change to the setups changes what a given random seed generates,
+# so results cached per seed (like playlist calibration) are recomputed
+GENERATOR_VERSION = 3
+
+# Scenario layout: one row per object, one column per physics value
+# Row 0 is the ball, rows 1 and 2 are the primary offensive and defensive cars, extra cars follow
+BALL_ROW = 0
+OFFENSE_ROW = 1
+DEFENSE_ROW = 2
+FIRST_SUPPORT_ROW = 3
+LOCATION = slice(0, 3)
+VELOCITY = slice(3, 6)
+ROTATION = slice(6, 9)  # pitch, yaw, roll
+ANGULAR_VELOCITY = slice(9, 12)
+BOOST = 12
+SCENARIO_SHAPE = (3, 13)  # 1v1
+
+# Single columns used by the setups
+X = 0
+Y = 1
+Z = 2
+VELOCITY_X = 3
+VELOCITY_Y = 4
+YAW = 7
+
+# Columns negated by a mirror. Across X the yaw becomes pi - yaw, so it is negated and then offset by pi
+MIRROR_X_COLUMNS = np.array([X, VELOCITY_X, YAW])
+MIRROR_Y_COLUMNS = np.array([Y, VELOCITY_Y, YAW])
+
 class Scenario:
     '''
     Scenario represents all initial states of a game mode
-    Comprised of a BallState and two CarStates (or more, to be added)
+    Comprised of a ball and any number of cars, stored as a single array with one row per object.
+    Each car has a role (CarRole value in roles), and its team follows from the role and offensive_team.
+    Unset values are NaN and become None in the materialized GameState.
+    The GameState is built on demand and cached until the array or the car layout changes.
     '''
-    def __init__(self, offensive_mode=None, defensive_mode=None, boost_range=None):
+    __slots__ = ('_state', '_game_state', '_game_state_layout', 'roles', 'offensive_team', 'play_yaw')
+
+    def __init__(self, offensive_mode=None, defensive_mode=None, boost_range=None, num_offense=1, num_defense=1):
         '''
         Create a new scenario based on the game mode
+        The first car of each role is placed by the game mode, extra cars support it
+        Modes can also be compiled setups or the names of user setups, see generation
         '''
+        self.__allocate(support_roles(num_offense, num_defense))
         self.offensive_team = 0
-        self.offensive_car_state = CarState()
-        self.defensive_car_state = CarState()
-        self.ball_state = BallState()
-        self.play_yaw = None
-        match offensive_mode:
-            case OffensiveMode.POSSESSION:
-                self.__setup_possession_offense(utils.random_between(-2500, 1500))
-            case OffensiveMode.BREAKOUT:
-                self.__setup_possession_offense(utils.random_between(2000, 3000))
-            case OffensiveMode.PASS:
-                self.__setup_pass_offense()
-            case OffensiveMode.BACKPASS:
-                self.__setup_backpass_offense()
-            case OffensiveMode.CARRY:
-                self.__setup_carry_offense()
-            case OffensiveMode.CORNER:
-                self.__setup_corner_offense()
-            case OffensiveMode.SIDEWALL:
-                self.__setup_sidewall_offense()
-            case OffensiveMode.LOB_ON_GOAL:
-                self.__setup_lob_on_goal_offense()
-            case OffensiveMode.BACKBOARD_PASS:
-                self.__setup_backboard_pass_offense()
-            case OffensiveMode.BACKWALL_BOUNCE:
-                self.__setup_backwall_bounce_offense()
-            case OffensiveMode.SIDEWALL_BREAKOUT:
-                self.__setup_sidewall_breakout_offense()
-            case OffensiveMode.BACK_CORNER_BREAKOUT:
-                self.__setup_backcorner_breakout_offense()
-            case OffensiveMode.SIDE_BACKBOARD_PASS:
-                self.__setup_side_backboard_pass_offense()
-            case OffensiveMode.OVER_SHOULDER:
-                self.__setup_over_shoulder_offense()
-
-        match defensive_mode:
-            case DefensiveMode.NEAR_SHADOW:
-                self.__setup_shadow_defense(utils.random_between(1500, 2500))
-            case DefensiveMode.FAR_SHADOW:
-                self.__setup_shadow_defense(utils.random_between(3000, 4000))
-            case DefensiveMode.NET:
-                self.__setup_net_defense()
-            case DefensiveMode.CORNER:
-                self.__setup_corner_defense()
-            case DefensiveMode.RECOVERING:
-                self.__setup_recovering_defense()
-            case DefensiveMode.FRONT_INTERCEPT:
-                self.__setup_front_intercept_defense()
-
-
-        if defensive_mode is not None and offensive_mode is not None:
-            utils.sanity_check_objects([self.offensive_car_state, self.defensive_car_state, self.ball_state])
-
-        # Randomize boost level of each car - use boost_range if provided, otherwise default
-        if boost_range:
-            min_boost, max_boost = boost_range
-            self.offensive_car_state.boost_amount = utils.random_between(min_boost, max_boost)
-            self.defensive_car_state.boost_amount = utils.random_between(min_boost, max_boost)
-        else:
-            self.offensive_car_state.boost_amount = utils.random_between(12, 100)
-            self.defensive_car_state.boost_amount = utils.random_between(12, 100)
+        # generation builds on the layout of this module, so it can only be imported once a scenario is made
+        from generation import generate_states
+        states, play_yaw = generate_states(offensive_mode, defensive_mode, 1, boost_range, num_offense, num_defense)
+        self._state[:] = states[0]
+        self.play_yaw = None if np.isnan(play_yaw[0]) else float(play_yaw[0])
+
+    def __allocate(self, extra_roles=()):
+        self.roles = np.array([CarRole.OFFENSE.value, CarRole.DEFENSE.value, *extra_roles], dtype=np.int8)
+        self._state = np.full((1 + len(self.roles), SCENARIO_SHAPE[1]), np.nan)
+        self._game_state = None
+        self._game_state_layout = None
 
     @staticmethod
-    def FromGameState(game_state):
+    def _empty(extra_roles=()):
+        '''
+        Create a scenario with every value unset, without drawing any random numbers
+        '''
+        scenario = Scenario.__new__(Scenario)
+        scenario.__allocate(extra_roles)
+        scenario.offensive_team = 0
+        scenario.play_yaw = None
+        return scenario
+
+    @staticmethod
+    def FromGameState(game_state, layout=None, sanity_check=True):
         '''
         Create a new scenario from a game state
+        Car 1 is the offense and car 0 the defense, any other cars take the role of their team
+        Objects outside the map are moved back in unless sanity_check is False
         '''
-        scenario = Scenario()
-        scenario.offensive_car_state = CarState(physics=game_state.cars[1].physics, boost_amount=game_state.cars[1].boost_amount)
-        scenario.defensive_car_state = CarState(physics=game_state.cars[0].physics, boost_amount=game_state.cars[0].boost_amount)
-        scenario.ball_state = BallState(physics=game_state.ball.physics)
-        utils.sanity_check_objects([scenario.offensive_car_state, scenario.defensive_car_state, scenario.ball_state])
+        layout = layout or CarLayout([index % 2 for index in range(max(game_state.cars) + 1)])
+        offense_team = layout.teams[1] if len(layout.teams) > 1 else 1
+        extra_indices = sorted(index for index in game_state.cars if index > 1 and index < layout.num_cars)
+        extra_roles = [CarRole.OFFENSE.value if layout.teams[index] == offense_team else CarRole.DEFENSE.value for index in extra_indices]
+
+        scenario = Scenario._empty(extra_roles)
+        _pack_state(scenario._state[OFFENSE_ROW], game_state.cars[1])
+        _pack_state(scenario._state[DEFENSE_ROW], game_state.cars[0])
+        _pack_state(scenario._state[BALL_ROW], game_state.ball)
+        for row, index in enumerate(extra_indices, start=FIRST_SUPPORT_ROW):
+            _pack_state(scenario._state[row], game_state.cars[index])
+        if sanity_check:
+            scenario.__sanity_check()
         return scenario
-        
 
-    def GetGameState(self):
+    @property
+    def num_cars(self):
+        return len(self.roles)
+
+    @property
+    def teams(self):
+        '''
+        Team of every car, in row order. Offense attacks the goal of offensive_team
+        '''
+        return np.where(self.roles == CarRole.OFFENSE.value, 1 - self.offensive_team, self.offensive_team)
+
+    def ToArray(self, dtype=np.float32):
+        '''
+        Get a copy of the scenario array, unset fields are NaN
+        '''
+        return self._state.astype(dtype)
+
+    @staticmethod
+    def FromArray(array, offensive_team=0, roles=None):
+        '''
+        Create a scenario from an array returned by ToArray, with the roles of the cars past the first two
+        '''
+        scenario = Scenario._empty(roles[2:] if roles is not None else ())
+        scenario._state[:] = array
+        scenario.offensive_team = offensive_team
+        return scenario
+
+    @property
+    def state(self):
+        '''
+        Read-only view of the scenario array, use SetState to change it
+        '''
+        view = self._state.view()
+        view.flags.writeable = False
+        return view
+
+    def SetState(self, array):
+        self._state[:] = array
+        self._game_state = None
+
+    @property
+    def offensive_car_state(self):
+        return self.GetGameState(DEFAULT_LAYOUT).cars[1 if self.offensive_team == 0 else 0]
+
+    @offensive_car_state.setter
+    def offensive_car_state(self, car_state):
+        _pack_state(self._state[OFFENSE_ROW], car_state)
+        self._game_state = None
+
+    @property
+    def defensive_car_state(self):
+        return self.GetGameState(DEFAULT_LAYOUT).cars[0 if self.offensive_team == 0 else 1]
+
+    @defensive_car_state.setter
+    def defensive_car_state(self, car_state):
+        _pack_state(self._state[DEFENSE_ROW], car_state)
+        self._game_state = None
+
+    @property
+    def ball_state(self):
+        return self.GetGameState(self._game_state_layout).ball
+
+    @ball_state.setter
+    def ball_state(self, ball_state):
+        _pack_state(self._state[BALL_ROW], ball_state)
+        self._game_state = None
+
+    def GetGameState(self, layout=None):
         '''
         Set the game state to the scenario
+        Cars are given the indices of their team in the layout, in row order, so the primary car of
+        the human's team goes to the human. Cars beyond what a team has in the match are left out.
         '''
-        # Car 0 = Blue, Car 1 = Orange
-        car_states = {}
-        if self.offensive_team == 0:
-            car_states[1] = self.offensive_car_state
-            car_states[0] = self.defensive_car_state
-        else:
-            car_states[0] = self.offensive_car_state
-            car_states[1] = self.defensive_car_state
-        return GameState(ball=self.ball_state, cars=car_states)
-
-
-    def Mirror(self):
+        layout = layout or DEFAULT_LAYOUT
+        if self._game_state is None or self._game_state_layout is not layout:
+            # Plain floats are much cheaper to unpack than numpy scalars
+            ball_row, *car_rows = self._state.tolist()
+            # Car 0 = Blue, Car 1 = Orange
+            car_states = {}
+            next_index = [0, 0]
+            for car_row, team in zip(car_rows, self.teams.tolist()):
+                team_indices = layout.team_indices[team]
+                if next_index[team] < len(team_indices):
+                    car_states[team_indices[next_index[team]]] = CarState(physics=_unpack_physics(car_row), boost_amount=_unpack_value(car_row[BOOST]))
+                    next_index[team] += 1
+            self._game_state = GameState(ball=BallState(physics=_unpack_physics(ball_row)), cars=car_states)
+            self._game_state_layout = layout
+        return self._game_state
+
+
+    def Mirror(self, axes="y", rows=None):
         '''
         Mirror the scenario across the Y axis, turning defensive scenarios into offensive scenarios
         Involves flipping the Y aspects of the car + ball locations, velocity, and yaw
+        axes can also be "x" (flip sides of the field) or "xy", and rows limits the flip to a list of rows
         '''
-        self.offensive_car_state.physics.location.y = -self.offensive_car_state.physics.location.y
-        self.defensive_car_state.physics.location.y = -self.defensive_car_state.physics.location.y
-        self.ball_state.physics.location.y = -self.ball_state.physics.location.y
-
-        self.offensive_car_state.physics.rotation.yaw = -self.offensive_car_state.physics.rotation.yaw
-        self.defensive_car_state.physics.rotation.yaw = -self.defensive_car_state.physics.rotation.yaw
-
-        self.offensive_car_state.physics.velocity.y = -self.offensive_car_state.physics.velocity.y
-        self.defensive_car_state.physics.velocity.y = -self.defensive_car_state.physics.velocity.y
-        self.ball_state.physics.velocity.y = -self.ball_state.physics.velocity.y
-
-        self.offensive_team = 1 - self.offensive_team
+        state = self._state if rows is None else self._state[rows]
+        if "x" in axes:
+            state[:, MIRROR_X_COLUMNS] *= -1
+            state[:, YAW] += np.pi
+        if "y" in axes:
+            state[:, MIRROR_Y_COLUMNS] *= -1
+            # Only a whole-field flip swaps which goal the offense attacks
+            if rows is None:
+                self.offensive_team = 1 - self.offensive_team
+        if rows is not None:
+            # Selecting a list of rows copies them, so write them back
+            self._state[rows] = state
+        self._game_state = None
     
     def Draw(self):
         '''
         Plot the scenario against a simulated field, for debugging purposes
         '''
-        plt.figure()
         # Rocket League uses a coordinate system (X, Y, Z), where Z is upwards. Note also that negative Y is towards Blue's goal (team 0).
+        from thumbnails import draw_field, draw_scenario
+        plt.figure()
+        ax = plt.gca()
+        draw_field(ax)
+        draw_scenario(ax, self._state, self.roles)
 
-        # Floor: 0
-        # Center field: (0, 0)
-        # Side wall: x=±4096
-        # Side wall length: 7936
-        # Back wall: y=±5120
-        # Back wall length: 5888
-        # Ceiling: z=2044
-        # Goal height: z=642.775
-        # Goal center-to-post: 892.755
-        # Goal depth: 880
-        # Corner wall length: 1629.174
-        # The corner planes intersect the axes at ±8064 at a 45 degrees angle
-
-        # Draw the field
-        
-        # Add vertical lines from at X=-4096 and X=4096, each from Y=-5120 to Y=5120
-        # Stop 1152 units short from each wall to leave room for the corners
-        corner_start = 5120 - 1152
-        plt.plot([-4096, -4096], [-corner_start, corner_start], 'k-')
-        plt.plot([4096, 4096], [-corner_start, corner_start], 'k-')
-
-        # Add horizontal lines from at Y=-5120 and Y=5120, each from X=-4096 to X=4096
-        corner_start = 4096 - 1152
-        plt.plot([-corner_start, corner_start], [-5120, -5120], 'k-')
-        plt.plot([-corner_start, corner_start], [5120, 5120], 'k-')
-
-        # Draw lines representing the corners
-        # Top left goes from X=-4096, Y=(5120-1152) to X=(-4096+1152), Y=-5120
-        plt.plot([-4096, -4096+1152], [5120-1152, 5120], 'k-')
-        # Top right goes from X=4096, Y=(5120-1152) to X=(4096-1152), Y=-5120
-        plt.plot([4096, 4096-1152], [5120-1152, 5120], 'k-')
-        # Bottom left goes from X=-4096, Y=-5120 to X=(-4096+1152), Y=(-5120+1152)
-        plt.plot([-4096, -4096+1152], [-5120+1152, -5120], 'k-')
-        # Bottom right goes from X=4096, Y=-5120 to X=(4096-1152), Y=(-5120+1152)
-        plt.plot([4096, 4096-1152], [-5120+1152, -5120], 'k-')
-
-        # Goal extends from -893 to +893 in X, and 880 past the goal line in Y, which is at Y=+-5120
-        plt.plot([-893, -893], [-5120-880, -5120], 'k-')
-        plt.plot([893, 893], [-5120-880, -5120], 'k-')
-        plt.plot([-893, 893], [-5120-880, -5120-880], 'k-')
-
-        plt.plot([-893, -893], [5120, 5120+880], 'k-')
-        plt.plot([893, 893], [5120, 5120+880], 'k-')
-        plt.plot([-893, 893], [5120+880, 5120+880], 'k-')
-
-
-        # Draw a dotted line across the center of the field at Y=0, make it opaque
-        plt.plot([-4096, 4096], [0, 0], 'k--', alpha=0.5)
-
-        # Draw the offensive car as a blue triangle
-        # Car is 200 units long, 100 units wide
-        # Draw an arrow from center -100 to center +100 units in the direction of the car's yaw
-        car_length = 200
-        car_width = 100
-        offensive_x_component = car_length * np.cos(self.offensive_car_state.physics.rotation.yaw)
-        offensive_y_component = car_width * np.sin(self.offensive_car_state.physics.rotation.yaw)
-        offensive_arrow_x_start = self.offensive_car_state.physics.location.x 
-        offensive_arrow_y_start = self.offensive_car_state.physics.location.y 
-
-        plt.arrow(offensive_arrow_x_start,
-                 offensive_arrow_y_start,
-                 offensive_x_component,
-                 offensive_y_component,
-                 head_width=200, head_length=400, fc='b', ec='b', length_includes_head=True)
-        
-        defensive_x_component = car_length * np.cos(self.defensive_car_state.physics.rotation.yaw)
-        defensive_y_component = car_width * np.sin(self.defensive_car_state.physics.rotation.yaw)
-        defensive_arrow_x_start = self.defensive_car_state.physics.location.x 
-        defensive_arrow_y_start = self.defensive_car_state.physics.location.y 
-        plt.arrow(defensive_arrow_x_start,
-                 defensive_arrow_y_start,
-                 defensive_x_component,
-                 defensive_y_component,
-                 head_width=200, head_length=400, fc='r', ec='r', length_includes_head=True)
-        
-        # plt.plot(self.offensive_car_state.physics.location.x, self.offensive_car_state.physics.location.y, 'bo', markersize=10)
-        # Draw the defensive car as a red triangle
-        # plt.plot(self.defensive_car_state.physics.location.x, self.defensive_car_state.physics.location.y, 'ro', markersize=10)
-        
-        # Draw the ball as a gray circle
-        plt.plot(self.ball_state.physics.location.x, self.ball_state.physics.location.y, 'ko', markersize=10)
-
-        # Draw the offensive car's velocity vector
-        plt.arrow(self.offensive_car_state.physics.location.x, self.offensive_car_state.physics.location.y,
-                 self.offensive_car_state.physics.velocity.x, self.offensive_car_state.physics.velocity.y,
-                 head_width=50, head_length=50, fc='b', ec='b')
-        
-        # Draw the defensive car's velocity vector
-        plt.arrow(self.defensive_car_state.physics.location.x, self.defensive_car_state.physics.location.y,
-                 self.defensive_car_state.physics.velocity.x, self.defensive_car_state.physics.velocity.y,
-                 head_width=50, head_length=50, fc='r', ec='r')
-        
-        # Draw the ball's velocity vector
-        plt.arrow(self.ball_state.physics.location.x, self.ball_state.physics.location.y,
-                 self.ball_state.physics.velocity.x, self.ball_state.physics.velocity.y,
-                 head_width=50, head_length=50, fc='k', ec='k')
-        
         # Enforce same scale on both axes
-        ax = plt.gca()
         ax.get_xaxis().get_major_formatter().set_scientific(False)
         ax.get_yaxis().get_major_formatter().set_scientific(False)
         plt.axis('equal')
 
         plt.show()
 
-    def __setup_possession_offense(self, y_location):
-        self.play_yaw, play_yaw_mir = utils.get_play_yaw()
-
-        # Add a small random angle to the yaw of each car
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=800, max_velocity=1200)
-        ball_velocity = utils.get_velocity_from_yaw(self.play_yaw, min_velocity=800, max_velocity=1200)
-
-        offensive_x_location = utils.random_between(-2000, 2000)
-        offensive_y_location = y_location
-        offensive_car_position = Vector3(offensive_x_location, offensive_y_location, 17)
-
-        # Ball should be ~600 units "in front" of offensive car, with 200 variance in either direction
-        ball_offset = 600
-        ball_x_location = offensive_x_location + (ball_offset * np.cos(offensive_car_yaw)) + utils.random_between(-100, 100)
-        ball_y_location = offensive_y_location + (ball_offset * np.sin(offensive_car_yaw)) + utils.random_between(-100, 100)
-
-        ball_z_location = 93 + utils.random_between(0, 200)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
+    def __sanity_check(self):
+        # Only objects outside the map are moved, a state from the game may sit right against a wall
+        # The ball and primary cars are cheaper to check one at a time than with array operations
+        for row, (x, y) in enumerate(self._state[:FIRST_SUPPORT_ROW, X:Z].tolist()):
+            checked = utils.sanity_check_xy(x, y)
+            if checked != (x, y):
+                self._state[row, X:Z] = checked
 
-    def __setup_backpass_offense(self):
-        # Mostly the same as breakout, but ball is heading toward the offensive car
-        self.__setup_possession_offense(y_location=utils.random_between(2000, 3000))
 
-        # Ball should be ~600 units "in front" of offensive car, with 200 variance in either direction
-        ball_offset = 3000
-        ball_x_location = self.offensive_car_state.physics.location.x + (ball_offset * np.cos(self.offensive_car_state.physics.rotation.yaw)) + utils.random_between(-100, 100)
-        ball_y_location = self.offensive_car_state.physics.location.y + (ball_offset * np.sin(self.offensive_car_state.physics.rotation.yaw)) + utils.random_between(-100, 100)
-
-        ball_z_location = 93 + utils.random_between(0, 200)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-
-        # Ball should be heading in front of the offensive car
-        # calculate 1500 total units in the direction the offensive car is facing
-        x_component = 0 * np.cos(self.offensive_car_state.physics.rotation.yaw)
-        y_component = 0 * np.sin(self.offensive_car_state.physics.rotation.yaw)
-        ball_target_x_location = self.offensive_car_state.physics.location.x + x_component
-        ball_target_y_location = self.offensive_car_state.physics.location.y + y_component
-        delta_x = ball_target_x_location - ball_x_location
-        delta_y = ball_target_y_location - ball_y_location
-        velocity_magnitude = utils.random_between(0.4, 0.5)
-
-        ball_velocity = Vector3(delta_x*velocity_magnitude, delta_y*velocity_magnitude, utils.random_between(-300, 300))
-
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-
-    def __setup_lob_on_goal_offense(self):
-        # Yaw is going to be toward the goal, that's going to be 1.5pi
-        self.play_yaw = 1.5*np.pi
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=800, max_velocity=1200)
-        offensive_car_x = utils.random_between(-500, 500)
-        offensive_car_y = utils.random_between(-1000, 1000)
-        offensive_car_position = Vector3(offensive_car_x, offensive_car_y, 17)
-
-        # Ball should be ahead of offensive car, flying toward back wall
-        ball_x_location = offensive_car_x
-        ball_y_location = offensive_car_y + 1000
-        ball_z_location = 93 + utils.random_between(1000, 1600)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-
-        # X should be opposite direction of starting position
-        ball_velocity_x = utils.random_between(400, 500) * (ball_x_location > 0)
-        ball_velocity_y = utils.random_between(-3000, -2000)
-        ball_velocity_z = utils.random_between(0, 300)
-        ball_velocity = Vector3(ball_velocity_x, ball_velocity_y, ball_velocity_z)
-
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-
-
-
-    def __setup_carry_offense(self):
-       # Mostly same as possession, but ball starts on top of the car
-       self.play_yaw, play_yaw_mir = utils.get_play_yaw()
-
-       offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-       offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=800, max_velocity=1200)
-       ball_velocity = utils.get_velocity_from_yaw(self.play_yaw, min_velocity=800, max_velocity=1200)
-
-       offensive_x_location = utils.random_between(-2000, 2000)
-       offensive_y_location = utils.random_between(-2500, 2500)
-       offensive_car_position = Vector3(offensive_x_location, offensive_y_location, 17)
-
-       ball_position = Vector3(offensive_x_location, offensive_y_location - 200, 400)
-
-       self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-       
-       self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-
-    def __setup_backcorner_breakout_offense(self):
-        # Play yaw is going to be slightly toward the side wall but mostly toward the net
-        self.play_yaw = utils.random_between(0.5, 1.5)
-
-        # Offensive car should be not too far from the side wall
-        offensive_x_location = utils.SIDE_WALL - utils.random_between(500, 1500)
-
-        # Sidewall setups should be pretty far from the goal
-        offensive_y_location = utils.random_between(0, 2500)
-
-        # Add a small random angle to the yaw of each car
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=1000, max_velocity=1500)
-        ball_velocity = utils.get_velocity_from_yaw(self.play_yaw, min_velocity=1000, max_velocity=1500)
-
-        offensive_car_position = Vector3(offensive_x_location, offensive_y_location, 17)
-
-        # Ball should be ~600 units "in front" of offensive car, with 200 variance in either direction
-        ball_offset = 600
-        ball_x_location = offensive_x_location + (ball_offset * np.cos(offensive_car_yaw)) + utils.random_between(-100, 100)
-        ball_y_location = offensive_y_location + (ball_offset * np.sin(offensive_car_yaw)) + utils.random_between(-100, 100)
-
-        ball_z_location = 93 + utils.random_between(0, 30)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
+def resolve_spawn_overlaps(states, fixed=None):
+    '''
+    Push apart overlapping cars and balls of stacked (N, rows, 13) scenario arrays, in place
+    Returns a mask of the scenarios that still overlap, see collision.resolve_overlaps
+    '''
+    return collision.resolve_overlaps(states[:, BALL_ROW, LOCATION], states[:, OFFENSE_ROW:, LOCATION],
+                                      states[:, OFFENSE_ROW:, YAW], fixed)
 
-        # Flip X position, velocity, and yaw randomly 50% of the time
-        self.__randomly_mirror_offense_x()
-
-    def __setup_sidewall_breakout_offense(self):
-        # Play yaw is going to be slightly toward the side wall but mostly toward the net
-        self.play_yaw = utils.random_between(-0.5, -1.5)
-
-        # Offensive car should be not too far from the side wall
-        offensive_x_location = utils.SIDE_WALL - utils.random_between(500, 1500)
-
-        # Sidewall setups should be pretty far from the goal
-        offensive_y_location = utils.random_between(0, 2500)
-
-        # Add a small random angle to the yaw of each car
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=1000, max_velocity=1500)
-        ball_velocity = utils.get_velocity_from_yaw(self.play_yaw, min_velocity=1000, max_velocity=1500)
 
-        offensive_car_position = Vector3(offensive_x_location, offensive_y_location, 17)
+def support_roles(num_offense, num_defense):
+    return [CarRole.OFFENSE.value] * (num_offense - 1) + [CarRole.DEFENSE.value] * (num_defense - 1)
 
-        # Ball should be ~600 units "in front" of offensive car, with 200 variance in either direction
-        ball_offset = 600
-        ball_x_location = offensive_x_location + (ball_offset * np.cos(offensive_car_yaw)) + utils.random_between(-100, 100)
-        ball_y_location = offensive_y_location + (ball_offset * np.sin(offensive_car_yaw)) + utils.random_between(-100, 100)
-
-        ball_z_location = 93 + utils.random_between(0, 30)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
 
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
+def _xyz(vector):
+    if isinstance(vector, Vector3):
+        return (vector.x, vector.y, vector.z)
+    return vector
 
-        # Flip X position, velocity, and yaw randomly 50% of the time
-        self.__randomly_mirror_offense_x()
 
-    def __setup_corner_offense(self):
-        # Offensive car starts heading toward the corner
-        # This will be ~1000 units from the back wall, ~500 units from the side wall
-        # X side should be randomized
-        offensive_x_location = utils.random_between(utils.SIDE_WALL - 500, utils.SIDE_WALL - 1000)
-        offensive_y_location = utils.random_between(utils.BACK_WALL + 1500, utils.BACK_WALL + 2500)
+def _pack_state(row, state):
+    '''
+    Write a CarState or BallState into one scenario row, unset fields become NaN
+    '''
+    row[:] = np.nan
+    physics = state.physics if state is not None else None
+    if physics is not None:
+        for columns, vector in ((LOCATION, physics.location), (VELOCITY, physics.velocity), (ANGULAR_VELOCITY, physics.angular_velocity)):
+            if vector is not None:
+                row[columns] = _xyz(vector)
+        if physics.rotation is not None:
+            row[ROTATION] = (physics.rotation.pitch, physics.rotation.yaw, physics.rotation.roll)
+    boost_amount = getattr(state, 'boost_amount', None)
+    if boost_amount is not None:
+        row[BOOST] = boost_amount
 
-        offensive_x_target = utils.SIDE_WALL - 2000
-        offensive_y_target = utils.BACK_WALL + 500
 
-        # Yaw should be facing halfway between the corner boost and back post
-        offensive_car_yaw = np.arctan2(offensive_y_target - offensive_y_location, offensive_x_target - offensive_x_location)
-        self.play_yaw = offensive_car_yaw
+def _unpack_value(value):
+    # NaN is the only value not equal to itself
+    return None if value != value else value
 
-        # Velocity should be toward the existing yaw
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=800, max_velocity=1200)
-        offensive_car_position = Vector3(offensive_x_location, offensive_y_location, 17)
 
-        # Ball should be ~600 units "in front" of offensive car, with 200 variance in either direction
-        ball_offset = 600
-        ball_x_location = offensive_x_location + (ball_offset * np.cos(offensive_car_yaw)) + utils.random_between(-100, 100)
-        ball_y_location = offensive_y_location + (ball_offset * np.sin(offensive_car_yaw)) + utils.random_between(-100, 100)
+def _unpack_vector(x, y, z):
+    if x != x or y != y or z != z:
+        return None
+    return Vector3(x, y, z)
 
-        ball_z_location = 93 + utils.random_between(0, 200)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-        ball_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=800, max_velocity=1200)
-
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-
-        # Flip X position, velocity, and yaw randomly 50% of the time
-        self.__randomly_mirror_offense_x()
-
-    def __setup_pass_offense(self):
-        self.play_yaw, play_yaw_mir = utils.get_play_yaw()
-
-        # Add a small random angle to the yaw of each car
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-
-        # Get the starting velocity from the yaw
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, 800, 1200)
-
-        # Get the starting position of each car
-        # Want to randomize between:
-        # - X: -2000 to 2000
-        # - Y: -2500 to 0
-        offensive_x_location = utils.random_between(-2000, 2000)
-        offensive_y_location = utils.random_between(-1000, 1500)
-        offensive_car_position = Vector3(offensive_x_location, offensive_y_location, 17)
-
-        # Ball should start from the wall on the opposite X side as the offensive car
-        if offensive_x_location < 0:
-            ball_x_location = 3500
-        else:
-            ball_x_location = -3500
-
-        # Ball should start close to the goal 
-        ball_y_location = utils.random_between(-4500, -3500)
-        ball_z_location = 93 + utils.random_between(0, 2000)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-
-        # Ball should be heading in front of the offensive car
-        # calculate 1500 total units in the direction the offensive car is facing
-        x_component = 1500 * np.cos(offensive_car_yaw)
-        y_component = 1500 * np.sin(offensive_car_yaw)
-        ball_target_x_location = offensive_x_location + x_component
-        ball_target_y_location = offensive_y_location + y_component
-        delta_x = ball_target_x_location - ball_x_location
-        delta_y = ball_target_y_location - ball_y_location
-        velocity_magnitude = utils.random_between(0.4, 0.5)
-
-        # Cap Y velocity component, or else it goes past the offensive car sometimes
-        ball_velocity = Vector3(delta_x*velocity_magnitude, min(delta_y*velocity_magnitude, 750), utils.random_between(0, 300))
-
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-
-    def __setup_sidewall_offense(self):
-        # Play yaw is going to be slightly toward the net but mostly toward the side wall
-        self.play_yaw = utils.random_between(5.8, 6.2)
-
-        # Offensive car should be 1000 units from the side wall
-        offensive_x_location = utils.SIDE_WALL - utils.random_between(1500, 2500)
-
-        # Sidewall setups shouldn't be too close to the goal
-        offensive_y_location = utils.random_between(-1500, 1500)
-
-        # Add a small random angle to the yaw of each car
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=800, max_velocity=1200)
-        ball_velocity = utils.get_velocity_from_yaw(self.play_yaw, min_velocity=1500, max_velocity=2000)
-
-        offensive_car_position = Vector3(offensive_x_location, offensive_y_location, 17)
-
-        # Ball should be ~600 units "in front" of offensive car, with 200 variance in either direction
-        ball_offset = 600
-        ball_x_location = offensive_x_location + (ball_offset * np.cos(offensive_car_yaw)) + utils.random_between(-100, 100)
-        ball_y_location = offensive_y_location + (ball_offset * np.sin(offensive_car_yaw)) + utils.random_between(-100, 100)
-
-        ball_z_location = 93 + utils.random_between(0, 30)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-
-        # Flip X position, velocity, and yaw randomly 50% of the time
-        self.__randomly_mirror_offense_x()
-
-    def __setup_backboard_pass_offense(self):
-        # Yaw is going to be toward the goal, that's going to be 1.5pi
-        self.play_yaw = 1.5*np.pi
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=800, max_velocity=1200)
-        offensive_car_x = utils.random_between(-500, 500)
-        offensive_car_y = utils.random_between(-1000, 1000)
-        offensive_car_position = Vector3(offensive_car_x, offensive_car_y, 17)
-
-        # Ball starts close to back wall, flying toward back wall
-        ball_x_location = utils.SIDE_WALL - utils.random_between(1000, 2000)
-        ball_y_location = utils.BACK_WALL + utils.random_between(2000, 3000)
-        ball_z_location = 93 + utils.random_between(500, 1200)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-
-        # X should be opposite direction of starting position
-        ball_velocity_x = utils.random_between(400, 500) * (ball_x_location > 0)
-        ball_velocity_y = utils.random_between(-3000, -2000)
-        ball_velocity_z = utils.random_between(0, 300)
-        ball_velocity = Vector3(ball_velocity_x, ball_velocity_y, ball_velocity_z)
-
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-
-        # Flip X position, velocity, and yaw randomly 50% of the time
-        self.__randomly_mirror_offense_x()
-
-    def __setup_backwall_bounce_offense(self):
-         # Yaw is going to be toward the goal, that's going to be 1.5pi
-        self.play_yaw = 1.5*np.pi
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=800, max_velocity=1200)
-        offensive_car_x = utils.random_between(-500, 500)
-        offensive_car_y = utils.random_between(-1000, 1000)
-        offensive_car_position = Vector3(offensive_car_x, offensive_car_y, 17)
-
-        # Ball should be ahead of offensive car, flying toward back wall
-        ball_x_location = offensive_car_x
-        ball_y_location = offensive_car_y - 1000
-        ball_z_location = 93 + utils.random_between(1000, 2000)
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-
-        # X should be opposite direction of starting position
-        ball_velocity_x = utils.random_between(400, 500) * (ball_x_location > 0)
-        ball_velocity_y = utils.random_between(-2000, -3000)
-        ball_velocity_z = utils.random_between(300, 500)
-        ball_velocity = Vector3(ball_velocity_x, ball_velocity_y, ball_velocity_z)
-
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-
-    def __setup_side_backboard_pass_offense(self):
-        """
-        Setup a side backboard pass scenario where:
-        - Ball starts near one side wall, bounces off the backboard to the side of the net
-        - Offensive car starts on the same side as the ball, pointing toward the opponent's goal
-        """
-        # Offensive car yaw is toward the goal (1.5*pi)
-        self.play_yaw = 1.5*np.pi
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-        
-        # Offensive car velocity toward the goal
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=800, max_velocity=1200)
-        
-        # Randomly choose which side the ball starts on (left or right)
-        ball_side = np.random.choice([-1, 1])  # -1 for left side, 1 for right side
-        
-        # Ball starts near the side wall on one side
-        ball_x_location = ball_side * (utils.SIDE_WALL - utils.random_between(200, 800))
-        ball_y_location = utils.BACK_WALL + utils.random_between(2500, 3500)  # Near the back wall
-        ball_z_location = 93 + utils.random_between(300, 800)  # Lower height for more realistic backboard pass
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-        
-        # Ball velocity: heading toward the backboard, but angled to bounce to the opposite side
-        # The ball should bounce off the backboard and head toward the side of the net opposite from where it started
-        ball_velocity_x = -ball_side * utils.random_between(1200, 1600)  # Toward opposite side - increased speed
-        ball_velocity_y = utils.random_between(-2500, -3000)  # Toward the backboard/goal - increased speed
-        ball_velocity_z = utils.random_between(-50, 300)  # Slight vertical component - increased range
-        ball_velocity = Vector3(ball_velocity_x, ball_velocity_y, ball_velocity_z)
-        
-        # Offensive car starts on the same side as the ball
-        offensive_car_x = ball_side * utils.random_between(1000, 2000)  # Same side as ball
-        offensive_car_y = utils.random_between(0, 1000)  # Positioned to follow up on the pass
-        offensive_car_position = Vector3(offensive_car_x, offensive_car_y, 17)
-        
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-
-    def __setup_over_shoulder_offense(self):
-        """
-        Setup an over-the-shoulder scenario where:
-        - Offensive car is positioned in the offensive half, facing toward the goal
-        - Ball comes from behind/above the car (from the defensive end)
-        - Ball trajectory goes "over the shoulder" of the offensive car
-        - Car needs to turn around or adjust to receive/intercept the ball
-        """
-        # Offensive car yaw is toward the goal (1.5*pi)
-        self.play_yaw = 1.5*np.pi
-        offensive_car_yaw = self.play_yaw + utils.random_between(-0.2*np.pi, 0.2*np.pi)
-        
-        # Offensive car velocity toward the goal
-        offensive_car_velocity = utils.get_velocity_from_yaw(offensive_car_yaw, min_velocity=1000, max_velocity=1400)
-        
-        # Offensive car should be roughly in the middle, but distinctly on one X side
-        x_side = np.random.choice([-1, 1])
-        offensive_car_x = x_side * utils.random_between(2000, 2500)
-        offensive_car_y = utils.random_between(-500, 1500)
-        offensive_car_position = Vector3(offensive_car_x, offensive_car_y, 17)
-        
-        # Ball starts from behind the car (defensive end), elevated
-        # Position it "over the shoulder" - behind and to one side
-        # Ball should be on the opposite X side as the offensive car
-        shoulder_side = -x_side
-        
-        # Ball starts behind the car and elevated
-        # Ball should be distinctly on the opposite X side as the offensive car
-        ball_x_location = offensive_car_x + shoulder_side * utils.random_between(1500, 2000)  # To the side
-        ball_y_location = offensive_car_y + utils.random_between(1500, 3000)  # Behind the car (toward defensive end)
-        ball_z_location = 93 + utils.random_between(400, 1200)  # Elevated
-        ball_position = Vector3(ball_x_location, ball_y_location, ball_z_location)
-        
-        # Ball velocity: should be roughly going toward the goal, but slightly toward the side of the offensive car
-        target_x = offensive_car_x + shoulder_side * utils.random_between(500, 1000)  # Opposite side from start
-        target_y = offensive_car_y - utils.random_between(800, 1500)  # In front of the car
-        
-        # Calculate velocity to reach the target area
-        delta_x = target_x - ball_x_location
-        delta_y = target_y - ball_y_location
-        
-        # Normalize and scale the horizontal velocity
-        horizontal_distance = np.sqrt(delta_x**2 + delta_y**2)
-        velocity_magnitude = utils.random_between(2800, 2900)
-        
-        ball_velocity_x = (delta_x / horizontal_distance) * velocity_magnitude
-        ball_velocity_y = (delta_y / horizontal_distance) * velocity_magnitude
-        ball_velocity_z = utils.random_between(100, 400)  # Slight downward trajectory
-        
-        ball_velocity = Vector3(ball_velocity_x, ball_velocity_y, ball_velocity_z)
-        
-        self.offensive_car_state = CarState(boost_amount=100, physics=Physics(location=offensive_car_position, rotation=Rotator(yaw=offensive_car_yaw, pitch=0, roll=0), velocity=offensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-        self.ball_state = BallState(Physics(location=ball_position, velocity=ball_velocity))
-        
-        # Flip X position, velocity, and yaw randomly 50% of the time
-        self.__randomly_mirror_offense_x()
-
-    def __setup_shadow_defense(self, distance_from_offensive_car):
-        '''
-        Setup the shadow defense scenario
-        Shadow defense is based off of offensive car stats
-        '''
 
-        # Add a small random angle to the yaw of each car
-        defensive_car_yaw = self.offensive_car_state.physics.rotation.yaw + utils.random_between(-0.1*np.pi, 0.1*np.pi)
-
-        # Get the starting velocity from the yaw
-        defensive_car_velocity = utils.get_velocity_from_yaw(defensive_car_yaw, min_velocity=800, max_velocity=1200)
-
-        # Defensive location should be +-300 X units away from offensive car, and given distance away towards the goal
-        defensive_x_location = utils.random_between(self.offensive_car_state.physics.location.x - 300, self.offensive_car_state.physics.location.x + 300)
-        defensive_y_location = self.offensive_car_state.physics.location.y - distance_from_offensive_car
-            
-        defensive_car_position = Vector3(defensive_x_location, defensive_y_location, 17)
-
-        self.defensive_car_state = CarState(boost_amount=100, physics=Physics(location=defensive_car_position, rotation=Rotator(yaw=defensive_car_yaw, pitch=0, roll=0), velocity=defensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-
-    def __setup_net_defense(self):
-        # Car is stationary
-        defensive_car_velocity = Vector3(0, 0, 0)
-
-        # Let's do -200 to 200 range for X, Y is -5600 (or +5600 if mirrored)
-        defensive_x_location = utils.random_between(-200, 200)
-        defensive_y_location = -5600
-
-        defensive_car_position = Vector3(defensive_x_location, defensive_y_location, 27)
-
-        # In net mode, defensive car yaw should be facing the offensive car
-        # Get the difference between the defensive car and the offensive car
-        defensive_car_x = defensive_x_location
-        defensive_car_y = defensive_y_location
-        offensive_car_x = self.offensive_car_state.physics.location.x
-        offensive_car_y = self.offensive_car_state.physics.location.y
-        radians_to_offensive_car = np.arctan2(offensive_car_y - defensive_car_y, offensive_car_x - defensive_car_x)
-        defensive_car_yaw = radians_to_offensive_car
-
-        self.defensive_car_state = CarState(boost_amount=100, physics=Physics(location=defensive_car_position, rotation=Rotator(yaw=defensive_car_yaw, pitch=0, roll=0), velocity=defensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-
-    def __setup_corner_defense(self):
-        # Defensive car should be heading around the defensive corner
-
-        # This will be ~1000 units from the back wall, ~500 units from the side wall
-        # X side should be randomized
-        defensive_x_location = utils.random_between(utils.SIDE_WALL - 500, utils.SIDE_WALL - 1000)
-        defensive_y_location = utils.random_between(utils.BACK_WALL + 1500, utils.BACK_WALL + 2500)
-
-        defensive_x_target = utils.SIDE_WALL - 2000
-        defensive_y_target = utils.BACK_WALL + 500
-
-        # Yaw should be facing halfway between the corner boost and back post
-        defensive_car_yaw = np.arctan2(defensive_y_target - defensive_y_location, defensive_x_target - defensive_x_location)
-
-        # Velocity should be toward the existing yaw
-        defensive_car_velocity = utils.get_velocity_from_yaw(defensive_car_yaw, min_velocity=800, max_velocity=1200)
-        defensive_car_position = Vector3(defensive_x_location, defensive_y_location, 17)
-
-        # Car is stationary
-        self.defensive_car_state = CarState(boost_amount=100, physics=Physics(location=defensive_car_position, rotation=Rotator(yaw=defensive_car_yaw, pitch=0, roll=0), velocity=defensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-
-        # Flip X position, velocity, and yaw randomly 50% of the time
-        self.__randomly_mirror_defensive_x()
-
-    def __setup_recovering_defense(self):
-        # Defensive car should be "past" the offensive car and ball, with little chance to make it back in time
-        # Should be heading toward the opposite net
-        defensive_car_yaw = 1.5*np.pi
-        defensive_car_velocity = utils.get_velocity_from_yaw(defensive_car_yaw, min_velocity=100, max_velocity=300)
-
-        # Add some z variance
-        defensive_car_z_location = utils.random_between(100, 300)
-
-        # Y will be past the offensive car
-        defensive_car_y_location = self.offensive_car_state.physics.location.y + utils.random_between(500, 1000)
-
-        # X will be toward the middle relative to the offensive car
-        defensive_car_x_location = self.offensive_car_state.physics.location.x / 2
-
-        defensive_car_position = Vector3(defensive_car_x_location, defensive_car_y_location, defensive_car_z_location)
-
-        self.defensive_car_state = CarState(boost_amount=100, physics=Physics(location=defensive_car_position, rotation=Rotator(yaw=defensive_car_yaw, pitch=0, roll=0), velocity=defensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-
-    def __setup_front_intercept_defense(self):
-        """
-        Setup a front intercept defense scenario where:
-        - Defensive car starts 2000 Y units in front of the offensive car
-        - ± 500 units X away from the offensive car
-        - Facing the offensive car
-        """
-        # Calculate defensive car position relative to offensive car
-        offensive_car_x = self.offensive_car_state.physics.location.x
-        offensive_car_y = self.offensive_car_state.physics.location.y
-        
-        # Position defensive car 2000 units in front (toward the goal) of offensive car
-        defensive_car_y = offensive_car_y - 3000
-        
-        # Position defensive car ± 500 units X away from offensive car
-        x_offset = utils.random_between(-500, 500)
-        defensive_car_x = offensive_car_x + x_offset
-        
-        defensive_car_position = Vector3(defensive_car_x, defensive_car_y, 17)
-        
-        # Calculate yaw to face the offensive car
-        delta_x = offensive_car_x - defensive_car_x
-        delta_y = offensive_car_y - defensive_car_y
-        defensive_car_yaw = np.arctan2(delta_y, delta_x)
-        
-        # Set velocity toward the offensive car with some randomization
-        defensive_car_velocity = utils.get_velocity_from_yaw(defensive_car_yaw, min_velocity=800, max_velocity=1200)
-        
-        self.defensive_car_state = CarState(boost_amount=100, physics=Physics(location=defensive_car_position, rotation=Rotator(yaw=defensive_car_yaw, pitch=0, roll=0), velocity=defensive_car_velocity,
-                        angular_velocity=Vector3(0, 0, 0)))
-
-
-    def __randomly_mirror_offense_x(self):
-        if np.random.random() < 0.5:
-            self.offensive_car_state.physics.location.x = -self.offensive_car_state.physics.location.x
-            self.offensive_car_state.physics.velocity.x = -self.offensive_car_state.physics.velocity.x
-            self.offensive_car_state.physics.rotation.yaw = (2*np.pi-self.offensive_car_state.physics.rotation.yaw) + np.pi
-            self.ball_state.physics.location.x = -self.ball_state.physics.location.x
-            self.ball_state.physics.velocity.x = -self.ball_state.physics.velocity.x
-    
-    def __randomly_mirror_defensive_x(self):
-        if np.random.random() < 0.5:
-            self.defensive_car_state.physics.location.x = -self.defensive_car_state.physics.location.x
-            self.defensive_car_state.physics.velocity.x = -self.defensive_car_state.physics.velocity.x
-            self.defensive_car_state.physics.rotation.yaw = (2*np.pi-self.defensive_car_state.physics.rotation.yaw) + np.pi
+def _unpack_physics(row):
+    '''
+    Build the Physics for one scenario row, given as a list of floats
+    '''
+    location, velocity, rotation, angular_velocity = row[LOCATION], row[VELOCITY], row[ROTATION], row[ANGULAR_VELOCITY]
+    # Vectors are always set or unset as a whole, so checking their first values is enough
+    if location[0] != location[0] and velocity[0] != velocity[0] and rotation[0] != rotation[0] and angular_velocity[0] != angular_velocity[0]:
+        return None
+    pitch, yaw, roll = rotation
+    return Physics(
+        location=_unpack_vector(*location),
+        velocity=_unpack_vector(*velocity),
+        rotation=None if pitch != pitch or yaw != yaw or roll != roll else Rotator(pitch=pitch, yaw=yaw, roll=roll),
+        angular_velocity=_unpack_vector(*angular_velocity)
+    )
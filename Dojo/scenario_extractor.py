@@ -0,0 +1,193 @@
+"""
+Custom scenarios extracted in bulk from recorded sessions.
+
+Recordings (see session_recorder.py) are scanned for moments worth drilling.
+Every trigger is a predicate evaluated over a whole chunk of ticks at once
+with numpy, never tick by tick:
+
+- bot_touch_shot: a bot touches the ball, and within --window seconds the
+  ball is heading into the player's net
+- defensive_pressure: the ball enters the player's defensive third at speed
+
+Only ticks of a scenario rep in play count. The state --lead seconds before
+the trigger is saved as a custom scenario. States are deduplicated by their
+content hash (see scenario_similarity.py), which also names the scenario, so
+scanning the same recordings again adds nothing.
+
+Recordings hold no angular velocities, extracted scenarios start without
+spin.
+
+Usage, from the Dojo folder:
+    python scenario_extractor.py
+    python scenario_extractor.py --triggers bot_touch_shot --window 2 --dry-run
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from rlbot.utils.game_state_util import GameState, BallState, CarState, Physics, Vector3, Rotator
+
+from car_layout import HUMAN_INDEX
+from constants import BACK_WALL, GOAL_WIDTH, BALL_RADIUS, TICK_RATE
+from custom_scenario import CustomScenario, TypedGameState, get_custom_scenario_similarity_index
+from game_state import GymMode, ScenarioPhase
+from scenario_similarity import content_hash
+from session_recorder import SessionReader, get_recordings, COLUMNS, MAX_CARS
+
+# A car this close to the ball center is touching it, its hitbox reaches about 120 units from its center
+TOUCH_DISTANCE = BALL_RADIUS + 120
+MIN_SHOT_SPEED = 1000
+# Ball speed that puts the player under pressure in their defensive third
+PRESSURE_SPEED = 2000
+DEFENSIVE_THIRD = BACK_WALL / 3
+
+_GYM_MODE = COLUMNS.index("gym_mode")
+_PHASE = COLUMNS.index("phase")
+_NUM_CARS = COLUMNS.index("num_cars")
+_BALL = COLUMNS.index("ball x")
+_CARS = COLUMNS.index("car0 x")
+# x, y, z, vx, vy, vz, pitch, yaw, roll of every object, and the boost of cars
+_PHYSICS_FIELDS = 9
+_CAR_FIELDS = _PHYSICS_FIELDS + 1
+
+
+def _ball(rows: np.ndarray) -> np.ndarray:
+    return rows[:, _BALL:_BALL + _PHYSICS_FIELDS]
+
+
+def _cars(rows: np.ndarray) -> np.ndarray:
+    """(ticks, MAX_CARS, fields) view of the cars"""
+    return rows[:, _CARS:_CARS + MAX_CARS * _CAR_FIELDS].reshape(len(rows), MAX_CARS, _CAR_FIELDS)
+
+
+def _rising(mask: np.ndarray) -> np.ndarray:
+    """Ticks where a condition starts to hold, a touch or a fast ball lasts several ticks"""
+    return mask & ~np.concatenate(([False], mask[:-1]))
+
+
+def _shot_on_player_goal(rows: np.ndarray) -> np.ndarray:
+    """Ball heading into the player's net, projected in a straight line to the goal line"""
+    ball = _ball(rows)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        time_to_line = (ball[:, 1] - BACK_WALL) / -ball[:, 4]
+        x_at_line = ball[:, 0] + ball[:, 3] * time_to_line
+    return (ball[:, 4] < -MIN_SHOT_SPEED) & (np.abs(x_at_line) < GOAL_WIDTH)
+
+
+def bot_touch_shot(rows: np.ndarray, window_ticks: int) -> np.ndarray:
+    ball = _ball(rows)[:, :3]
+    cars = _cars(rows)
+    distance = np.linalg.norm(cars[:, :, :3] - ball[:, None, :], axis=2)
+    is_bot = np.arange(MAX_CARS)[None, :] < rows[:, _NUM_CARS, None]
+    is_bot[:, HUMAN_INDEX] = False
+    touch = _rising((is_bot & (distance < TOUCH_DISTANCE)).any(axis=1))
+
+    # Shots in the window after every tick, from a running count
+    shots = np.concatenate(([0], np.cumsum(_shot_on_player_goal(rows))))
+    ticks = np.arange(len(rows))
+    shot_soon = shots[np.minimum(ticks + window_ticks, len(rows))] > shots[ticks]
+    return touch & shot_soon
+
+
+def defensive_pressure(rows: np.ndarray, window_ticks: int) -> np.ndarray:
+    ball = _ball(rows)
+    speed = np.linalg.norm(ball[:, 3:6], axis=1)
+    return _rising((ball[:, 1] < DEFENSIVE_THIRD) & (speed > PRESSURE_SPEED))
+
+
+TRIGGERS: Dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    "bot_touch_shot": bot_touch_shot,
+    "defensive_pressure": defensive_pressure,
+}
+
+
+def scan_recording(session_path: str, triggers: List[str], window: float, lead: float) -> List[Tuple[str, np.ndarray]]:
+    """Trigger name and start state row of every match, a chunk at a time"""
+    window_ticks = int(window * TICK_RATE)
+    lead_ticks = int(lead * TICK_RATE)
+    matches = []
+    reader = SessionReader(session_path)
+    chunks = reader.chunks()
+    # Ticks kept from the previous chunk: the ones not evaluated yet, which lacked a full window, the lead_ticks
+    # before them and one more, so a condition already holding at the boundary isn't taken for a new one
+    carry = None
+    evaluated = 0
+    rows = next(chunks, (0, None))[1]
+    while rows is not None:
+        next_rows = next(chunks, (0, None))[1]
+        if carry is not None:
+            rows = np.vstack((carry, rows))
+        end = len(rows) if next_rows is None else max(len(rows) - window_ticks, evaluated)
+        in_rep = (rows[:, _GYM_MODE] == GymMode.SCENARIO.value) & (rows[:, _PHASE] == ScenarioPhase.ACTIVE.value)
+        for name in triggers:
+            hits = np.flatnonzero(TRIGGERS[name](rows, window_ticks) & in_rep)
+            hits = hits[(hits >= evaluated) & (hits < end) & (hits >= lead_ticks)]
+            starts = hits - lead_ticks
+            matches.extend((name, row) for row in rows[starts[in_rep[starts]]])
+        keep_from = max(end - lead_ticks - 1, 0)
+        carry = rows[keep_from:]
+        evaluated = end - keep_from
+        rows = next_rows
+    return matches
+
+
+def _scan_task(task):
+    return scan_recording(*task)
+
+
+def game_state_from_row(row: np.ndarray) -> GameState:
+    ball = _ball(row[None])[0].tolist()
+    cars = {}
+    for index, car in enumerate(_cars(row[None])[0, :int(row[_NUM_CARS])].tolist()):
+        cars[index] = CarState(physics=_physics(car), boost_amount=car[_PHYSICS_FIELDS])
+    return GameState(ball=BallState(physics=_physics(ball)), cars=cars)
+
+
+def _physics(values: List[float]) -> Physics:
+    return Physics(location=Vector3(*values[0:3]), velocity=Vector3(*values[3:6]),
+                   rotation=Rotator(*values[6:9]), angular_velocity=Vector3(0, 0, 0))
+
+
+def extract_scenarios(recordings: List[str], triggers: List[str], window: float, lead: float,
+                      processes: Optional[int] = None) -> Dict[str, CustomScenario]:
+    """New custom scenarios by name, none of them already in the library"""
+    library = get_custom_scenario_similarity_index()
+    scenarios = {}
+    tasks = [(session_path, triggers, window, lead) for session_path in recordings]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for matches in pool.map(_scan_task, tasks):
+            for trigger, row in matches:
+                game_state = TypedGameState.from_game_state(game_state_from_row(row))
+                name = f"{trigger}_{content_hash(game_state)[:10]}"
+                if name in scenarios or library.duplicates(game_state):
+                    continue
+                scenarios[name] = CustomScenario(name=name, game_state=game_state, tags=["extracted", trigger])
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Save moments of recorded sessions as custom scenarios")
+    parser.add_argument("--recordings", nargs="+", default=None, help="Recordings to scan, all of them by default")
+    parser.add_argument("--triggers", nargs="+", choices=list(TRIGGERS), default=list(TRIGGERS))
+    parser.add_argument("--window", type=float, default=1.5, help="Seconds from a bot touch to the shot")
+    parser.add_argument("--lead", type=float, default=0.5, help="Seconds before the trigger the scenario starts")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="List what would be saved")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    recordings = args.recordings or get_recordings()
+    scenarios = extract_scenarios(recordings, args.triggers, args.window, args.lead, args.processes)
+    for name, scenario in scenarios.items():
+        if not args.dry_run:
+            scenario.save()
+        print(name)
+    print(f"{len(scenarios)} new scenarios from {len(recordings)} recordings in {time.perf_counter() - start:.1f}s"
+          + (", nothing saved" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Bounded history of the scenarios played during a session.
+
+Each rep is stored as one fixed-size record: the packed scenario array (see
+Scenario.ToArray), padded to MAX_CARS cars, plus the car roles and the seed
+and modes it was generated from. The most
+recent records live in a fixed-capacity ring buffer. When the ring is full,
+the oldest record is appended to a session file before it is overwritten, so
+memory stays flat however long the session runs. Because records are
+fixed-size and spill in order, any past rep can be read back from the file
+with a single seek.
+"""
+
+import os
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from scenario import Scenario, OffensiveMode, DefensiveMode, SCENARIO_SHAPE
+
+HISTORY_CAPACITY = 256
+MAX_SESSION_FILES = 10
+NO_SEED = -1
+NO_MODE = -1
+# Enough for a 4v4 lobby, larger scenarios are truncated in the history
+MAX_CARS = 8
+
+RECORD_DTYPE = np.dtype([
+    ("seed", "<i8"),
+    ("offensive_mode", "<i2"),
+    ("defensive_mode", "<i2"),
+    ("offensive_team", "<i1"),
+    ("num_cars", "<i1"),
+    ("roles", "<i1", (MAX_CARS,)),
+    ("state", "<f4", (1 + MAX_CARS, SCENARIO_SHAPE[1])),
+])
+
+
+class ScenarioHistory:
+    """Ring buffer of packed scenarios that spills old entries to disk"""
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY, session_path: Optional[str] = None):
+        self.capacity = capacity
+        self._records = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self._count = 0
+        # Spill file is only created once the ring overflows
+        self._session_path = session_path
+        self._spill_file = None
+
+    def __len__(self):
+        return self._count
+
+    def append(self, scenario: Scenario, seed: int = NO_SEED,
+               offensive_mode: Optional[OffensiveMode] = None, defensive_mode: Optional[DefensiveMode] = None) -> int:
+        """Add a scenario to the history and return its index"""
+        slot = self._count % self.capacity
+        if self._count >= self.capacity:
+            self._spill(self._records[slot])
+
+        record = self._records[slot]
+        record["seed"] = seed
+        record["offensive_mode"] = offensive_mode.value if offensive_mode is not None else NO_MODE
+        record["defensive_mode"] = defensive_mode.value if defensive_mode is not None else NO_MODE
+        record["offensive_team"] = scenario.offensive_team
+        num_cars = min(scenario.num_cars, MAX_CARS)
+        record["num_cars"] = num_cars
+        record["roles"][:num_cars] = scenario.roles[:num_cars]
+        record["state"][:1 + num_cars] = scenario.ToArray()[:1 + num_cars]
+        self._count += 1
+        return self._count - 1
+
+    def __getitem__(self, index: int) -> Scenario:
+        record = self._get_record(index)
+        num_cars = int(record["num_cars"])
+        return Scenario.FromArray(record["state"][:1 + num_cars], offensive_team=int(record["offensive_team"]),
+                                  roles=record["roles"][:num_cars])
+
+    def get_info(self, index: int) -> Tuple[int, Optional[OffensiveMode], Optional[DefensiveMode]]:
+        """Get the seed and modes a past scenario was generated from"""
+        record = self._get_record(index)
+        offensive_mode = OffensiveMode(int(record["offensive_mode"])) if record["offensive_mode"] != NO_MODE else None
+        defensive_mode = DefensiveMode(int(record["defensive_mode"])) if record["defensive_mode"] != NO_MODE else None
+        return int(record["seed"]), offensive_mode, defensive_mode
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def _get_record(self, index: int):
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("scenario history index out of range")
+
+        if index >= self._count - self.capacity:
+            return self._records[index % self.capacity]
+
+        # Spilled records are written in order, so record i starts at i * itemsize
+        self._spill_file.flush()
+        self._spill_file.seek(index * RECORD_DTYPE.itemsize)
+        return np.frombuffer(self._spill_file.read(RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)[0]
+
+    def _spill(self, record):
+        if self._spill_file is None:
+            if self._session_path is None:
+                self._session_path = _new_session_path()
+            # Append mode keeps every write at the end of the file, reads can still seek anywhere
+            self._spill_file = open(self._session_path, "a+b")
+        self._spill_file.write(record.tobytes())
+
+
+def _get_history_path():
+    appdata_path = os.path.expandvars("%APPDATA%")
+    if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "History")):
+        os.makedirs(os.path.join(appdata_path, "RLBot", "Dojo", "History"))
+    return os.path.join(appdata_path, "RLBot", "Dojo", "History")
+
+
+def _new_session_path():
+    """Get a file path for this session's history, removing the oldest session files"""
+    history_path = _get_history_path()
+    session_files = sorted(file for file in os.listdir(history_path) if file.endswith(".bin"))
+    for file in session_files[:max(0, len(session_files) - MAX_SESSION_FILES + 1)]:
+        os.remove(os.path.join(history_path, file))
+    return os.path.join(history_path, f"session_{time.strftime('%Y%m%d_%H%M%S')}.bin")
@@ -0,0 +1,398 @@
+"""
+Exact and near-duplicate search over the custom scenario library.
+
+Every scenario gets a content hash of its quantized state: the ball, and the
+location, velocity, rotation and boost of every car, each rounded to
+QUANTIZATION steps. Two scenarios with the same hash differ by less than a
+step everywhere, whatever their names.
+
+For near duplicates, scenarios become feature vectors in units of those
+steps, so a distance of 1 is about one step in one coordinate. They are kept
+in a k-d tree per car count, built with numpy. Leaves hold up to LEAF_SIZE
+points, and searches walk the tree one level at a time with vectorized box
+distances, so a query runs a handful of numpy calls per level. Added scenarios go to a
+small unsorted tail that is searched by brute force, and removed ones are
+masked out. The tree is rebuilt once the tail or the removed rows grow past a
+share of it, so saving a scenario never waits on a rebuild of the library.
+
+Usage, from the Dojo folder:
+    python scenario_similarity.py
+    python scenario_similarity.py --epsilon 2 --delete
+"""
+
+import argparse
+import hashlib
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Steps of the content hash and units of the features: location, velocity, rotation and boost
+QUANTIZATION = (100, 200, 0.25, 10)
+LEAF_SIZE = 32
+# Leaf pairs compared at once when looking for all near pairs
+PAIR_BATCH = 128
+# The tail is merged into the tree when it grows past this share of the tree, or past REBUILD_MIN rows
+REBUILD_SHARE = 0.25
+REBUILD_MIN = 256
+
+
+def _cars(game_state):
+    return [game_state.cars[index] for index in sorted(game_state.cars)]
+
+
+def _motion(physics) -> List[float]:
+    """Location and velocity, in units of QUANTIZATION"""
+    location_step, velocity_step, _, _ = QUANTIZATION
+    return [physics.location.x / location_step, physics.location.y / location_step, physics.location.z / location_step,
+            physics.velocity.x / velocity_step, physics.velocity.y / velocity_step, physics.velocity.z / velocity_step]
+
+
+def content_hash(game_state) -> str:
+    """Hash of the quantized ball and cars of a TypedGameState"""
+    _, _, rotation_step, boost_step = QUANTIZATION
+    values = _motion(game_state.ball.physics) if game_state.ball is not None else []
+    for car in _cars(game_state):
+        rotation = car.physics.rotation
+        # Angles wrapped to [-pi, pi), so equal headings quantize alike
+        angles = (np.array([rotation.pitch, rotation.yaw, rotation.roll]) + np.pi) % (2 * np.pi) - np.pi
+        values.extend([*_motion(car.physics), *(angles / rotation_step), car.boost_amount / boost_step])
+    content = hashlib.sha1(str(len(game_state.cars)).encode())
+    content.update(np.round(values).astype(np.int32).tobytes())
+    return content.hexdigest()
+
+
+def features(game_state) -> np.ndarray:
+    """
+    Feature vector of a TypedGameState, in units of QUANTIZATION
+    Ball location and velocity, then location, velocity, heading and boost of every car
+    """
+    _, _, rotation_step, boost_step = QUANTIZATION
+    values = _motion(game_state.ball.physics) if game_state.ball is not None else []
+    for car in _cars(game_state):
+        # The heading as a unit vector, so a small turn is a small distance across ±pi
+        yaw = car.physics.rotation.yaw
+        values.extend([*_motion(car.physics), np.cos(yaw) / rotation_step, np.sin(yaw) / rotation_step,
+                       car.boost_amount / boost_step])
+    return np.array(values, dtype=np.float32)
+
+
+class KDTree:
+    """Static k-d tree over the rows of an array, with buckets of up to leaf_size points at the leaves"""
+
+    def __init__(self, points: np.ndarray, leaf_size: int = LEAF_SIZE):
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(points))
+        self._points = np.asarray(points, dtype=np.float32)
+        self._start, self._end, self._low, self._high, self._children = [], [], [], [], []
+        if len(points):
+            self._build(0, len(points))
+        self.start = np.array(self._start, dtype=np.int64)
+        self.end = np.array(self._end, dtype=np.int64)
+        self.low = np.array(self._low, dtype=np.float32)
+        self.high = np.array(self._high, dtype=np.float32)
+        self.children = np.array(self._children, dtype=np.int64).reshape(-1, 2)
+        # Points in tree order, so the points of a node are one slice
+        self.points = self._points[self.order]
+        del self._points, self._start, self._end, self._low, self._high, self._children
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def _build(self, start: int, end: int) -> int:
+        node = len(self._start)
+        segment = self.order[start:end]
+        points = self._points[segment]
+        low, high = points.min(axis=0), points.max(axis=0)
+        self._start.append(start)
+        self._end.append(end)
+        self._low.append(low)
+        self._high.append(high)
+        self._children.append((-1, -1))
+        if end - start > self.leaf_size:
+            # Split the widest dimension at its median
+            dimension = int(np.argmax(high - low))
+            middle = (end - start) // 2
+            self.order[start:end] = segment[np.argpartition(points[:, dimension], middle)]
+            self._children[node] = (self._build(start, start + middle), self._build(start + middle, end))
+        return node
+
+    def _is_leaf(self, nodes: np.ndarray) -> np.ndarray:
+        return self.children[nodes, 0] < 0
+
+    def _rows(self, leaves: np.ndarray) -> np.ndarray:
+        """Positions in tree order of every point of the given leaves"""
+        lengths = self.end[leaves] - self.start[leaves]
+        offsets = np.repeat(self.start[leaves] - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum())
+
+    def _leaves_within(self, point: np.ndarray, radius2: float) -> np.ndarray:
+        """Leaves whose boxes come within the radius of point, one tree level at a time"""
+        nodes = np.zeros(1 if len(self) else 0, dtype=np.int64)
+        leaves = []
+        while len(nodes):
+            gap = np.maximum(self.low[nodes] - point, 0) + np.maximum(point - self.high[nodes], 0)
+            nodes = nodes[np.einsum("ij,ij->i", gap, gap) <= radius2]
+            is_leaf = self._is_leaf(nodes)
+            leaves.append(nodes[is_leaf])
+            nodes = self.children[nodes[~is_leaf]].ravel()
+        return np.concatenate(leaves) if leaves else nodes
+
+    def query_radius(self, point: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows of the points within radius of point, and their distances"""
+        positions = self._rows(self._leaves_within(point, radius * radius))
+        difference = self.points[positions] - point
+        distance2 = np.einsum("ij,ij->i", difference, difference)
+        hit = distance2 <= radius * radius
+        return self.order[positions[hit]], np.sqrt(distance2[hit])
+
+    def query(self, point: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows of the k points nearest to point, nearest first, and their distances"""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        # The k-th nearest point of the closest leaf bounds the distance to search
+        node = 0
+        while not self._is_leaf(node):
+            children = self.children[node]
+            gap = np.maximum(self.low[children] - point, 0) + np.maximum(point - self.high[children], 0)
+            node = children[np.argmin(np.einsum("ij,ij->i", gap, gap))]
+        radius = np.inf
+        if self.end[node] - self.start[node] >= k:
+            difference = self.points[self.start[node]:self.end[node]] - point
+            radius = float(np.sqrt(np.partition(np.einsum("ij,ij->i", difference, difference), k - 1)[k - 1]))
+        rows, distances = self.query_radius(point, radius)
+        nearest = np.argsort(distances, kind="stable")[:k]
+        return rows[nearest], distances[nearest]
+
+    def pairs_within(self, radius: float) -> np.ndarray:
+        """
+        (first row, second row) of every pair of points within radius of each other
+        Pairs of nodes are expanded one level at a time, keeping those whose boxes are close enough
+        """
+        radius2 = radius * radius
+        pairs = np.zeros((1 if len(self) else 0, 2), dtype=np.int64)
+        leaf_pairs = []
+        while len(pairs):
+            first, second = pairs.T
+            gap = np.maximum(self.low[second] - self.high[first], 0) + np.maximum(self.low[first] - self.high[second], 0)
+            pairs = pairs[np.einsum("ij,ij->i", gap, gap) <= radius2]
+            first, second = pairs.T
+            first_leaf, second_leaf = self._is_leaf(first), self._is_leaf(second)
+            leaf_pairs.append(pairs[first_leaf & second_leaf])
+
+            # A node paired with itself splits into its two children paired with themselves and each other
+            same = (first == second) & ~first_leaf
+            left, right = self.children[first[same]].T
+            expanded = [np.column_stack((left, left)), np.column_stack((left, right)), np.column_stack((right, right))]
+            # Otherwise the bigger node splits, which keeps the first node ahead of the second in tree order
+            sizes = self.end - self.start
+            split_first = (first != second) & ~first_leaf & (second_leaf | (sizes[first] >= sizes[second]))
+            split_second = (first != second) & ~second_leaf & ~split_first
+            for child in (0, 1):
+                expanded.append(np.column_stack((self.children[first[split_first], child], second[split_first])))
+                expanded.append(np.column_stack((first[split_second], self.children[second[split_second], child])))
+            pairs = np.concatenate(expanded)
+
+        # Points of every leaf padded to the same count with NaN, so leaf pairs are compared in batches
+        leaves = np.flatnonzero(self._is_leaf(np.arange(len(self.start))))
+        slot = np.full(len(self.start), -1)
+        slot[leaves] = np.arange(len(leaves))
+        lengths = self.end[leaves] - self.start[leaves]
+        padded = np.full((len(leaves), lengths.max(initial=0), self.points.shape[1]), np.nan, dtype=np.float32)
+        positions = np.full(padded.shape[:2], -1)
+        for leaf, (start, length) in enumerate(zip(self.start[leaves], lengths)):
+            padded[leaf, :length] = self.points[start:start + length]
+            positions[leaf, :length] = np.arange(start, start + length)
+
+        leaf_pairs = slot[np.concatenate(leaf_pairs)]
+        found = []
+        for batch in range(0, len(leaf_pairs), PAIR_BATCH):
+            first, second = leaf_pairs[batch:batch + PAIR_BATCH].T
+            difference = padded[first][:, :, None, :] - padded[second][:, None, :, :]
+            pair, first_point, second_point = np.nonzero(np.einsum("pijd,pijd->pij", difference, difference) <= radius2)
+            # Within a leaf, every pair once
+            keep = (first[pair] != second[pair]) | (first_point < second_point)
+            pair, first_point, second_point = pair[keep], first_point[keep], second_point[keep]
+            found.append(np.column_stack((self.order[positions[first[pair], first_point]],
+                                          self.order[positions[second[pair], second_point]])))
+        return np.concatenate(found) if found else np.zeros((0, 2), dtype=np.int64)
+
+
+class _CarCountGroup:
+    """Features of the scenarios with one number of cars: a k-d tree, and a tail of rows added since it was built"""
+
+    def __init__(self, dimensions: int):
+        self.points = np.zeros((16, dimensions), dtype=np.float32)
+        # Name of every row, None once removed
+        self.names: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.tree = KDTree(self.points[:0])
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, name: str, point: np.ndarray):
+        if len(self.names) == len(self.points):
+            self.points = np.concatenate((self.points, np.zeros_like(self.points)))
+        self.points[len(self.names)] = point
+        self.rows[name] = len(self.names)
+        self.names.append(name)
+        if len(self.names) - len(self.tree) > max(REBUILD_MIN, len(self.tree) * REBUILD_SHARE):
+            self.rebuild()
+
+    def remove(self, name: str):
+        self.names[self.rows.pop(name)] = None
+        self.removed += 1
+        if self.removed > max(REBUILD_MIN, len(self.tree) * REBUILD_SHARE):
+            self.rebuild()
+
+    def rebuild(self):
+        """Drop removed rows and build the tree over every row"""
+        alive = [row for row, name in enumerate(self.names) if name is not None]
+        self.points = self.points[alive + [0] * max(16 - len(alive), 0)]
+        self.names = [self.names[row] for row in alive]
+        self.rows = {name: row for row, name in enumerate(self.names)}
+        self.tree = KDTree(self.points[:len(self.names)])
+        self.removed = 0
+
+    def _tail(self, point: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.arange(len(self.tree), len(self.names))
+        return rows, np.sqrt(((self.points[rows] - point) ** 2).sum(axis=1))
+
+    def within(self, point: np.ndarray, radius: float) -> List[Tuple[str, float]]:
+        rows, distances = self.tree.query_radius(point, radius)
+        tail_rows, tail_distances = self._tail(point)
+        near = tail_distances <= radius
+        return self._named(np.concatenate((rows, tail_rows[near])), np.concatenate((distances, tail_distances[near])))
+
+    def nearest(self, point: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        # Removed rows may take some of the k places, ask for enough to make up for them
+        rows, distances = self.tree.query(point, k + self.removed)
+        tail_rows, tail_distances = self._tail(point)
+        return self._named(np.concatenate((rows, tail_rows)), np.concatenate((distances, tail_distances)))[:k]
+
+    def _named(self, rows: np.ndarray, distances: np.ndarray) -> List[Tuple[str, float]]:
+        order = np.argsort(distances, kind="stable")
+        return [(self.names[row], float(distance)) for row, distance in zip(rows[order], distances[order])
+                if self.names[row] is not None]
+
+
+class SimilarityIndex:
+    """Content hashes and feature vectors of scenarios by name, for exact and near-duplicate lookups"""
+
+    def __init__(self):
+        self._groups: Dict[int, _CarCountGroup] = {}
+        # name -> (content hash, number of cars)
+        self._entries: Dict[str, Tuple[str, int]] = {}
+        self._names_by_hash: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def add(self, name: str, game_state) -> None:
+        """Add a scenario, replacing any existing entry with the same name"""
+        if name in self._entries:
+            self.remove(name)
+        point = features(game_state)
+        num_cars = len(game_state.cars)
+        group = self._groups.get(num_cars)
+        if group is None:
+            group = self._groups[num_cars] = _CarCountGroup(len(point))
+        group.add(name, point)
+        key = content_hash(game_state)
+        self._entries[name] = (key, num_cars)
+        self._names_by_hash.setdefault(key, set()).add(name)
+
+    def remove(self, name: str) -> None:
+        """Remove a scenario if it is indexed"""
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            return
+        key, num_cars = entry
+        self._groups[num_cars].remove(name)
+        names = self._names_by_hash[key]
+        names.discard(name)
+        if not names:
+            del self._names_by_hash[key]
+
+    def content_hash(self, name: str) -> Optional[str]:
+        entry = self._entries.get(name)
+        return entry[0] if entry else None
+
+    def names_with_hash(self, key: str) -> List[str]:
+        return sorted(self._names_by_hash.get(key, ()))
+
+    def duplicates(self, game_state) -> List[str]:
+        """Names of the scenarios with the same content hash as a game state"""
+        return self.names_with_hash(content_hash(game_state))
+
+    def duplicate_groups(self) -> List[List[str]]:
+        """Every set of two or more scenarios sharing a content hash"""
+        return sorted(sorted(names) for names in self._names_by_hash.values() if len(names) > 1)
+
+    def within(self, game_state, epsilon: float) -> List[Tuple[str, float]]:
+        """Names and distances of the scenarios within epsilon of a game state, nearest first"""
+        group = self._groups.get(len(game_state.cars))
+        return group.within(features(game_state), epsilon) if group else []
+
+    def nearest(self, game_state, k: int = 5) -> List[Tuple[str, float]]:
+        """Names and distances of the k scenarios nearest to a game state"""
+        group = self._groups.get(len(game_state.cars))
+        return group.nearest(features(game_state), k) if group else []
+
+    def near_duplicate_groups(self, epsilon: float) -> List[List[str]]:
+        """Clusters of scenarios linked by distances of at most epsilon, with the same number of cars"""
+        clusters = []
+        for group in self._groups.values():
+            # Every row in the tree, the tail isn't searched pair by pair
+            group.rebuild()
+            parent = np.arange(len(group.names))
+
+            def find(row):
+                while parent[row] != row:
+                    parent[row] = parent[parent[row]]
+                    row = parent[row]
+                return row
+
+            for first, second in group.tree.pairs_within(epsilon):
+                parent[find(first)] = find(second)
+            members: Dict[int, List[str]] = {}
+            for row, name in enumerate(group.names):
+                members.setdefault(find(row), []).append(name)
+            clusters.extend(sorted(names) for names in members.values() if len(names) > 1)
+        return sorted(clusters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicate and near-duplicate custom scenarios")
+    parser.add_argument("--epsilon", type=float, default=0.0,
+                        help="Also group scenarios this close, in quantization steps, exact duplicates only by default")
+    parser.add_argument("--delete", action="store_true",
+                        help="Keep the first scenario of every group by name and delete the rest, playlists then refer to the one kept")
+    args = parser.parse_args()
+
+    from custom_scenario import get_custom_scenarios, get_custom_scenario_similarity_index, delete_custom_scenario
+    from custom_playlist import CustomPlaylistManager
+    start = time.perf_counter()
+    scenarios = get_custom_scenarios()
+    index = get_custom_scenario_similarity_index()
+    groups = index.near_duplicate_groups(args.epsilon) if args.epsilon > 0 else index.duplicate_groups()
+    print(f"{len(scenarios)} scenarios, {len(groups)} groups of duplicates in {time.perf_counter() - start:.2f}s")
+    for names in groups:
+        print(f"{names[0]}: {', '.join(names[1:])}")
+    if args.delete:
+        # Near duplicates have hashes of their own, playlist entries would lose them once deleted
+        replacements = {name: scenarios[names[0]] for names in groups for name in names[1:]}
+        for playlist_name in CustomPlaylistManager(renderer=None, main_menu_renderer=None).replace_custom_scenarios(replacements):
+            print(f"Playlist {playlist_name} now refers to the scenarios kept")
+        for name in replacements:
+            delete_custom_scenario(name)
+        print(f"Deleted {len(replacements)} scenarios")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+In-memory name/tag search index for the custom scenario and playlist menus.
+
+Entries are indexed three ways:
+- A sorted list of (token, key) pairs, searched with bisect for prefix matches
+- A trigram map from every 3-character substring to the keys containing it,
+  used for substring matches once a query term has at least 3 characters
+- A name-ordered list of keys, so broad queries can stop after the first page
+
+Both structures are updated incrementally when an entry is added or removed,
+so saving, deleting or reloading a single scenario never rebuilds the index.
+"""
+
+import re
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase a name and collapse separators so 'Corner_Pass-2' matches 'corner pass 2'"""
+    return " ".join(TOKEN_PATTERN.findall(text.lower()))
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Prefix and trigram index over entry names and tags"""
+
+    def __init__(self):
+        # key -> (display name, normalized searchable text with a leading space, tokens)
+        self._entries: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {}
+        # (lowercase name, key), kept sorted so results come out in menu order
+        self._ordered: List[Tuple[str, str]] = []
+        self._tokens: List[Tuple[str, str]] = []
+        self._trigram_keys: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def add(self, key: str, name: str, tags: Iterable[str] = ()) -> None:
+        """Add an entry, replacing any existing entry with the same key"""
+        if key in self._entries:
+            self.remove(key)
+
+        text = " " + normalize_text(" ".join([name, *tags]))
+        tokens = tuple(sorted(set(text.split())))
+        self._entries[key] = (name, text, tokens)
+        insort(self._ordered, (name.lower(), key))
+        for token in tokens:
+            insort(self._tokens, (token, key))
+        for trigram in _trigrams(text):
+            self._trigram_keys.setdefault(trigram, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        """Remove an entry if it is indexed"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        name, text, tokens = entry
+        index = bisect_left(self._ordered, (name.lower(), key))
+        if index < len(self._ordered) and self._ordered[index][1] == key:
+            del self._ordered[index]
+        for token in tokens:
+            index = bisect_left(self._tokens, (token, key))
+            if index < len(self._tokens) and self._tokens[index] == (token, key):
+                del self._tokens[index]
+        for trigram in _trigrams(text):
+            keys = self._trigram_keys.get(trigram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._trigram_keys[trigram]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Get the keys matching every term of the query, sorted by name.
+        Short terms match token prefixes, terms of 3+ characters match anywhere in the name or tags.
+        """
+        terms = normalize_text(query).split()
+        if not terms:
+            return [key for _, key in islice(self._ordered, limit)]
+
+        # A leading space turns a token prefix check into a substring check on the entry text
+        needles = [" " + term if len(term) < 3 else term for term in terms]
+        estimates = [(self._estimate(term), term) for term in terms]
+        smallest, best_term = min(estimates)
+        if smallest == 0:
+            return []
+
+        # Assume terms are independent to guess how many entries match all of them
+        expected_matches = smallest
+        for estimate, term in estimates:
+            if term != best_term:
+                expected_matches *= estimate / len(self._entries)
+
+        if limit is not None and limit * len(self._entries) < smallest * max(expected_matches, 1):
+            # Broad query: walking the name-ordered list finds a page of matches before touching every candidate
+            matches = []
+            for _, key in self._ordered:
+                if self._matches(key, needles):
+                    matches.append(key)
+                    if len(matches) == limit:
+                        break
+            return matches
+
+        # Selective query: only the best term is looked up in the index, the rest are verified per candidate
+        matches = [key for key in self._candidates(best_term) if self._matches(key, needles)]
+        matches.sort(key=lambda key: (self._entries[key][0].lower(), key))
+        return matches if limit is None else matches[:limit]
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        return bisect_left(self._tokens, (prefix, "")), bisect_left(self._tokens, (prefix + "\uffff", ""))
+
+    def _smallest_posting_list(self, term: str) -> Set[str]:
+        return min((self._trigram_keys.get(trigram, set()) for trigram in _trigrams(term)), key=len)
+
+    def _estimate(self, term: str) -> int:
+        """Upper bound on the number of entries matching a term, without collecting them"""
+        if len(term) < 3:
+            start, end = self._prefix_range(term)
+            return end - start
+        return len(self._smallest_posting_list(term))
+
+    def _candidates(self, term: str) -> Iterable[str]:
+        """Superset of the keys matching a term, from the token list or the smallest trigram posting list"""
+        if len(term) < 3:
+            start, end = self._prefix_range(term)
+            return dict.fromkeys(key for _, key in self._tokens[start:end])
+        return self._smallest_posting_list(term)
+
+    def _matches(self, key: str, needles: List[str]) -> bool:
+        text = self._entries[key][1]
+        for needle in needles:
+            if needle not in text:
+                return False
+        return True
@@ -0,0 +1,346 @@
+"""
+Trends across recorded sessions.
+
+Every session recording (see session_recorder.py) is streamed one chunk at a
+time. Only the ticks where the gym mode or game phase changes, and the ticks
+around rep boundaries, are kept, so memory doesn't grow with the length of a
+session. From those come, per day and per drill:
+
+- reps, and how many the player won, lost or played out without a goal
+- the success rate: the share of reps won, and on defensive drills also the
+  reps the player held out until the timeout, which Dojo awards them as a goal
+- time spent in reps, and the pace of reps per hour of play
+- race runs and their times
+
+The summary of every recording is cached under a hash of its content, so a
+run only reads recordings that are new or still being written. Summaries
+stay in the cache after the recorder removes old recordings, so the history
+keeps growing. Results are written as CSV files and a static HTML page of
+charts.
+
+Usage, from the Dojo folder:
+    python session_analytics.py --output analytics
+"""
+
+import argparse
+import base64
+import csv
+import hashlib
+import io
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from pydantic import BaseModel, Field
+
+from constants import BACK_WALL, GOAL_DETECTION_THRESHOLD
+from game_state import GymMode, RacePhase
+from session_recorder import SessionReader, get_recordings
+
+# Part of the cache key, bump it when summaries are computed differently
+ANALYTICS_VERSION = 2
+UNKNOWN_DRILL = "unknown"
+# Drills drawn in the success rate chart, the most played first
+CHART_DRILLS = 8
+
+_COLUMNS = ["tick", "time", "gym_mode", "phase", "blue_score", "orange_score", "ball y"]
+_TICK, _TIME, _GYM_MODE, _PHASE, _BLUE_SCORE, _ORANGE_SCORE, _BALL_Y = range(len(_COLUMNS))
+
+
+class DrillTotals(BaseModel):
+    reps: int = 0
+    wins: int = 0
+    losses: int = 0
+    no_goal: int = 0
+    # Wins, and reps without a goal on defensive drills
+    successes: int = 0
+    rep_seconds: float = 0.0
+
+    def add(self, other: "DrillTotals"):
+        self.reps += other.reps
+        self.wins += other.wins
+        self.losses += other.losses
+        self.no_goal += other.no_goal
+        self.successes += other.successes
+        self.rep_seconds += other.rep_seconds
+
+    def success_rate(self) -> Optional[float]:
+        return self.successes / self.reps if self.reps else None
+
+
+class RaceRun(BaseModel):
+    trials: int
+    seconds: float
+
+
+class FileSummary(BaseModel):
+    """What one recording adds to the history"""
+    file: str
+    day: str
+    play_seconds: float = 0.0
+    drills: Dict[str, DrillTotals] = Field(default_factory=dict)
+    races: List[RaceRun] = Field(default_factory=list)
+
+
+def summarize_recording(session_path: str) -> FileSummary:
+    """Stream a recording chunk by chunk, keeping only phase changes and rep boundaries"""
+    reader = SessionReader(session_path)
+    columns = [reader.column(name) for name in _COLUMNS]
+    reps = [rep for rep in reader.reps if rep.end_tick is not None]
+    # First and last tick of every rep, and the one after, where a goal shows in the score
+    boundary_ticks = np.array(sorted({tick for rep in reps for tick in (rep.start_tick, rep.end_tick - 1, rep.end_tick)}),
+                              dtype=np.int64)
+
+    boundaries = []
+    changes = []
+    previous_state = np.full((1, 2), np.nan)
+    first_time = last_time = None
+    for _, rows in reader.chunks():
+        rows = rows[:, columns]
+        boundaries.append(rows[np.isin(rows[:, _TICK].astype(np.int64), boundary_ticks)])
+        # Gym mode and phase of every tick against the tick before, across chunks too
+        state = rows[:, _GYM_MODE:_PHASE + 1]
+        changed = (np.diff(np.vstack((previous_state, state)), axis=0) != 0).any(axis=1)
+        changes.append(rows[changed])
+        previous_state = state[-1:]
+        first_time = rows[0, _TIME] if first_time is None else first_time
+        last_time = rows[-1, _TIME]
+
+    summary = FileSummary(file=os.path.basename(session_path), day=_recording_day(session_path))
+    if first_time is None:
+        return summary
+    summary.play_seconds = float(last_time - first_time)
+    by_tick = {int(row[_TICK]): row for row in np.concatenate(boundaries)}
+    for rep in reps:
+        drill = summary.drills.setdefault(rep.key or UNKNOWN_DRILL, DrillTotals())
+        _count_rep(drill, by_tick, rep.start_tick, rep.end_tick, defending=(rep.key or "").endswith(":defense"))
+    summary.races = _race_runs(np.concatenate(changes))
+    return summary
+
+
+def _count_rep(drill: DrillTotals, by_tick, start_tick: int, end_tick: int, defending: bool = False):
+    start = by_tick.get(start_tick)
+    last = by_tick.get(end_tick - 1)
+    if start is None or last is None:
+        return
+    # The recording may stop on the last tick of a rep
+    after = by_tick.get(end_tick, last)
+    drill.reps += 1
+    drill.rep_seconds += float(last[_TIME] - start[_TIME])
+    # The player is on blue, defending negative y. With goal reset off the rep ends on the tick the ball
+    # crosses past the goal line, which is the tick after its last one
+    if after[_BLUE_SCORE] > start[_BLUE_SCORE] or after[_BALL_Y] > -BACK_WALL + GOAL_DETECTION_THRESHOLD:
+        drill.wins += 1
+        drill.successes += 1
+    elif after[_ORANGE_SCORE] > start[_ORANGE_SCORE] or after[_BALL_Y] < BACK_WALL - GOAL_DETECTION_THRESHOLD:
+        drill.losses += 1
+    else:
+        drill.no_goal += 1
+        # Holding out on defense until the timeout is the goal Dojo awards the player
+        if defending:
+            drill.successes += 1
+
+
+def _race_runs(changes: np.ndarray) -> List[RaceRun]:
+    """Finished races, from the ticks where the gym mode or phase changed"""
+    runs = []
+    start_time = None
+    trials = 0
+    for row in changes:
+        if row[_GYM_MODE] != GymMode.RACE.value:
+            start_time = None
+            continue
+        phase = RacePhase(int(row[_PHASE]))
+        if phase == RacePhase.INIT:
+            start_time = None
+        elif start_time is None and phase == RacePhase.SETUP:
+            start_time, trials = row[_TIME], 0
+        elif phase == RacePhase.ACTIVE:
+            trials += 1
+        elif phase == RacePhase.FINISHED and start_time is not None:
+            runs.append(RaceRun(trials=trials, seconds=float(row[_TIME] - start_time)))
+            start_time = None
+    return runs
+
+
+def _recording_day(session_path: str) -> str:
+    """Day the session started, from the file name the recorder gave it"""
+    name = os.path.basename(session_path)
+    try:
+        return time.strftime("%Y-%m-%d", time.strptime(name[len("session_"):len("session_YYYYmmdd")], "%Y%m%d"))
+    except ValueError:
+        return time.strftime("%Y-%m-%d", time.localtime(os.path.getmtime(session_path)))
+
+
+def _file_hash(session_path: str) -> str:
+    content = hashlib.sha1(str(ANALYTICS_VERSION).encode())
+    for extension in (".rec", ".json"):
+        file_path = os.path.splitext(session_path)[0] + extension
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    content.update(block)
+    return content.hexdigest()
+
+
+def _summarize_task(task) -> Tuple[str, FileSummary]:
+    session_path, key = task
+    return key, summarize_recording(session_path)
+
+
+def update_summaries(recordings: List[str], processes: Optional[int] = None) -> List[FileSummary]:
+    """Summaries of every recording ever analyzed, reading only those not in the cache"""
+    cache_path = _get_analytics_path()
+    cached = {}
+    for file in os.listdir(cache_path):
+        if file.endswith(".json"):
+            with open(os.path.join(cache_path, file), "r") as f:
+                cached[file[:-len(".json")]] = FileSummary.model_validate_json(f.read())
+
+    tasks = [(session_path, key) for session_path in recordings
+             if (key := _file_hash(session_path)) not in cached]
+    if tasks:
+        print(f"Reading {len(tasks)} of {len(recordings)} recordings")
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for key, summary in pool.map(_summarize_task, tasks):
+                # A recording that grew since it was last read replaces its old summary
+                for old_key in [old_key for old_key, old in cached.items() if old.file == summary.file]:
+                    os.remove(os.path.join(cache_path, f"{old_key}.json"))
+                    del cached[old_key]
+                with open(os.path.join(cache_path, f"{key}.json"), "w") as f:
+                    f.write(summary.model_dump_json())
+                cached[key] = summary
+    return sorted(cached.values(), key=lambda summary: summary.file)
+
+
+def aggregate(summaries: List[FileSummary]):
+    """Totals per day and drill, play time per day and race runs by day"""
+    drills: Dict[Tuple[str, str], DrillTotals] = defaultdict(DrillTotals)
+    play_seconds: Dict[str, float] = defaultdict(float)
+    races: List[Tuple[str, RaceRun]] = []
+    for summary in summaries:
+        play_seconds[summary.day] += summary.play_seconds
+        for drill, totals in summary.drills.items():
+            drills[summary.day, drill].add(totals)
+        races.extend((summary.day, race) for race in summary.races)
+    return dict(drills), dict(play_seconds), races
+
+
+def write_csv(output_path: str, drills, play_seconds, races):
+    with open(os.path.join(output_path, "drills.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["day", "drill", "reps", "wins", "losses", "no_goal", "success_rate", "mean_rep_seconds"])
+        for (day, drill), totals in sorted(drills.items()):
+            writer.writerow([day, drill, totals.reps, totals.wins, totals.losses, totals.no_goal,
+                             f"{totals.success_rate():.3f}", f"{totals.rep_seconds / totals.reps:.2f}"])
+
+    with open(os.path.join(output_path, "days.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["day", "play_minutes", "reps", "success_rate", "reps_per_hour", "races", "best_race_seconds"])
+        for day, total in sorted(_day_totals(drills).items()):
+            day_races = [race.seconds for race_day, race in races if race_day == day]
+            hours = play_seconds.get(day, 0) / 3600
+            writer.writerow([day, f"{hours * 60:.1f}", total.reps,
+                             f"{total.success_rate():.3f}" if total.reps else "",
+                             f"{total.reps / hours:.1f}" if hours else "",
+                             len(day_races), f"{min(day_races):.2f}" if day_races else ""])
+
+    with open(os.path.join(output_path, "races.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["day", "trials", "seconds"])
+        for day, race in races:
+            writer.writerow([day, race.trials, f"{race.seconds:.2f}"])
+
+
+def _day_totals(drills) -> Dict[str, DrillTotals]:
+    totals = defaultdict(DrillTotals)
+    for (day, _), drill in drills.items():
+        totals[day].add(drill)
+    return totals
+
+
+def write_html(output_path: str, drills, play_seconds, races):
+    """A static page of charts, with the images inlined so it is a single file"""
+    day_totals = _day_totals(drills)
+    days = sorted(set(day_totals) | set(play_seconds) | {day for day, _ in races})
+    charts = []
+
+    figure, ax = _figure()
+    drill_reps = defaultdict(int)
+    for (_, drill), totals in drills.items():
+        drill_reps[drill] += totals.reps
+    for drill in sorted(drill_reps, key=lambda drill: -drill_reps[drill])[:CHART_DRILLS]:
+        played = [day for day in days if (day, drill) in drills]
+        ax.plot(played, [drills[day, drill].success_rate() for day in played], marker="o", label=drill)
+    ax.plot(days, [day_totals[day].success_rate() if day in day_totals else None for day in days],
+            "k--", linewidth=2, label="all drills")
+    ax.set_ylabel("success rate")
+    ax.set_ylim(0, 1)
+    ax.legend(fontsize=7)
+    charts.append(("Success rate per drill", figure))
+
+    figure, ax = _figure()
+    pace = [day_totals[day].reps / (play_seconds[day] / 3600) if play_seconds.get(day) and day in day_totals else 0
+            for day in days]
+    ax.bar(days, pace)
+    ax.set_ylabel("reps per hour of play")
+    charts.append(("Rep pace", figure))
+
+    figure, ax = _figure()
+    for trials in sorted({race.trials for _, race in races}):
+        runs = [(day, race.seconds) for day, race in races if race.trials == trials]
+        ax.plot([day for day, _ in runs], [seconds for _, seconds in runs], marker="o", label=f"{trials} trials")
+    ax.set_ylabel("race time (s)")
+    if races:
+        ax.legend(fontsize=7)
+    charts.append(("Race times", figure))
+
+    sections = []
+    for title, figure in charts:
+        figure.autofmt_xdate()
+        image = io.BytesIO()
+        figure.savefig(image, format="png", bbox_inches="tight")
+        sections.append(f"<h2>{title}</h2>\n<img src=\"data:image/png;base64,{base64.b64encode(image.getvalue()).decode()}\">")
+    with open(os.path.join(output_path, "index.html"), "w") as f:
+        f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Dojo sessions</title></head><body>\n"
+                f"<h1>Dojo sessions</h1>\n<p>{len(days)} days, {sum(play_seconds.values()) / 3600:.1f} hours of play, "
+                f"{sum(total.reps for total in day_totals.values())} reps, {len(races)} races</p>\n"
+                + "\n".join(sections) + "\n</body></html>\n")
+
+
+def _figure():
+    figure = Figure(figsize=(9, 4), dpi=90)
+    FigureCanvasAgg(figure)
+    return figure, figure.add_subplot()
+
+
+def _get_analytics_path():
+    appdata_path = os.path.expandvars("%APPDATA%")
+    if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "Analytics")):
+        os.makedirs(os.path.join(appdata_path, "RLBot", "Dojo", "Analytics"))
+    return os.path.join(appdata_path, "RLBot", "Dojo", "Analytics")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize recorded sessions per day and drill")
+    parser.add_argument("--output", default="analytics", help="Folder for the CSV files and the HTML page")
+    parser.add_argument("--recordings", nargs="+", default=None, help="Recordings to read, all of them by default")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summaries = update_summaries(args.recordings or get_recordings(), args.processes)
+    drills, play_seconds, races = aggregate(summaries)
+    os.makedirs(args.output, exist_ok=True)
+    write_csv(args.output, drills, play_seconds, races)
+    write_html(args.output, drills, play_seconds, races)
+    print(f"{len(summaries)} recordings analyzed in {time.perf_counter() - start:.1f}s, written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
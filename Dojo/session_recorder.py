@@ -0,0 +1,297 @@
+"""
+Per-tick recording of Dojo sessions, for analyzing reps after the fact.
+
+Every tick the recorder copies the ball and car physics, the scores, the game
+phase and the id of the scenario being played into one row of a preallocated
+chunk buffer. The id is the scenario's index in the scenario history. A full
+chunk is swapped for a spare buffer and handed to a background thread, which
+encodes it and appends it to the session file:
+
+- every column is quantized to fixed point, see COLUMN_SCALES, and
+  delta-encoded along time, so objects at rest or moving steadily become runs
+  of small values
+- the deltas are zigzag encoded, so small negative values are small too,
+  then split into byte planes, which leaves the high bytes as long runs of
+  zeros, and the chunk is compressed with LZMA
+
+That comes to about 1.2 MB per hour of uninterrupted play, and less with
+pauses and menus, where nothing moves.
+
+Chunks are stored independently, each behind a small header, so a session
+can be read one chunk at a time, and any chunk with a single seek. A JSON
+index next to the session file lists the offset and first tick of every
+chunk, and where every rep starts and ends. The index is rewritten after each
+chunk, so a crash loses at most the chunk that was being filled.
+"""
+
+import os
+import queue
+import struct
+import threading
+import time
+import lzma
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from game_state import ScenarioPhase
+
+RECORDING_VERSION = 1
+FILE_MAGIC = b"DOJOREC"
+# version, number of columns
+FILE_HEADER = struct.Struct("<7sBH")
+# ticks, compressed size
+CHUNK_HEADER = struct.Struct("<II")
+# One minute of play at 120 Hz
+CHUNK_TICKS = 7200
+MAX_CARS = 8
+MAX_RECORDINGS = 50
+COMPRESSION_PRESET = 9
+NO_SCENARIO = -1
+
+_PHYSICS = ("x", "y", "z", "vx", "vy", "vz", "pitch", "yaw", "roll")
+# Whole units for locations and velocities, thousandths of a radian for rotations
+_PHYSICS_SCALES = (1, 1, 1, 1, 1, 1, 1000, 1000, 1000)
+
+COLUMNS = ["tick", "time", "gym_mode", "phase", "scenario", "blue_score", "orange_score", "num_cars",
+           *(f"ball {field}" for field in _PHYSICS),
+           *(f"car{index} {field}" for index in range(MAX_CARS) for field in (*_PHYSICS, "boost"))]
+# Value of one step of the fixed point encoding of each column, times are kept to the millisecond
+COLUMN_SCALES = np.array([1, 1000, 1, 1, 1, 1, 1, 1, *_PHYSICS_SCALES, *(list(_PHYSICS_SCALES) + [1]) * MAX_CARS],
+                         dtype=np.float64)
+
+
+class RepRecord(BaseModel):
+    """Ticks of one rep, from its start to the tick after its end"""
+    scenario: int
+    start_tick: int
+    end_tick: Optional[int] = None
+    # Outcome stats key of the scenario, see outcome_stats.scenario_key
+    key: Optional[str] = None
+
+
+class RecordingIndex(BaseModel):
+    version: int = RECORDING_VERSION
+    columns: List[str] = Field(default_factory=lambda: list(COLUMNS))
+    # File offset, first tick and number of ticks of every chunk
+    chunks: List[Tuple[int, int, int]] = Field(default_factory=list)
+    reps: List[RepRecord] = Field(default_factory=list)
+
+
+def encode_chunk(rows: np.ndarray) -> bytes:
+    """Compress a (ticks, columns) block of values"""
+    fixed = np.round(rows * COLUMN_SCALES).astype(np.int32)
+    # The first row is kept as is, every other one as its change from the row before
+    deltas = np.diff(fixed, axis=0, prepend=np.zeros((1, fixed.shape[1]), dtype=np.int32))
+    zigzag = ((deltas << 1) ^ (deltas >> 31)).view(np.uint32)
+    # Each column's deltas next to each other, then each byte of those in its own plane
+    planes = np.ascontiguousarray(zigzag.T).view(np.uint8).reshape(-1, 4).T
+    return lzma.compress(planes.tobytes(), preset=COMPRESSION_PRESET)
+
+
+def decode_chunk(data: bytes, ticks: int) -> np.ndarray:
+    planes = np.frombuffer(lzma.decompress(data), dtype=np.uint8).reshape(4, -1)
+    zigzag = np.ascontiguousarray(planes.T).view(np.uint32).reshape(len(COLUMNS), ticks).T
+    deltas = (zigzag >> 1).astype(np.int64) ^ -(zigzag & 1).astype(np.int64)
+    return np.cumsum(deltas, axis=0, dtype=np.int64) / COLUMN_SCALES
+
+
+class SessionRecorder:
+    """Records packets into chunk buffers, which a background thread compresses and writes out"""
+
+    def __init__(self, session_path: Optional[str] = None):
+        self.session_path = session_path or _new_session_path()
+        self.index_path = os.path.splitext(self.session_path)[0] + ".json"
+        self._index = RecordingIndex()
+        self._buffer = np.zeros((CHUNK_TICKS, len(COLUMNS)))
+        self._spare_buffers = queue.Queue()
+        self._spare_buffers.put(np.zeros_like(self._buffer))
+        self._row = 0
+        self._tick = 0
+        self._chunk_start = 0
+        self._rep: Optional[RepRecord] = None
+
+        with open(self.session_path, "wb") as f:
+            f.write(FILE_HEADER.pack(FILE_MAGIC, RECORDING_VERSION, len(COLUMNS)))
+        # Only the writer thread touches these
+        self._offset = FILE_HEADER.size
+        self._written_chunks = []
+        self._chunks = queue.Queue()
+        self._writer = threading.Thread(target=self._write_chunks, name="SessionRecorderThread", daemon=True)
+        self._writer.start()
+        print(f"Recording session to {self.session_path}")
+
+    def record(self, packet, game_state, scenario_id: int = NO_SCENARIO):
+        """Add one tick"""
+        # A rep runs while its scenario is active
+        active = game_state.game_phase == ScenarioPhase.ACTIVE
+        if active and self._rep is None:
+            self._rep = RepRecord(scenario=scenario_id, start_tick=self._tick, key=game_state.current_scenario_key)
+            self._index.reps.append(self._rep)
+        elif not active and self._rep is not None:
+            self._rep.end_tick = self._tick
+            self._rep = None
+
+        num_cars = min(packet.num_cars, MAX_CARS)
+        row = [self._tick, packet.game_info.seconds_elapsed, game_state.gym_mode.value, game_state.game_phase.value,
+               scenario_id, packet.teams[0].score, packet.teams[1].score, num_cars]
+        row.extend(_physics(packet.game_ball.physics))
+        for index in range(num_cars):
+            car = packet.game_cars[index]
+            row.extend(_physics(car.physics))
+            row.append(car.boost)
+        buffer_row = self._buffer[self._row]
+        buffer_row[:len(row)] = row
+        # Cars that left keep zeros, which compress to nothing
+        buffer_row[len(row):] = 0
+
+        self._row += 1
+        self._tick += 1
+        if self._row == CHUNK_TICKS:
+            self._flush()
+
+    def close(self):
+        """Write out the chunk being filled and wait for the background thread to finish"""
+        if self._rep is not None:
+            self._rep.end_tick = self._tick
+            self._rep = None
+        if self._row:
+            self._flush()
+        # No more chunks, only the final reps
+        self._chunks.put((None, 0, self._tick, self._index.model_copy(deep=True)))
+        self._writer.join()
+
+    def _flush(self):
+        # Swap in a spare buffer so the next tick never waits for the writer, making a new one if it is behind
+        try:
+            spare = self._spare_buffers.get_nowait()
+        except queue.Empty:
+            spare = np.zeros_like(self._buffer)
+        # The reps go with the chunk as they are now, they keep changing on this thread
+        self._chunks.put((self._buffer, self._row, self._chunk_start, self._index.model_copy(deep=True)))
+        self._buffer = spare
+        self._chunk_start = self._tick
+        self._row = 0
+
+    def _write_chunks(self):
+        while True:
+            buffer, ticks, first_tick, index = self._chunks.get()
+            if buffer is not None:
+                data = encode_chunk(buffer[:ticks])
+                self._spare_buffers.put(buffer)
+                with open(self.session_path, "ab") as f:
+                    f.write(CHUNK_HEADER.pack(ticks, len(data)))
+                    f.write(data)
+                self._written_chunks.append((self._offset, first_tick, ticks))
+                self._offset += CHUNK_HEADER.size + len(data)
+            index.chunks = list(self._written_chunks)
+            with open(self.index_path, "w") as f:
+                f.write(index.model_dump_json())
+            if buffer is None:
+                return
+
+
+def _physics(physics) -> Tuple[float, ...]:
+    location = physics.location
+    velocity = physics.velocity
+    rotation = physics.rotation
+    return (location.x, location.y, location.z, velocity.x, velocity.y, velocity.z,
+            rotation.pitch, rotation.yaw, rotation.roll)
+
+
+class SessionReader:
+    """Reads a recorded session one chunk at a time"""
+
+    def __init__(self, session_path: str):
+        self.session_path = session_path
+        index_path = os.path.splitext(session_path)[0] + ".json"
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                self.index = RecordingIndex.model_validate_json(f.read())
+        else:
+            self.index = RecordingIndex()
+        with open(session_path, "rb") as f:
+            magic, version, num_columns = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != FILE_MAGIC or version != RECORDING_VERSION or num_columns != len(COLUMNS):
+            raise ValueError(f"{os.path.basename(session_path)} is not a version {RECORDING_VERSION} session recording")
+        self._scan_chunks()
+
+    @property
+    def reps(self) -> List[RepRecord]:
+        return self.index.reps
+
+    @property
+    def num_ticks(self) -> int:
+        if not self.index.chunks:
+            return 0
+        _, first_tick, ticks = self.index.chunks[-1]
+        return first_tick + ticks
+
+    @staticmethod
+    def column(name: str) -> int:
+        return COLUMNS.index(name)
+
+    def chunks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """First tick and values of every chunk, in order"""
+        with open(self.session_path, "rb") as f:
+            for offset, first_tick, ticks in self.index.chunks:
+                yield first_tick, self._read_chunk(f, offset)
+
+    def read_ticks(self, start: int, end: int) -> np.ndarray:
+        """Values of ticks start to end, decoding only the chunks they are in"""
+        parts = []
+        with open(self.session_path, "rb") as f:
+            for offset, first_tick, ticks in self.index.chunks:
+                if first_tick < end and first_tick + ticks > start:
+                    rows = self._read_chunk(f, offset)
+                    parts.append(rows[max(start - first_tick, 0):end - first_tick])
+        return np.concatenate(parts) if parts else np.zeros((0, len(COLUMNS)))
+
+    def read_rep(self, rep: RepRecord) -> np.ndarray:
+        return self.read_ticks(rep.start_tick, rep.end_tick if rep.end_tick is not None else self.num_ticks)
+
+    def _read_chunk(self, f, offset: int) -> np.ndarray:
+        f.seek(offset)
+        ticks, size = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+        return decode_chunk(f.read(size), ticks)
+
+    def _scan_chunks(self):
+        """Find every chunk from their headers, the index misses those written after it was last saved"""
+        self.index.chunks = []
+        offset, next_tick = FILE_HEADER.size, 0
+        file_size = os.path.getsize(self.session_path)
+        with open(self.session_path, "rb") as f:
+            while offset + CHUNK_HEADER.size <= file_size:
+                f.seek(offset)
+                ticks, size = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+                if offset + CHUNK_HEADER.size + size > file_size:
+                    # Cut short by a crash
+                    break
+                self.index.chunks.append((offset, next_tick, ticks))
+                offset += CHUNK_HEADER.size + size
+                next_tick += ticks
+
+
+def get_recordings() -> List[str]:
+    """Paths of the recorded sessions, oldest first"""
+    recordings_path = _get_recordings_path()
+    return [os.path.join(recordings_path, file) for file in sorted(os.listdir(recordings_path)) if file.endswith(".rec")]
+
+
+def _get_recordings_path():
+    appdata_path = os.path.expandvars("%APPDATA%")
+    if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "Recordings")):
+        os.makedirs(os.path.join(appdata_path, "RLBot", "Dojo", "Recordings"))
+    return os.path.join(appdata_path, "RLBot", "Dojo", "Recordings")
+
+
+def _new_session_path():
+    """Get a file path for a new recording, removing the oldest recordings"""
+    recordings = get_recordings()
+    for file_path in recordings[:max(0, len(recordings) - MAX_RECORDINGS + 1)]:
+        os.remove(file_path)
+        index_path = os.path.splitext(file_path)[0] + ".json"
+        if os.path.exists(index_path):
+            os.remove(index_path)
+    return os.path.join(_get_recordings_path(), f"session_{time.strftime('%Y%m%d_%H%M%S')}.rec")
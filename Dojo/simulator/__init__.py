@@ -0,0 +1,5 @@
+from .ball import BallPrediction, simulate_balls, step_balls, predict_scenarios, DEFAULT_DURATION
+from .arena import Arena, NullRenderer
+from .agents import AttackAgent, ShadowAgent
+from .intercept import time_to_ball, scenario_times_to_ball, times_to_ball_from_states, packet_times_to_ball, unfair
+from .spawn import spawn_scenario
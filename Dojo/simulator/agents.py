@@ -0,0 +1,77 @@
+"""
+Scripted stand-in players for simulated sessions.
+
+They only need to play well enough to finish reps the way a human or bot
+would: the attacker drives through the ball toward the opposing net, the
+defender stays between the ball and its own net and challenges once it is
+goal side. Both read the same GameTickPacket fields a real bot would.
+"""
+
+import math
+
+from rlbot.agents.base_agent import SimpleControllerState
+
+from constants import SIDE_WALL, BACK_WALL
+
+BLUE_TEAM = 0
+# How far behind the ball the attacker lines up, so it pushes the ball toward the target
+APPROACH_OFFSET = 120
+STEER_GAIN = 3
+BOOST_ANGLE = 0.3
+BOOST_DISTANCE = 1000
+SHADOW_FRACTION = 0.35
+CHALLENGE_DISTANCE = 1200
+
+
+class AttackAgent:
+    """Drives at the ball from behind, aiming it at the opposing net"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def get_output(self, packet) -> SimpleControllerState:
+        car = packet.game_cars[self.index]
+        ball = packet.game_ball.physics.location
+        target_y = -BACK_WALL if car.team == BLUE_TEAM else BACK_WALL
+        return self._drive_to_ball(car, ball.x, ball.y, 0, target_y)
+
+    @staticmethod
+    def _drive_to_ball(car, ball_x, ball_y, aim_x, aim_y):
+        # Approach from the side of the ball opposite the aim point
+        aim_distance = math.hypot(aim_x - ball_x, aim_y - ball_y) or 1
+        target_x = ball_x - (aim_x - ball_x) / aim_distance * APPROACH_OFFSET
+        target_y = ball_y - (aim_y - ball_y) / aim_distance * APPROACH_OFFSET
+        return _drive_to(car, target_x, target_y)
+
+
+class ShadowAgent(AttackAgent):
+    """Falls back between the ball and its own net, and challenges once it is goal side and close"""
+
+    def get_output(self, packet) -> SimpleControllerState:
+        car = packet.game_cars[self.index]
+        ball = packet.game_ball.physics.location
+        location = car.physics.location
+        own_goal_y = BACK_WALL if car.team == BLUE_TEAM else -BACK_WALL
+
+        goal_side = abs(location.y - own_goal_y) < abs(ball.y - own_goal_y)
+        if goal_side and math.hypot(ball.x - location.x, ball.y - location.y) < CHALLENGE_DISTANCE:
+            # Clear upfield toward the sideline the ball is already on
+            return self._drive_to_ball(car, ball.x, ball.y, math.copysign(SIDE_WALL, ball.x), 2 * ball.y - own_goal_y)
+
+        target_x = ball.x * (1 - SHADOW_FRACTION)
+        target_y = ball.y + (own_goal_y - ball.y) * SHADOW_FRACTION
+        return _drive_to(car, target_x, target_y)
+
+
+def _drive_to(car, target_x, target_y) -> SimpleControllerState:
+    location = car.physics.location
+    yaw = car.physics.rotation.yaw
+    angle = math.atan2(target_y - location.y, target_x - location.x) - yaw
+    angle = (angle + math.pi) % (2 * math.pi) - math.pi
+
+    controls = SimpleControllerState()
+    controls.steer = max(-1.0, min(1.0, angle * STEER_GAIN))
+    controls.throttle = 1.0
+    controls.boost = (abs(angle) < BOOST_ANGLE
+                      and math.hypot(target_x - location.x, target_y - location.y) > BOOST_DISTANCE)
+    return controls
@@ -0,0 +1,375 @@
+"""
+In-process stand-in for Rocket League, for running Dojo's game modes without the game.
+
+Arena implements the parts of the game interface Dojo uses: set_game_state, a
+renderer, and GameTickPacket with ball and car physics, team scores,
+latest_touch and the kickoff flag. The physics is deliberately simple:
+- The ball uses the model in simulator.ball
+- Cars drive on the ground with throttle, boost and speed-dependent turning,
+  and fall when they are spawned in the air. They never jump, flip or drive on walls
+- A car touches the ball when the ball overlaps a sphere around its hitbox,
+  which bounces the ball off the car
+- Cars do not collide with each other
+Time only advances when step() is called, so it runs as fast as the CPU allows.
+"""
+
+import math
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from rlbot.agents.base_agent import SimpleControllerState
+from rlbot.utils.structures.game_data_struct import GameTickPacket
+
+from constants import SIDE_WALL, BACK_WALL, GOAL_DEPTH, CORNER_OFFSET, BALL_RADIUS, GRAVITY, TICK_RATE
+from .ball import step_balls, GOAL_LINE
+
+# Bump whenever a change to the physics or the agents changes simulated results
+SIMULATOR_VERSION = 1
+
+BLUE_TEAM = 0
+ORANGE_TEAM = 1
+
+# Car handling, from the usual community measurements of the Octane
+CAR_REST_HEIGHT = 17
+CAR_MAX_SPEED = 2300
+SUPERSONIC_SPEED = 2200
+BOOST_ACCELERATION = 991.667
+BOOST_USAGE = 33.3  # Boost per second
+BRAKE_ACCELERATION = 3500
+COAST_ACCELERATION = 525
+THROTTLE_ACCELERATION = 1600
+THROTTLE_MAX_SPEED = 1410
+# Turn curvature (1 / radius) at each speed
+CURVATURE_SPEEDS = [0, 500, 1000, 1500, 1750, 2300]
+CURVATURES = [0.0069, 0.00398, 0.00235, 0.001375, 0.0011, 0.00088]
+
+# Touches use a sphere around the hitbox center, offset forward and up from the car's origin
+CAR_HIT_RADIUS = 60
+CAR_HITBOX_OFFSET = (13.88, 20.75)
+CAR_BALL_RESTITUTION = 0.6
+CAR_WALL_MARGIN = 60
+
+KICKOFF_COUNTDOWN = 3.0
+KICKOFF_Y = 4608
+
+
+class NullRenderer:
+    """Renderer that accepts every drawing call and draws nothing"""
+
+    def __getattr__(self, name):
+        return _ignore
+
+
+def _ignore(*args, **kwargs):
+    return None
+
+
+class Arena:
+    """Simulated match that stands in for the game interface and the game tick packet"""
+
+    def __init__(self, teams: Sequence[int] = (BLUE_TEAM, ORANGE_TEAM), names: Optional[Sequence[str]] = None,
+                 goal_reset: bool = True, dt: float = 1 / TICK_RATE):
+        self.renderer = NullRenderer()
+        self.teams = list(teams)
+        self.names = list(names) if names else [f"Car {index}" for index in range(len(self.teams))]
+        self.goal_reset = goal_reset
+        self.dt = dt
+
+        self.time = 0.0
+        self.frame = 0
+        self.scores = [0, 0]
+        self.kickoff_time_left = 0.0
+        # Set when a goal is scored with goal reset disabled, the ball sits in the net until it is state set out
+        self.ball_in_goal = False
+        self.touches = 0
+
+        self.ball_location = np.array([[0.0], [0.0], [BALL_RADIUS]])
+        self.ball_velocity = np.zeros((3, 1))
+        self.ball_rotation = [0.0, 0.0, 0.0]
+        self.ball_angular_velocity = [0.0, 0.0, 0.0]
+        self._ball_gravity = np.array([GRAVITY * dt])
+
+        count = len(self.teams)
+        self.car_location = np.zeros((count, 3))
+        self.car_velocity = np.zeros((count, 3))
+        self.car_rotation = np.zeros((count, 3))  # Pitch, yaw, roll
+        self.car_angular_velocity = np.zeros((count, 3))
+        self.car_boost = np.full(count, 33.0)
+        self.car_goals = [0] * count
+
+        self.packet = GameTickPacket()
+        self._setup_packet()
+        self._place_for_kickoff()
+
+    @property
+    def num_cars(self):
+        return len(self.teams)
+
+    @property
+    def is_kickoff_pause(self):
+        return self.kickoff_time_left > 0
+
+    def set_game_state(self, game_state):
+        """Apply an rlbot GameState, leaving anything set to None untouched"""
+        if game_state.ball is not None and game_state.ball.physics is not None:
+            physics = game_state.ball.physics
+            ball_location = self.ball_location[:, 0]
+            ball_velocity = self.ball_velocity[:, 0]
+            if _apply_vector(ball_location, physics.location):
+                self.ball_in_goal = False
+            _apply_vector(ball_velocity, physics.velocity)
+            _apply_rotator(self.ball_rotation, physics.rotation)
+            _apply_vector(self.ball_angular_velocity, physics.angular_velocity)
+
+        for index, car_state in (game_state.cars or {}).items():
+            if index >= self.num_cars or car_state is None:
+                continue
+            if car_state.physics is not None:
+                _apply_vector(self.car_location[index], car_state.physics.location)
+                _apply_vector(self.car_velocity[index], car_state.physics.velocity)
+                _apply_rotator(self.car_rotation[index], car_state.physics.rotation)
+                _apply_vector(self.car_angular_velocity[index], car_state.physics.angular_velocity)
+            if car_state.boost_amount is not None:
+                self.car_boost[index] = car_state.boost_amount
+
+    def step(self, controls: Optional[Dict[int, SimpleControllerState]] = None):
+        """Advance the match by one tick, with controls for any of the cars"""
+        self.time += self.dt
+        self.frame += 1
+        # Everything is frozen during the kickoff countdown, state setting still applies
+        if self.is_kickoff_pause:
+            self.kickoff_time_left -= self.dt
+            return
+
+        controls = controls or {}
+        for index in range(self.num_cars):
+            self._step_car(index, controls.get(index))
+
+        if self.ball_in_goal:
+            return
+        step_balls(self.ball_location, self.ball_velocity, self._ball_gravity, self.dt)
+        for index in range(self.num_cars):
+            self._touch_ball(index)
+        self._check_goal()
+
+    def get_packet(self) -> GameTickPacket:
+        """Get the packet for the current tick. The same packet object is reused, like the game interface does"""
+        packet = self.packet
+        game_info = packet.game_info
+        game_info.seconds_elapsed = self.time
+        game_info.frame_num = self.frame
+        game_info.is_kickoff_pause = self.is_kickoff_pause
+        game_info.is_round_active = not self.is_kickoff_pause
+
+        _write_physics(packet.game_ball.physics, self.ball_location[:, 0].tolist(), self.ball_velocity[:, 0].tolist(),
+                       self.ball_rotation, self.ball_angular_velocity)
+
+        locations = self.car_location.tolist()
+        velocities = self.car_velocity.tolist()
+        rotations = self.car_rotation.tolist()
+        angular_velocities = self.car_angular_velocity.tolist()
+        for index in range(self.num_cars):
+            car = packet.game_cars[index]
+            _write_physics(car.physics, locations[index], velocities[index], rotations[index], angular_velocities[index])
+            car.boost = int(self.car_boost[index])
+            car.has_wheel_contact = locations[index][2] <= CAR_REST_HEIGHT + 1
+            car.is_super_sonic = math.hypot(*velocities[index]) >= SUPERSONIC_SPEED
+            car.score_info.goals = self.car_goals[index]
+
+        for team in (BLUE_TEAM, ORANGE_TEAM):
+            packet.teams[team].score = self.scores[team]
+        return packet
+
+    def _setup_packet(self):
+        packet = self.packet
+        packet.num_cars = self.num_cars
+        packet.num_teams = 2
+        packet.game_info.world_gravity_z = GRAVITY
+        packet.game_info.game_speed = 1.0
+        packet.game_info.is_unlimited_time = True
+        for team in (BLUE_TEAM, ORANGE_TEAM):
+            packet.teams[team].team_index = team
+        for index, (team, name) in enumerate(zip(self.teams, self.names)):
+            car = packet.game_cars[index]
+            car.team = team
+            car.name = name
+            car.is_bot = index != 0
+            car.spawn_id = index
+
+    def _place_for_kickoff(self):
+        """Reset the ball and cars to kickoff positions and start the countdown"""
+        self.ball_location[:, 0] = (0, 0, BALL_RADIUS)
+        self.ball_velocity[:] = 0
+        self.ball_in_goal = False
+        team_counts = [0, 0]
+        for index, team in enumerate(self.teams):
+            # Extra teammates line up beside the first car of their team
+            slot = team_counts[team]
+            team_counts[team] += 1
+            side = -1 if team == BLUE_TEAM else 1
+            offset = (slot + 1) // 2 * 512 * (1 if slot % 2 else -1)
+            self.car_location[index] = (offset, side * KICKOFF_Y, CAR_REST_HEIGHT)
+            self.car_velocity[index] = 0
+            self.car_rotation[index] = (0, -side * math.pi / 2, 0)
+            self.car_angular_velocity[index] = 0
+            self.car_boost[index] = 33
+        self.kickoff_time_left = KICKOFF_COUNTDOWN
+
+    def _step_car(self, index, controls):
+        dt = self.dt
+        location = self.car_location[index]
+        velocity = self.car_velocity[index]
+        rotation = self.car_rotation[index]
+        x, y, z = location.tolist()
+        velocity_x, velocity_y, velocity_z = velocity.tolist()
+
+        # Airborne cars just fall and land flat
+        if z > CAR_REST_HEIGHT + 1 or velocity_z > 0:
+            velocity_z += GRAVITY * dt
+            x += velocity_x * dt
+            y += velocity_y * dt
+            z += velocity_z * dt
+            if z <= CAR_REST_HEIGHT:
+                z = CAR_REST_HEIGHT
+                velocity_z = 0
+                rotation[0] = rotation[2] = 0
+            location[:] = _clamp_to_arena(x, y, z)
+            velocity[:] = (velocity_x, velocity_y, velocity_z)
+            return
+
+        yaw = rotation[1]
+        forward_x, forward_y = math.cos(yaw), math.sin(yaw)
+        speed = velocity_x * forward_x + velocity_y * forward_y
+        throttle = controls.throttle if controls else 0
+        steer = controls.steer if controls else 0
+
+        acceleration = 0
+        if controls and controls.boost and self.car_boost[index] > 0:
+            acceleration += BOOST_ACCELERATION
+            self.car_boost[index] = max(0, self.car_boost[index] - BOOST_USAGE * dt)
+            throttle = 1
+        if throttle * speed < 0:
+            acceleration += math.copysign(BRAKE_ACCELERATION, throttle)
+        elif throttle != 0:
+            acceleration += throttle * _throttle_acceleration(abs(speed))
+        elif abs(speed) < COAST_ACCELERATION * dt:
+            speed = 0
+        else:
+            acceleration -= math.copysign(COAST_ACCELERATION, speed)
+        speed = max(-CAR_MAX_SPEED, min(CAR_MAX_SPEED, speed + acceleration * dt))
+
+        yaw_rate = steer * _curvature(abs(speed)) * speed
+        yaw = (yaw + yaw_rate * dt + math.pi) % (2 * math.pi) - math.pi
+        forward_x, forward_y = math.cos(yaw), math.sin(yaw)
+        velocity_x, velocity_y = forward_x * speed, forward_y * speed
+
+        location[:] = _clamp_to_arena(x + velocity_x * dt, y + velocity_y * dt, CAR_REST_HEIGHT)
+        velocity[:] = (velocity_x, velocity_y, 0)
+        rotation[:] = (0, yaw, 0)
+        self.car_angular_velocity[index] = (0, 0, yaw_rate)
+
+    def _touch_ball(self, index):
+        x, y, z = self.car_location[index].tolist()
+        pitch, yaw, roll = self.car_rotation[index].tolist()
+        forward_offset, up_offset = CAR_HITBOX_OFFSET
+        center = np.array([x + math.cos(yaw) * forward_offset, y + math.sin(yaw) * forward_offset, z + up_offset])
+
+        ball = self.ball_location[:, 0]
+        offset = ball - center
+        distance = math.sqrt(offset @ offset)
+        reach = BALL_RADIUS + CAR_HIT_RADIUS
+        if distance >= reach or distance == 0:
+            return
+
+        normal = offset / distance
+        ball_velocity = self.ball_velocity[:, 0]
+        closing_speed = (ball_velocity - self.car_velocity[index]) @ normal
+        if closing_speed < 0:
+            ball_velocity -= (1 + CAR_BALL_RESTITUTION) * closing_speed * normal
+        ball[:] = center + normal * reach
+
+        touch = self.packet.game_ball.latest_touch
+        touch.player_name = self.names[index]
+        touch.player_index = index
+        touch.team = self.teams[index]
+        touch.time_seconds = self.time
+        _write_vector(touch.hit_location, (center + normal * CAR_HIT_RADIUS).tolist())
+        _write_vector(touch.hit_normal, normal.tolist())
+        self.touches += 1
+
+    def _check_goal(self):
+        ball_y = self.ball_location[1, 0]
+        if abs(ball_y) <= GOAL_LINE:
+            return
+
+        # The ball going in the orange net at +y is a goal for blue
+        team = BLUE_TEAM if ball_y > 0 else ORANGE_TEAM
+        self.scores[team] += 1
+        touch = self.packet.game_ball.latest_touch
+        if touch.team == team and touch.player_index < self.num_cars:
+            self.car_goals[touch.player_index] += 1
+
+        if self.goal_reset:
+            self._place_for_kickoff()
+        else:
+            self.ball_location[1, 0] = math.copysign(-BACK_WALL + GOAL_DEPTH / 2, ball_y)
+            self.ball_velocity[:] = 0
+            self.ball_in_goal = True
+
+
+def _throttle_acceleration(speed):
+    """Throttle acceleration falls off linearly from 1600 at rest to 160 at 1400, then to 0 at 1410"""
+    if speed < 1400:
+        return THROTTLE_ACCELERATION - (THROTTLE_ACCELERATION - 160) * speed / 1400
+    if speed < THROTTLE_MAX_SPEED:
+        return 160 * (THROTTLE_MAX_SPEED - speed) / (THROTTLE_MAX_SPEED - 1400)
+    return 0
+
+
+def _curvature(speed):
+    return float(np.interp(speed, CURVATURE_SPEEDS, CURVATURES))
+
+
+def _clamp_to_arena(x, y, z):
+    """Keep a car inside the walls and corners"""
+    side_wall = SIDE_WALL - CAR_WALL_MARGIN
+    back_wall = -BACK_WALL - CAR_WALL_MARGIN
+    x = max(-side_wall, min(side_wall, x))
+    y = max(-back_wall, min(back_wall, y))
+    corner = -BACK_WALL + SIDE_WALL - CORNER_OFFSET - CAR_WALL_MARGIN * math.sqrt(2)
+    excess = abs(x) + abs(y) - corner
+    if excess > 0:
+        x -= math.copysign(excess / 2, x)
+        y -= math.copysign(excess / 2, y)
+    return x, y, z
+
+
+def _apply_vector(target, vector):
+    """Copy the set components of an rlbot Vector3 into target, returns whether anything was set"""
+    if vector is None:
+        return False
+    changed = False
+    for axis, value in enumerate((vector.x, vector.y, vector.z)):
+        if value is not None:
+            target[axis] = value
+            changed = True
+    return changed
+
+
+def _apply_rotator(target, rotator):
+    if rotator is None:
+        return
+    for axis, value in enumerate((rotator.pitch, rotator.yaw, rotator.roll)):
+        if value is not None:
+            target[axis] = value
+
+
+def _write_vector(target, values):
+    target.x, target.y, target.z = values
+
+
+def _write_physics(physics, location, velocity, rotation, angular_velocity):
+    _write_vector(physics.location, location)
+    _write_vector(physics.velocity, velocity)
+    physics.rotation.pitch, physics.rotation.yaw, physics.rotation.roll = rotation
+    _write_vector(physics.angular_velocity, angular_velocity)
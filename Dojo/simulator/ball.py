@@ -0,0 +1,190 @@
+"""
+Batched ball physics for previewing and validating scenarios without the game.
+
+The model covers gravity, drag, the speed cap, bounces off the arena planes
+(floor, ceiling, side walls, back walls and the four corner planes) and the
+goal mouths. Spin is ignored. Every ball in a batch is stepped together with
+array operations, so predicting thousands of scenarios costs little more than
+predicting one.
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+from constants import (
+    SIDE_WALL, BACK_WALL, GOAL_WIDTH, CORNER_OFFSET, CEILING_HEIGHT, GOAL_HEIGHT,
+    BALL_RADIUS, GRAVITY, BALL_DRAG, BALL_MAX_SPEED, BALL_RESTITUTION, BALL_FRICTION, TICK_RATE
+)
+from scenario import Scenario, BALL_ROW, LOCATION, VELOCITY, SCENARIO_SHAPE
+
+DEFAULT_DURATION = 3.0
+DEFAULT_SAMPLE_EVERY = 4
+# A ball has scored once its center is this far past the center line
+GOAL_LINE = -BACK_WALL + BALL_RADIUS
+# Contacts slower than this are treated as rolling or resting, without a bounce or friction
+REST_SPEED = 20
+
+_DIAGONAL = np.sqrt(0.5)
+# Corner planes cut across where |x| + |y| reaches this, 1152 units in from both walls
+_CORNER_DISTANCE = -BACK_WALL + SIDE_WALL - CORNER_OFFSET
+
+_FLOOR_NORMAL = np.array([[0.0], [0.0], [1.0]])
+_CEILING_NORMAL = np.array([[0.0], [0.0], [-1.0]])
+
+# Contact limits for the ball's center
+_FLOOR = BALL_RADIUS
+_CEILING = CEILING_HEIGHT - BALL_RADIUS
+_SIDE_WALL = SIDE_WALL - BALL_RADIUS
+_BACK_WALL = -BACK_WALL - BALL_RADIUS
+_CORNER = _CORNER_DISTANCE - BALL_RADIUS / _DIAGONAL
+_GOAL_MOUTH_X = GOAL_WIDTH - BALL_RADIUS
+_GOAL_MOUTH_Z = GOAL_HEIGHT - BALL_RADIUS
+
+
+class BallPrediction:
+    """Predicted paths for a batch of balls"""
+
+    def __init__(self, positions, times, goal_time, goal_side, wall_time):
+        # (balls, samples, 3) locations, sampled at times
+        self.positions = positions
+        self.times = times
+        # Time of the first goal, NaN if the ball never goes in. goal_side is the sign of y of that goal
+        self.goal_time = goal_time
+        self.goal_side = goal_side
+        # Time of the first contact with anything but the floor, NaN if none
+        self.wall_time = wall_time
+
+    def __len__(self):
+        return len(self.positions)
+
+    def degenerate(self, min_goal_time=1.0, min_wall_time=0.0):
+        """Get a mask of balls that go in or hit a wall before anyone can reasonably play them"""
+        with np.errstate(invalid="ignore"):
+            return (self.goal_time < min_goal_time) | (self.wall_time < min_wall_time)
+
+    def path(self, index=0):
+        """Get the sampled locations of one ball as lists, up to its goal if it scores"""
+        positions = self.positions[index]
+        if not np.isnan(self.goal_time[index]):
+            positions = positions[:np.searchsorted(self.times, self.goal_time[index]) + 1]
+        return positions.tolist()
+
+
+def simulate_balls(locations, velocities, duration=DEFAULT_DURATION, dt=1 / TICK_RATE, sample_every=DEFAULT_SAMPLE_EVERY):
+    """
+    Predict the paths of a batch of balls from (N, 3) arrays of locations and velocities
+    A ball stops where it crosses a goal line
+    """
+    # Stored as (3, N) so every per-axis operation runs over contiguous memory
+    location = np.array(locations, dtype=np.float64).reshape(-1, 3).T.copy()
+    velocity = np.nan_to_num(np.array(velocities, dtype=np.float64).reshape(-1, 3).T.copy())
+    x, y, z = location
+    count = location.shape[1]
+    steps = int(round(duration / dt))
+
+    num_samples = steps // sample_every + 1
+    positions = np.empty((count, num_samples, 3))
+    positions[:, 0] = location.T
+    times = np.arange(num_samples) * (sample_every * dt)
+    goal_time = np.full(count, np.nan)
+    goal_side = np.zeros(count, dtype=np.int8)
+    wall_time = np.full(count, np.nan)
+
+    # Scored balls are frozen by zeroing their velocity and gravity
+    gravity_step = np.full(count, GRAVITY * dt)
+
+    for step in range(1, steps + 1):
+        for index in step_balls(location, velocity, gravity_step, dt):
+            first = index[np.isnan(wall_time[index])]
+            wall_time[first] = step * dt
+
+        index = np.flatnonzero((np.abs(y) > GOAL_LINE) & np.isnan(goal_time))
+        if len(index):
+            goal_time[index] = step * dt
+            goal_side[index] = np.sign(y[index])
+            velocity[:, index] = 0
+            gravity_step[index] = 0
+
+        if step % sample_every == 0:
+            positions[:, step // sample_every] = location.T
+
+    return BallPrediction(positions, times, goal_time, goal_side, wall_time)
+
+
+def step_balls(location, velocity, gravity_step, dt):
+    """
+    Advance (3, N) ball locations and velocities by one step, in place
+    gravity_step is the per-ball change in vertical speed, returns the indices of the balls touching each wall
+    """
+    x, y, z = location
+    velocity[2] += gravity_step
+    velocity *= 1 - BALL_DRAG * dt
+    speed_squared = (velocity * velocity).sum(axis=0)
+    too_fast = speed_squared > BALL_MAX_SPEED ** 2
+    if too_fast.any():
+        velocity[:, too_fast] *= BALL_MAX_SPEED / np.sqrt(speed_squared[too_fast])
+    location += velocity * dt
+
+    # Floor contacts happen every step for rolling balls, so only the rarer contacts count as walls
+    index = np.flatnonzero(z < _FLOOR)
+    if len(index):
+        _bounce(location, velocity, index, _FLOOR_NORMAL, z[index] - _FLOOR)
+
+    wall_hits = []
+    index = np.flatnonzero(z > _CEILING)
+    if len(index):
+        _bounce(location, velocity, index, _CEILING_NORMAL, _CEILING - z[index])
+        wall_hits.append(index)
+
+    abs_x = np.abs(x)
+    index = np.flatnonzero(abs_x > _SIDE_WALL)
+    if len(index):
+        side = np.sign(x[index])
+        _bounce(location, velocity, index, np.stack([-side, 0 * side, 0 * side]), _SIDE_WALL - abs_x[index])
+        wall_hits.append(index)
+
+    abs_y = np.abs(y)
+    index = np.flatnonzero((abs_y > _BACK_WALL) & ((abs_x >= _GOAL_MOUTH_X) | (z >= _GOAL_MOUTH_Z)))
+    if len(index):
+        side = np.sign(y[index])
+        _bounce(location, velocity, index, np.stack([0 * side, -side, 0 * side]), _BACK_WALL - abs_y[index])
+        wall_hits.append(index)
+
+    index = np.flatnonzero(abs_x + abs_y > _CORNER)
+    if len(index):
+        side_x = np.sign(x[index])
+        side_y = np.sign(y[index])
+        depth = (_CORNER - np.abs(x[index]) - np.abs(y[index])) * _DIAGONAL
+        _bounce(location, velocity, index, np.stack([-side_x * _DIAGONAL, -side_y * _DIAGONAL, 0 * side_x]), depth)
+        wall_hits.append(index)
+
+    return wall_hits
+
+
+def predict_scenarios(scenarios: Sequence[Scenario], duration=DEFAULT_DURATION, dt=1 / TICK_RATE, sample_every=DEFAULT_SAMPLE_EVERY):
+    """Predict the ball path of every scenario at once"""
+    balls = np.array([scenario.state[BALL_ROW] for scenario in scenarios]).reshape(-1, SCENARIO_SHAPE[1])
+    return simulate_balls(balls[:, LOCATION], balls[:, VELOCITY], duration, dt, sample_every)
+
+
+def _bounce(location, velocity, index, normal, depth):
+    """
+    Push the balls at index out of a surface and bounce them off it
+    normal is (3, 1) for a flat surface shared by every ball or (3, len(index)), depth is negative
+    """
+    velocity_hit = velocity[:, index]
+    location[:, index] -= normal * depth
+
+    normal_speed = (velocity_hit * normal).sum(axis=0)
+    # Slow contacts just lose their normal speed so resting and rolling balls stay on the surface
+    incoming = normal_speed < 0
+    bouncing = normal_speed < -REST_SPEED
+    normal_change = -normal_speed * incoming * (1 + BALL_RESTITUTION * bouncing)
+
+    # Coulomb friction takes speed off the tangent in proportion to the normal impulse
+    tangent_velocity = velocity_hit - normal * normal_speed
+    tangent_speed = np.sqrt((tangent_velocity * tangent_velocity).sum(axis=0))
+    friction = np.minimum(1, BALL_FRICTION * normal_change * bouncing / (tangent_speed + 1e-9))
+
+    velocity[:, index] = velocity_hit + normal * normal_change - tangent_velocity * friction
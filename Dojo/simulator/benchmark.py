@@ -0,0 +1,170 @@
+"""
+Run Dojo's scenario mode against the simulated arena and measure throughput.
+
+Usage, from the Dojo folder:
+    python -m simulator.benchmark --reps 1000
+    python -m simulator.benchmark --reps 5000 --playlist "Defensive Challenges Mix"
+
+ScenarioMode runs unmodified, fed one packet per tick the same way Dojo.run
+does, while scripted agents drive both cars. The report covers reps per
+simulated hour, the outcome of the reps and the CPU time per tick spent in
+Dojo and in the simulator.
+"""
+
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from car_layout import HUMAN_INDEX
+from game_state import DojoGameState, ScenarioPhase
+from game_modes import ScenarioMode
+from playlist import PlaylistRegistry
+from scenario import OffensiveMode, DefensiveMode
+from scenario_history import ScenarioHistory
+from .arena import Arena
+from .agents import AttackAgent, ShadowAgent
+
+# The bot of a 1v1 comes right after the human
+BOT_INDEX = HUMAN_INDEX + 1
+
+
+@dataclass
+class SessionStats:
+    """Results of a simulated session"""
+    reps: int = 0
+    ticks: int = 0
+    human_score: int = 0
+    bot_score: int = 0
+    touches: int = 0
+    simulated_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    dojo_seconds: float = 0.0
+    arena_seconds: float = 0.0
+    agent_seconds: float = 0.0
+
+    @property
+    def reps_per_hour(self) -> float:
+        return self.reps / self.simulated_seconds * 3600 if self.simulated_seconds else 0.0
+
+    @property
+    def realtime_factor(self) -> float:
+        return self.simulated_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+    def per_tick_us(self, seconds) -> float:
+        return seconds / self.ticks * 1e6 if self.ticks else 0.0
+
+    def report(self) -> str:
+        return "\n".join([
+            f"Reps: {self.reps} in {self.simulated_seconds / 60:.1f} simulated minutes ({self.reps_per_hour:.0f} reps/hour)",
+            f"Human: {self.human_score} Bot: {self.bot_score} Touches: {self.touches}",
+            f"Ticks: {self.ticks} in {self.wall_seconds:.2f}s ({self.realtime_factor:.1f}x real time)",
+            f"Per tick: Dojo {self.per_tick_us(self.dojo_seconds):.1f}us, "
+            f"simulator {self.per_tick_us(self.arena_seconds):.1f}us, agents {self.per_tick_us(self.agent_seconds):.1f}us",
+        ])
+
+
+def run_scenario_session(num_reps: int = 1000,
+                         playlist_name: Optional[str] = None,
+                         offensive_mode: OffensiveMode = OffensiveMode.POSSESSION,
+                         defensive_mode: DefensiveMode = DefensiveMode.NEAR_SHADOW,
+                         player_offense: bool = True,
+                         goal_reset: bool = False,
+                         quiet: bool = True) -> SessionStats:
+    """Play num_reps scenario reps in the simulator and collect timing and outcome stats"""
+    with tempfile.TemporaryDirectory() as history_dir:
+        # Keep the benchmark's reps out of the real session history
+        history = ScenarioHistory(session_path=os.path.join(history_dir, "session.bin"))
+        game_state = DojoGameState(scenario_history=history)
+        game_state.offensive_mode = offensive_mode
+        game_state.defensive_mode = defensive_mode
+        game_state.player_offense = player_offense
+        game_state.disable_goal_reset = not goal_reset
+        game_state.dojo_components_initialized = True
+
+        arena = Arena(names=["Human", "Bot"], goal_reset=goal_reset)
+        scenario_mode = ScenarioMode(game_state, arena)
+        if playlist_name:
+            scenario_mode.set_playlist_registry(PlaylistRegistry())
+            scenario_mode.set_playlist(playlist_name)
+
+        attackers = {index: AttackAgent(index) for index in (HUMAN_INDEX, BOT_INDEX)}
+        defenders = {index: ShadowAgent(index) for index in (HUMAN_INDEX, BOT_INDEX)}
+
+        stats = SessionStats()
+        with contextlib.ExitStack() as stack:
+            if quiet:
+                stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+
+            start_time = time.perf_counter()
+            # A rep is counted when it is set up, so stop when the one after the last starts
+            while True:
+                packet = arena.get_packet()
+                if game_state.game_phase == ScenarioPhase.SETUP:
+                    if stats.reps == num_reps:
+                        break
+                    stats.reps += 1
+
+                tick_start = time.perf_counter()
+                game_state.cur_time = packet.game_info.seconds_elapsed
+                game_state.ticks += 1
+                scenario_mode.update(packet)
+                agent_start = time.perf_counter()
+
+                offense_index = HUMAN_INDEX if game_state.player_offense else BOT_INDEX
+                controls = {}
+                if game_state.game_phase == ScenarioPhase.ACTIVE:
+                    for index in (HUMAN_INDEX, BOT_INDEX):
+                        agent = attackers[index] if index == offense_index else defenders[index]
+                        controls[index] = agent.get_output(packet)
+                arena_start = time.perf_counter()
+
+                arena.step(controls)
+                arena_end = time.perf_counter()
+
+                stats.dojo_seconds += agent_start - tick_start
+                stats.agent_seconds += arena_start - agent_start
+                stats.arena_seconds += arena_end - arena_start
+                stats.ticks += 1
+
+                if playlist_name and scenario_mode.current_playlist is None:
+                    break
+            stats.wall_seconds = time.perf_counter() - start_time
+
+        history.close()
+
+    stats.human_score = game_state.human_score
+    stats.bot_score = game_state.bot_score
+    stats.touches = arena.touches
+    stats.simulated_seconds = arena.time
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Dojo scenario reps in the local simulator")
+    parser.add_argument("--reps", type=int, default=1000)
+    parser.add_argument("--playlist", default=None, help="Name of a playlist to sample reps from")
+    parser.add_argument("--offense", default=OffensiveMode.POSSESSION.name, choices=[mode.name for mode in OffensiveMode])
+    parser.add_argument("--defense", default=DefensiveMode.NEAR_SHADOW.name, choices=[mode.name for mode in DefensiveMode])
+    parser.add_argument("--defend", action="store_true", help="Put the human stand-in on defense")
+    parser.add_argument("--goal-reset", action="store_true", help="Reset to kickoff after goals instead of using Disable Goal Reset")
+    parser.add_argument("--verbose", action="store_true", help="Show Dojo's own output")
+    args = parser.parse_args()
+
+    stats = run_scenario_session(
+        num_reps=args.reps,
+        playlist_name=args.playlist,
+        offensive_mode=OffensiveMode[args.offense],
+        defensive_mode=DefensiveMode[args.defense],
+        player_offense=not args.defend,
+        goal_reset=args.goal_reset,
+        quiet=not args.verbose,
+    )
+    print(stats.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Difficulty calibration of playlists from simulated rollouts.
+
+Every preset scenario of a playlist is generated with a range of seeds and
+played out in the arena simulator by the scripted agents, spread over a
+process pool. The result for each scenario config is the share of reps that
+end in a goal for the offense, a goal for the defense or a timeout, plus who
+gets to the ball first and how soon.
+
+Spawns are rerolled like ScenarioMode rerolls them (see spawn.py), so only
+scenarios players get are played. Rollouts are deterministic for a given
+seed, so their results are cached on disk keyed by GENERATOR_VERSION,
+SIMULATOR_VERSION, the reroll limits, the config, the playlist settings that
+affect play, and the seed. Rerunning an unchanged playlist
+only plays the seeds it has not seen yet.
+
+Usage, from the Dojo folder:
+    python -m simulator.calibration "Defensive Challenges Mix" --rollouts 2000
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from car_layout import HUMAN_INDEX
+from constants import BALL_GROUND_THRESHOLD, MIN_GOAL_TIME, MIN_WALL_TIME, SPAWN_ATTEMPTS, MAX_DEFENSE_LEAD
+from playlist import Playlist, PlaylistRegistry, PlayerRole, ScenarioConfig
+from scenario import OffensiveMode, DefensiveMode, CarRole, GENERATOR_VERSION
+from .arena import Arena, SIMULATOR_VERSION
+from .agents import AttackAgent, ShadowAgent
+from .spawn import spawn_scenario
+
+# The bot of a 1v1 comes right after the human
+BOT_INDEX = HUMAN_INDEX + 1
+NO_TOUCH = -1
+# Seeds played per task sent to the pool, large enough to amortize the round trip to the worker
+CHUNK_SIZE = 25
+# With rule zero a rep can run past its timeout while the ball is in the air, but not forever
+RULE_ZERO_LIMIT = 10.0
+# Configs where the offense scores less or more often than this are flagged as unbalanced
+UNBALANCED_RATE = 0.05
+
+
+class Outcome(Enum):
+    OFFENSE_GOAL = 0
+    DEFENSE_GOAL = 1
+    TIMEOUT = 2
+
+
+# outcome, duration, first touch (CarRole value or NO_TOUCH), time of first touch
+Rollout = Tuple[int, float, int, float]
+
+
+class RolloutCache(BaseModel):
+    """Rollout results of one scenario config, by seed"""
+    results: Dict[int, Tuple[int, float, int, float]] = Field(default_factory=dict)
+
+
+@dataclass
+class ConfigCalibration:
+    """Outcome distribution of one scenario config"""
+    config: ScenarioConfig
+    rollouts: int
+    offense_goal_rate: float
+    defense_goal_rate: float
+    timeout_rate: float
+    offense_first_touch_rate: float
+    median_first_touch_time: float
+    mean_duration: float
+
+    @property
+    def unbalanced(self) -> bool:
+        return not UNBALANCED_RATE <= self.offense_goal_rate <= 1 - UNBALANCED_RATE
+
+    def summary(self) -> str:
+        flag = "  <- unbalanced" if self.unbalanced else ""
+        return (f"{self.config.offensive_mode.name:>20} vs {self.config.defensive_mode.name:<16} "
+                f"({self.config.player_role.name.lower()}): "
+                f"offense {self.offense_goal_rate:5.1%}  defense {self.defense_goal_rate:5.1%}  "
+                f"timeout {self.timeout_rate:5.1%}  offense first {self.offense_first_touch_rate:5.1%}  "
+                f"first touch {self.median_first_touch_time:4.2f}s  rep {self.mean_duration:4.2f}s{flag}")
+
+
+def play_rollout(offensive_mode: OffensiveMode, defensive_mode: DefensiveMode, player_role: PlayerRole,
+                 seed: int, boost_range=None, timeout: float = 7.0, rule_zero: bool = False) -> Rollout:
+    """Generate one scenario the way ScenarioMode does and play it out with the scripted agents"""
+    np.random.seed(seed)
+    scenario, _, _ = spawn_scenario(offensive_mode, defensive_mode, player_role == PlayerRole.OFFENSE, boost_range,
+                                    verbose=False)
+
+    arena = Arena(goal_reset=False)
+    arena.kickoff_time_left = 0
+    arena.set_game_state(scenario.GetGameState())
+
+    offense_index = HUMAN_INDEX if player_role == PlayerRole.OFFENSE else BOT_INDEX
+    defense_index = BOT_INDEX if player_role == PlayerRole.OFFENSE else HUMAN_INDEX
+    offense_team = arena.teams[offense_index]
+    attacker = AttackAgent(offense_index)
+    defender = ShadowAgent(defense_index)
+
+    first_touch = NO_TOUCH
+    first_touch_time = -1.0
+    while True:
+        packet = arena.get_packet()
+        arena.step({offense_index: attacker.get_output(packet), defense_index: defender.get_output(packet)})
+
+        if first_touch == NO_TOUCH and arena.touches:
+            touch = arena.packet.game_ball.latest_touch
+            first_touch = (CarRole.OFFENSE if touch.player_index == offense_index else CarRole.DEFENSE).value
+            first_touch_time = arena.time
+
+        if arena.ball_in_goal:
+            outcome = Outcome.OFFENSE_GOAL if arena.scores[offense_team] else Outcome.DEFENSE_GOAL
+            break
+        if arena.time >= timeout:
+            ball_grounded = arena.ball_location[2, 0] < BALL_GROUND_THRESHOLD
+            if not rule_zero or ball_grounded or arena.time >= timeout + RULE_ZERO_LIMIT:
+                outcome = Outcome.TIMEOUT
+                break
+
+    return outcome.value, arena.time, first_touch, first_touch_time
+
+
+def _play_rollouts(task) -> List[Rollout]:
+    """Pool worker: play a chunk of seeds for one config"""
+    offensive_mode, defensive_mode, player_role, seeds, boost_range, timeout, rule_zero = task
+    return [play_rollout(offensive_mode, defensive_mode, player_role, seed, boost_range, timeout, rule_zero)
+            for seed in seeds]
+
+
+def calibrate_playlist(playlist: Playlist, num_rollouts: int = 1000, base_seed: int = 0,
+                       processes: Optional[int] = None, use_cache: bool = True) -> List[ConfigCalibration]:
+    """Play num_rollouts seeds of every preset scenario in the playlist and summarize the outcomes"""
+    settings = playlist.settings
+    seeds = range(base_seed, base_seed + num_rollouts)
+    configs = _unique_configs(playlist.scenarios)
+
+    caches = {}
+    tasks = []
+    num_missing = 0
+    for config in configs:
+        cache = _load_cache(config, playlist) if use_cache else RolloutCache()
+        caches[_config_key(config)] = cache
+        missing = [seed for seed in seeds if seed not in cache.results]
+        num_missing += len(missing)
+        for start in range(0, len(missing), CHUNK_SIZE):
+            chunk = missing[start:start + CHUNK_SIZE]
+            tasks.append((config, (config.offensive_mode, config.defensive_mode, config.player_role, chunk,
+                                   settings.boost_range, settings.timeout, settings.rule_zero)))
+
+    if tasks:
+        print(f"Playing {num_missing} rollouts of {playlist.name} ({len(seeds) * len(configs) - num_missing} cached)")
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for (config, task), results in zip(tasks, pool.map(_play_rollouts, [task for _, task in tasks])):
+                caches[_config_key(config)].results.update(zip(task[3], results))
+        if use_cache:
+            for config in configs:
+                _store_cache(caches[_config_key(config)], config, playlist)
+
+    return [_summarize(config, [caches[_config_key(config)].results[seed] for seed in seeds]) for config in configs]
+
+
+def _summarize(config: ScenarioConfig, rollouts: List[Rollout]) -> ConfigCalibration:
+    results = np.array(rollouts, dtype=np.float64).reshape(-1, 4)
+    outcomes = results[:, 0]
+    touched = results[:, 2] != NO_TOUCH
+    return ConfigCalibration(
+        config=config,
+        rollouts=len(results),
+        offense_goal_rate=float(np.mean(outcomes == Outcome.OFFENSE_GOAL.value)) if len(results) else 0.0,
+        defense_goal_rate=float(np.mean(outcomes == Outcome.DEFENSE_GOAL.value)) if len(results) else 0.0,
+        timeout_rate=float(np.mean(outcomes == Outcome.TIMEOUT.value)) if len(results) else 0.0,
+        offense_first_touch_rate=float(np.mean(results[touched, 2] == CarRole.OFFENSE.value)) if touched.any() else 0.0,
+        median_first_touch_time=float(np.median(results[touched, 3])) if touched.any() else float("nan"),
+        mean_duration=float(np.mean(results[:, 1])) if len(results) else 0.0,
+    )
+
+
+def _unique_configs(scenarios) -> List[ScenarioConfig]:
+    """Preset configs of a playlist, once each. Custom scenarios are not generated, so they are skipped"""
+    configs = {}
+    for config in scenarios:
+        configs.setdefault(_config_key(config), config)
+    return list(configs.values())
+
+
+def _config_key(config: ScenarioConfig) -> Tuple[str, str, str]:
+    return config.offensive_mode.name, config.defensive_mode.name, config.player_role.name
+
+
+def _cache_file_name(config: ScenarioConfig, playlist: Playlist) -> str:
+    settings = playlist.settings
+    boost_min, boost_max = settings.boost_range
+    spawn = f"a{SPAWN_ATTEMPTS}-{MIN_GOAL_TIME:g}-{MIN_WALL_TIME:g}-{MAX_DEFENSE_LEAD:g}"
+    return (f"g{GENERATOR_VERSION}_s{SIMULATOR_VERSION}_{spawn}_{'_'.join(_config_key(config))}"
+            f"_b{boost_min}-{boost_max}_t{settings.timeout:g}{'_r0' if settings.rule_zero else ''}.json")
+
+
+def _load_cache(config: ScenarioConfig, playlist: Playlist) -> RolloutCache:
+    file_path = os.path.join(_get_calibration_path(), _cache_file_name(config, playlist))
+    if not os.path.exists(file_path):
+        return RolloutCache()
+    with open(file_path, "r") as f:
+        return RolloutCache.model_validate_json(f.read())
+
+
+def _store_cache(cache: RolloutCache, config: ScenarioConfig, playlist: Playlist):
+    file_path = os.path.join(_get_calibration_path(), _cache_file_name(config, playlist))
+    with open(file_path, "w") as f:
+        f.write(cache.model_dump_json())
+
+
+def _get_calibration_path():
+    appdata_path = os.path.expandvars("%APPDATA%")
+    if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "Calibration")):
+        os.makedirs(os.path.join(appdata_path, "RLBot", "Dojo", "Calibration"))
+    return os.path.join(appdata_path, "RLBot", "Dojo", "Calibration")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the difficulty of a playlist with simulated rollouts")
+    parser.add_argument("playlist", help="Name of a preset or custom playlist")
+    parser.add_argument("--rollouts", type=int, default=1000, help="Seeds played per scenario config")
+    parser.add_argument("--seed", type=int, default=0, help="First seed")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    from custom_playlist import CustomPlaylistManager
+    registry = PlaylistRegistry()
+    registry.set_custom_playlist_manager(CustomPlaylistManager(renderer=None, main_menu_renderer=None))
+    playlist = registry.get_playlist(args.playlist)
+    if playlist is None:
+        print(f"Unknown playlist: {args.playlist}")
+        return
+
+    results = calibrate_playlist(playlist, args.rollouts, args.seed, args.processes, use_cache=not args.no_cache)
+    for result in results:
+        print(result.summary())
+
+
+if __name__ == "__main__":
+    main()
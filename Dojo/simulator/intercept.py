@@ -0,0 +1,140 @@
+"""
+Closed-form estimate of how long each car needs to reach the ball.
+
+A car first turns toward where the ball will be, at a fixed yaw rate, keeping
+the part of its speed that already points that way. It then drives straight
+with a constant average acceleration until it reaches its top speed: 2300
+while its boost lasts, 1410 on throttle alone. The ball moves in a straight
+line without bounces and can only be played once it is below jumping height,
+so the meeting time is found with a few fixed-point iterations.
+
+Everything is plain array math over a batch, so whole batches of generated
+scenarios can be checked at once and a live packet costs the same few calls.
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+from constants import SIDE_WALL, BACK_WALL, BALL_RADIUS, GRAVITY, MAX_DEFENSE_LEAD
+from scenario import Scenario, BALL_ROW, OFFENSE_ROW, DEFENSE_ROW, LOCATION, VELOCITY, YAW, BOOST
+
+# Average acceleration from rest to top speed, which is how long a full speedup takes in game
+THROTTLE_AVERAGE_ACCELERATION = 625
+BOOST_AVERAGE_ACCELERATION = 1355
+THROTTLE_MAX_SPEED = 1410
+CAR_MAX_SPEED = 2300
+BOOST_USAGE = 33.3  # Boost per second
+BRAKE_ACCELERATION = 3500
+# Yaw rate of a car turning at full lock, close to constant over the usual speeds
+TURN_RATE = 2.2
+# Distance between the car's center and the ball's center when they touch
+CONTACT_DISTANCE = BALL_RADIUS + 60
+# A ball whose center is above this can't be played without an aerial
+REACH_HEIGHT = 300
+ITERATIONS = 3
+
+_ARENA_X = SIDE_WALL - BALL_RADIUS
+_ARENA_Y = -BACK_WALL - BALL_RADIUS
+
+
+def time_to_ball(car_location, car_velocity, car_yaw, car_boost, ball_location, ball_velocity, iterations=ITERATIONS):
+    """
+    Estimate the time in seconds for each car to reach its ball
+    Locations and velocities are (N, 3) arrays, yaw and boost are (N,), one ball per car
+    """
+    car_location = np.asarray(car_location, dtype=np.float64).reshape(-1, 3)
+    car_velocity = np.asarray(car_velocity, dtype=np.float64).reshape(-1, 3)
+    ball_location = np.asarray(ball_location, dtype=np.float64).reshape(-1, 3)
+    ball_velocity = np.nan_to_num(np.asarray(ball_velocity, dtype=np.float64).reshape(-1, 3))
+    car_yaw = np.asarray(car_yaw, dtype=np.float64)
+    car_boost = np.asarray(car_boost, dtype=np.float64)
+
+    cos_yaw = np.cos(car_yaw)
+    sin_yaw = np.sin(car_yaw)
+    forward_speed = car_velocity[:, 0] * cos_yaw + car_velocity[:, 1] * sin_yaw
+    # Backing up has to be braked away first
+    brake_time = np.maximum(-forward_speed, 0) / BRAKE_ACCELERATION
+    forward_speed = np.maximum(forward_speed, 0)
+    boost_time = car_boost / BOOST_USAGE
+
+    reachable_time = _reachable_time(ball_location[:, 2], ball_velocity[:, 2])
+    arrival = reachable_time
+    for _ in range(iterations):
+        ball_x = np.clip(ball_location[:, 0] + ball_velocity[:, 0] * arrival, -_ARENA_X, _ARENA_X)
+        ball_y = np.clip(ball_location[:, 1] + ball_velocity[:, 1] * arrival, -_ARENA_Y, _ARENA_Y)
+        arrival = np.maximum(reachable_time, brake_time + _drive_time(
+            ball_x - car_location[:, 0], ball_y - car_location[:, 1], cos_yaw, sin_yaw, forward_speed, boost_time))
+    return arrival
+
+
+def _drive_time(dx, dy, cos_yaw, sin_yaw, forward_speed, boost_time):
+    """Time to turn toward and drive up to a point dx, dy away"""
+    distance = np.maximum(np.hypot(dx, dy) - CONTACT_DISTANCE, 0)
+    # Angle between the car's heading and the target, from the dot and cross products
+    angle = np.abs(np.arctan2(cos_yaw * dy - sin_yaw * dx, cos_yaw * dx + sin_yaw * dy))
+    turn_time = angle / TURN_RATE
+    initial_speed = forward_speed * np.maximum(np.cos(angle), 0)
+
+    # Boost raises the acceleration and the top speed, but only until it runs out
+    has_boost = boost_time > 0
+    acceleration = np.where(has_boost, BOOST_AVERAGE_ACCELERATION, THROTTLE_AVERAGE_ACCELERATION)
+    boosted_speed = np.clip(initial_speed + BOOST_AVERAGE_ACCELERATION * boost_time, THROTTLE_MAX_SPEED, CAR_MAX_SPEED)
+    max_speed = np.maximum(np.where(has_boost, boosted_speed, THROTTLE_MAX_SPEED), initial_speed)
+
+    speedup_time = (max_speed - initial_speed) / acceleration
+    speedup_distance = (initial_speed + max_speed) / 2 * speedup_time
+    accelerating_time = (np.sqrt(initial_speed ** 2 + 2 * acceleration * distance) - initial_speed) / acceleration
+    cruising_time = speedup_time + (distance - speedup_distance) / max_speed
+    return turn_time + np.where(distance < speedup_distance, accelerating_time, cruising_time)
+
+
+def _reachable_time(ball_z, ball_velocity_z):
+    """Time until a ball is low enough to play, assuming it falls freely"""
+    # Larger root of z + vz t + g t^2 / 2 = REACH_HEIGHT
+    discriminant = np.maximum(ball_velocity_z ** 2 + 2 * GRAVITY * (REACH_HEIGHT - ball_z), 0)
+    falling_time = (-ball_velocity_z - np.sqrt(discriminant)) / GRAVITY
+    return np.where(ball_z <= REACH_HEIGHT, 0.0, np.maximum(falling_time, 0))
+
+
+def unfair(times, wall_time=None, max_defense_lead=MAX_DEFENSE_LEAD):
+    """
+    Get a mask of scenarios where the defense gets to the ball more than max_defense_lead seconds before the offense
+    times is (N, 2) offense and defense times, pass a BallPrediction's wall_time to skip balls that bounce
+    off a wall before the offense arrives, since the estimate doesn't model bounces
+    """
+    mask = times[:, 0] - times[:, 1] > max_defense_lead
+    if wall_time is not None:
+        with np.errstate(invalid="ignore"):
+            mask &= ~(wall_time < times[:, 0])
+    return mask
+
+
+def scenario_times_to_ball(scenarios: Sequence[Scenario]):
+    """Get an (N, 2) array of the offensive and defensive car's time to the ball for every scenario"""
+    states = np.array([scenario.state[:DEFENSE_ROW + 1] for scenario in scenarios]).reshape(-1, DEFENSE_ROW + 1, BOOST + 1)
+    return times_to_ball_from_states(states)
+
+
+def times_to_ball_from_states(states):
+    """Same as scenario_times_to_ball for a stacked (N, 3, 13) array of scenario states"""
+    ball = np.repeat(states[:, BALL_ROW], 2, axis=0)
+    cars = states[:, OFFENSE_ROW:DEFENSE_ROW + 1].reshape(-1, states.shape[2])
+    times = time_to_ball(cars[:, LOCATION], cars[:, VELOCITY], cars[:, YAW], cars[:, BOOST],
+                         ball[:, LOCATION], ball[:, VELOCITY])
+    return times.reshape(-1, 2)
+
+
+def packet_times_to_ball(packet):
+    """Get each car's time to the ball from a live GameTickPacket, in packet order"""
+    num_cars = packet.num_cars
+    physics = [packet.game_cars[index].physics for index in range(num_cars)]
+    ball = packet.game_ball.physics
+    return time_to_ball(
+        [(p.location.x, p.location.y, p.location.z) for p in physics],
+        [(p.velocity.x, p.velocity.y, p.velocity.z) for p in physics],
+        [p.rotation.yaw for p in physics],
+        [packet.game_cars[index].boost for index in range(num_cars)],
+        np.repeat([(ball.location.x, ball.location.y, ball.location.z)], num_cars, axis=0),
+        np.repeat([(ball.velocity.x, ball.velocity.y, ball.velocity.z)], num_cars, axis=0),
+    )
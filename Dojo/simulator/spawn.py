@@ -0,0 +1,41 @@
+"""
+Spawns of generated scenarios, as players get them.
+
+A scenario is drawn from its own seed, so it can be regenerated from its
+history entry. Spawns where the ball goes in or into a wall before anyone
+can play it, or where the defense gets to the ball well before the offense,
+are rerolled up to SPAWN_ATTEMPTS times. The last draw is kept when none
+pass.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from constants import MIN_GOAL_TIME, MIN_WALL_TIME, SPAWN_ATTEMPTS, MAX_DEFENSE_LEAD
+from scenario import Scenario
+from .ball import BallPrediction, predict_scenarios
+from .intercept import scenario_times_to_ball, unfair
+
+
+def spawn_scenario(offensive_mode, defensive_mode, player_offense: bool, boost_range=None,
+                   num_offense: int = 1, num_defense: int = 1, verbose: bool = True) -> Tuple[Scenario, int, BallPrediction]:
+    """Draw a scenario, rerolling degenerate and unfair spawns, and get it with its seed and ball prediction"""
+    for attempt in range(SPAWN_ATTEMPTS):
+        seed = np.random.randint(0, 2**31 - 1)
+        np.random.seed(seed)
+        scenario = Scenario(offensive_mode, defensive_mode, boost_range=boost_range,
+                            num_offense=num_offense, num_defense=num_defense)
+        if player_offense:
+            scenario.Mirror()
+        prediction = predict_scenarios([scenario])
+        if prediction.degenerate(MIN_GOAL_TIME, MIN_WALL_TIME)[0]:
+            if verbose:
+                print(f"Rejected degenerate spawn (attempt {attempt + 1})")
+            continue
+        if unfair(scenario_times_to_ball([scenario]), prediction.wall_time, MAX_DEFENSE_LEAD)[0]:
+            if verbose:
+                print(f"Rejected unfair spawn (attempt {attempt + 1})")
+            continue
+        break
+    return scenario, seed, prediction
@@ -0,0 +1,220 @@
+"""
+Thumbnails of scenarios for browsing the library and playlists.
+
+Rendering is headless: every worker of the process pool draws the field once
+on an Agg canvas and keeps it as a background, then each thumbnail only
+draws the ball and cars over it. Images are cached as PNGs named by a hash
+of the scenario content, so a scenario that didn't change is never drawn
+again, whatever it is called. A contact sheet puts a whole playlist on one
+image.
+
+Usage, from the Dojo folder:
+    python thumbnails.py
+    python thumbnails.py --playlist "Defensive Challenges Mix" --sheet mix.png
+"""
+
+import argparse
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import matplotlib.image
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import utils
+from constants import SIDE_WALL, BACK_WALL, GOAL_WIDTH, GOAL_DEPTH
+from playlist import Playlist, PlaylistRegistry, PlayerRole
+from scenario import Scenario, CarRole, BALL_ROW, OFFENSE_ROW, X, Y, YAW, VELOCITY
+
+# Part of the content hash, bump it when thumbnails are drawn differently
+THUMBNAIL_VERSION = 1
+THUMBNAIL_SIZE = (2.0, 2.8)
+THUMBNAIL_DPI = 80
+FIELD_LIMITS = ((-SIDE_WALL - 100, SIDE_WALL + 100), (BACK_WALL - GOAL_DEPTH - 100, -BACK_WALL + GOAL_DEPTH + 100))
+ROLE_COLORS = {CarRole.OFFENSE.value: "b", CarRole.DEFENSE.value: "r"}
+CAR_LENGTH = 200
+SHEET_COLUMNS = 6
+
+# Canvas of a pool worker, with the field drawn once
+_canvas = None
+
+
+def draw_field(ax, style="k-", linewidth=1.0):
+    """
+    Outline of the walls, corners and goals, with a dotted line across the center
+    Side walls are at x=±4096, back walls at y=±5120, and the corner planes cut the axes at ±8064.
+    Goals are 893 units from the center to the posts and 880 units deep.
+    """
+    # Where the corners meet the side and back walls
+    side = utils.CORNER_DISTANCE - SIDE_WALL
+    back = utils.CORNER_DISTANCE + BACK_WALL
+    x = [SIDE_WALL, SIDE_WALL, back, GOAL_WIDTH, GOAL_WIDTH, -GOAL_WIDTH, -GOAL_WIDTH, -back, -SIDE_WALL]
+    y = [-side, side, -BACK_WALL, -BACK_WALL, -BACK_WALL + GOAL_DEPTH, -BACK_WALL + GOAL_DEPTH, -BACK_WALL, -BACK_WALL, side]
+    # The other half is the same, turned around
+    ax.plot(x + [-value for value in x] + x[:1], y + [-value for value in y] + y[:1], style, linewidth=linewidth)
+    ax.plot([-SIDE_WALL, SIDE_WALL], [0, 0], style[0] + "--", linewidth=linewidth / 2, alpha=0.5)
+
+
+def draw_scenario(ax, state: np.ndarray, roles) -> List:
+    """
+    Draw the ball and every car of a scenario array, with velocity arrows covering one second of travel
+    Cars are arrows along their yaw, offense in blue and defense in red. Returns the artists drawn
+    """
+    artists = []
+    for row in range(len(state)):
+        location = state[row, X:Y + 1]
+        if np.isnan(location).any():
+            continue
+        velocity = np.nan_to_num(state[row, VELOCITY][:2])
+        color = "k" if row == BALL_ROW else ROLE_COLORS[roles[row - OFFENSE_ROW]]
+        if row == BALL_ROW:
+            artists.extend(ax.plot(location[0], location[1], "ko", markersize=5))
+        elif not np.isnan(state[row, YAW]):
+            heading = CAR_LENGTH * np.array([np.cos(state[row, YAW]), np.sin(state[row, YAW])])
+            artists.append(ax.arrow(location[0], location[1], heading[0], heading[1], head_width=200, head_length=400,
+                                    fc=color, ec=color, length_includes_head=True))
+        if velocity.any():
+            artists.append(ax.arrow(location[0], location[1], velocity[0], velocity[1],
+                                    head_width=50, head_length=50, fc=color, ec=color, alpha=0.6))
+    return artists
+
+
+def scenario_key(scenario: Scenario) -> str:
+    """Hash of everything a thumbnail shows"""
+    content = hashlib.sha1(str(THUMBNAIL_VERSION).encode())
+    content.update(scenario.ToArray(np.float64).tobytes())
+    content.update(scenario.roles.tobytes())
+    return content.hexdigest()
+
+
+class _Canvas:
+    """Thumbnail figure with the field drawn once, restored before every scenario"""
+
+    def __init__(self):
+        self.figure = Figure(figsize=THUMBNAIL_SIZE, dpi=THUMBNAIL_DPI)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_axes((0, 0, 1, 1))
+        self.ax.set_xlim(*FIELD_LIMITS[0])
+        self.ax.set_ylim(*FIELD_LIMITS[1])
+        self.ax.set_axis_off()
+        draw_field(self.ax, linewidth=0.8)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+    def render(self, state: np.ndarray, roles, file_path: str):
+        self.canvas.restore_region(self.background)
+        artists = draw_scenario(self.ax, state, roles)
+        for artist in artists:
+            self.ax.draw_artist(artist)
+        matplotlib.image.imsave(file_path, np.asarray(self.canvas.buffer_rgba()))
+        for artist in artists:
+            artist.remove()
+
+
+def _render_thumbnail(task):
+    """Pool worker: draw one thumbnail"""
+    global _canvas
+    if _canvas is None:
+        _canvas = _Canvas()
+    file_path, state, roles = task
+    _canvas.render(state, roles, file_path)
+    return file_path
+
+
+def render_thumbnails(scenarios: Dict[str, Scenario], processes: Optional[int] = None) -> Dict[str, str]:
+    """Thumbnail file of every scenario by name, drawing only those not in the cache yet"""
+    thumbnails_path = _get_thumbnails_path()
+    files = {name: os.path.join(thumbnails_path, f"{scenario_key(scenario)}.png") for name, scenario in scenarios.items()}
+    tasks = {}
+    for name, file_path in files.items():
+        if not os.path.exists(file_path) and file_path not in tasks:
+            tasks[file_path] = (file_path, scenarios[name].ToArray(np.float64), scenarios[name].roles.tolist())
+
+    if len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            list(pool.map(_render_thumbnail, tasks.values(), chunksize=16))
+    else:
+        for task in tasks.values():
+            _render_thumbnail(task)
+    print(f"{len(scenarios)} thumbnails, {len(tasks)} drawn")
+    return files
+
+
+def playlist_scenarios(playlist: Playlist) -> Dict[str, Scenario]:
+    """
+    One scenario of every entry of a playlist, as the player will see it
+    Presets are generated from a fixed seed, so their thumbnails are cached like the rest
+    """
+    scenarios = {}
+    for index, config in enumerate(playlist.scenarios or []):
+        np.random.seed(index)
+        scenario = Scenario(config.offensive_mode, config.defensive_mode, boost_range=playlist.settings.boost_range)
+        if config.player_role == PlayerRole.OFFENSE:
+            scenario.Mirror()
+        name = f"{config.offensive_mode.name} vs {config.defensive_mode.name} ({config.player_role.name.lower()})"
+        scenarios[name] = scenario
+    for ref in playlist.custom_scenarios or []:
+        custom_scenario = ref.resolve()
+        if custom_scenario is None:
+            continue
+        scenarios[custom_scenario.name] = Scenario.FromGameState(custom_scenario.to_rlbot_game_state())
+    return scenarios
+
+
+def render_contact_sheet(thumbnails: List[Tuple[str, str]], file_path: str, columns: int = SHEET_COLUMNS):
+    """Save captioned thumbnails, given as (caption, file) pairs, on a single image"""
+    rows = max(1, -(-len(thumbnails) // columns))
+    figure = Figure(figsize=(columns * THUMBNAIL_SIZE[0], rows * (THUMBNAIL_SIZE[1] + 0.3)), dpi=THUMBNAIL_DPI)
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(rows, columns, squeeze=False).ravel()
+    for ax in axes:
+        ax.set_axis_off()
+    for ax, (caption, thumbnail) in zip(axes, thumbnails):
+        ax.imshow(matplotlib.image.imread(thumbnail))
+        ax.set_title(caption, fontsize=7)
+    figure.savefig(file_path, bbox_inches="tight")
+
+
+def _get_thumbnails_path():
+    appdata_path = os.path.expandvars("%APPDATA%")
+    if not os.path.exists(os.path.join(appdata_path, "RLBot", "Dojo", "Thumbnails")):
+        os.makedirs(os.path.join(appdata_path, "RLBot", "Dojo", "Thumbnails"))
+    return os.path.join(appdata_path, "RLBot", "Dojo", "Thumbnails")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw thumbnails of the custom scenario library or of a playlist")
+    parser.add_argument("--playlist", default=None, help="Name of a preset or custom playlist, the whole library by default")
+    parser.add_argument("--sheet", default=None, help="Save a contact sheet of the thumbnails to this file")
+    parser.add_argument("--columns", type=int, default=SHEET_COLUMNS)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.playlist:
+        from custom_playlist import CustomPlaylistManager
+        registry = PlaylistRegistry()
+        registry.set_custom_playlist_manager(CustomPlaylistManager(renderer=None, main_menu_renderer=None))
+        playlist = registry.get_playlist(args.playlist)
+        if playlist is None:
+            print(f"Unknown playlist: {args.playlist}")
+            return
+        scenarios = playlist_scenarios(playlist)
+    else:
+        from custom_scenario import get_custom_scenarios
+        scenarios = {name: Scenario.FromGameState(custom_scenario.to_rlbot_game_state())
+                     for name, custom_scenario in sorted(get_custom_scenarios().items())}
+
+    files = render_thumbnails(scenarios, args.processes)
+    if args.sheet:
+        render_contact_sheet(list(files.items()), args.sheet, args.columns)
+        print(f"Saved {args.sheet}")
+    else:
+        for name, file_path in files.items():
+            print(f"{name}: {file_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ from constants import (
     CUSTOM_MODE_MENU_START_X, CUSTOM_MODE_MENU_START_Y, CUSTOM_MODE_MENU_WIDTH, CUSTOM_MODE_MENU_HEIGHT,
     CONTROLS_MENU_WIDTH, CONTROLS_MENU_HEIGHT
 )
+from car_layout import HUMAN_INDEX
+from simulator import packet_times_to_ball
 import utils
 
 
@@ -14,6 +16,8 @@ class UIRenderer:
     def __init__(self, renderer, game_state: DojoGameState):
         self.renderer = renderer
         self.game_state = game_state
+        self.ball_prediction_drawn = False
+        self.first_to_ball_drawn = False
     
     def render_main_ui(self):
         """Render the main UI elements (score, time, etc.)"""
@@ -55,6 +59,8 @@ class UIRenderer:
             player_role_string = f"Player Role: {player_role_name}"
             previous_record = ""
             game_phase_name = f"Game Phase: {self.game_state.game_phase.name}"
+            scenario_stats = self.game_state.outcome_stats.get(self.game_state.current_scenario_key)
+            scenario_record = f"This scenario: {scenario_stats.summary() if scenario_stats else 'not played yet'}"
         elif self.game_state.gym_mode == GymMode.RACE:
             scores = f"Completed: {self.game_state.human_score}"
             total_score = f"Out of: {self.game_state.num_trials}"
@@ -113,6 +119,10 @@ class UIRenderer:
                 SCORE_BOX_START_X + 10, SCORE_BOX_START_Y + 280,
                 1, 1, freeze_scenario_enabled, self.renderer.white()
             )
+            self.renderer.draw_string_2d(
+                SCORE_BOX_START_X + 10, SCORE_BOX_START_Y + 310,
+                1, 1, scenario_record, self.renderer.white()
+            )
         self.renderer.end_rendering()
     
    
@@ -145,4 +155,41 @@ class UIRenderer:
             bot_start = utils.vector3_to_list(bot_car.physics.location)
             bot_end_vector = utils.add_vector3(bot_car.physics.location, bot_car.physics.velocity)
             bot_end = utils.vector3_to_list(bot_end_vector)
-            self.renderer.draw_line_3d(bot_start, bot_end, self.renderer.white()) 
+            self.renderer.draw_line_3d(bot_start, bot_end, self.renderer.white())
+
+    def render_ball_prediction(self, ball_prediction):
+        """Draw the predicted ball path, or clear it if there is none"""
+        if ball_prediction is None:
+            if self.ball_prediction_drawn:
+                self.renderer.clear_screen("ball_prediction")
+                self.ball_prediction_drawn = False
+            return
+
+        self.renderer.begin_rendering("ball_prediction")
+        self.renderer.draw_polyline_3d(ball_prediction.path(), self.renderer.yellow())
+        self.renderer.end_rendering()
+        self.ball_prediction_drawn = True
+
+    def render_first_to_ball(self, packet):
+        """Show which car would get to the ball first, or clear the readout if there is no packet"""
+        if packet is None or packet.num_cars == 0:
+            if self.first_to_ball_drawn:
+                self.renderer.clear_screen("first_to_ball")
+                self.first_to_ball_drawn = False
+            return
+
+        times = packet_times_to_ball(packet)
+        first = int(times.argmin())
+        if first == HUMAN_INDEX:
+            text = f"First to ball: You ({times[first]:.2f}s)"
+            color = self.renderer.green()
+        else:
+            human_team = packet.game_cars[HUMAN_INDEX].team
+            name = "Teammate" if packet.game_cars[first].team == human_team else "Opponent"
+            text = f"First to ball: {name} ({times[first]:.2f}s, you {times[HUMAN_INDEX]:.2f}s)"
+            color = self.renderer.red()
+
+        self.renderer.begin_rendering("first_to_ball")
+        self.renderer.draw_string_2d(SCORE_BOX_START_X + 10, SCORE_BOX_START_Y + 340, 1, 1, text, color)
+        self.renderer.end_rendering()
+        self.first_to_ball_drawn = True
@@ -1,3 +1,4 @@
+import math
 import numpy as np
 from rlbot.utils.game_state_util import GameState, BallState, CarState, Physics, Vector3, Rotator, GameInfoState
 
@@ -7,6 +8,13 @@ BLUE_WALL=-5120
 ORANGE_WALL=5120
 
 BACK_WALL=BLUE_WALL
+GOAL_WIDTH=893
+GOAL_DEPTH=880
+# The corner planes intersect the axes at +-8064, 1152 units in from the side and back walls
+CORNER_DISTANCE=SIDE_WALL-BACK_WALL-1152
+# Generated objects moved back into the map end up this far from the walls
+FIELD_MARGIN=100
+SQRT_2=math.sqrt(2)
 
 def hasattrdeep(obj, *names):
     for name in names:
@@ -72,37 +80,55 @@ def get_velocity_from_rotation(rotation, min_velocity, max_velocity):
     velocity_z = velocity_factor * np.sin(pitch)
     return Vector3(velocity_x, velocity_y, velocity_z)
 
-def sanity_check_objects(objects):
+def sanity_check_objects(objects, margin=0):
     '''If any of the objects have been placed outside of the map, move them to the nearest edge of the map'''
-    # Back wall is biased toward the negative end, which makes this math a little fucky
     for object in objects:
-        if object.physics.location.x < -SIDE_WALL:
-            object.physics.location.x = -(SIDE_WALL-100)
-        elif object.physics.location.x > SIDE_WALL:
-            object.physics.location.x = SIDE_WALL-100
-        if object.physics.location.y > -BACK_WALL:
-            # Make an exception if in the goal, which is between -/+893 x
-            if not (object.physics.location.x > -893 and object.physics.location.x < 893):
-                object.physics.location.y = -(BACK_WALL+100)
-        elif object.physics.location.y < BACK_WALL:
-            # Make an exception if in the goal, which is between -/+893 x
-            if not (object.physics.location.x > -893 and object.physics.location.x < 893):
-                object.physics.location.y = BACK_WALL+100
-
-        # Also account for corners, which is going to suck
-        # Corners start 1152 units in from the side walls and back walls
-        # That translates to 4096 - 1152 = 2944 in X axis
-        # And 5120 - 1152 = 3968 in Y axis
-        # So if the object is outside of both of those, move it inside
-        if object.physics.location.x > 2944 and object.physics.location.y > 3968:
-            object.physics.location.x = 2944
-            object.physics.location.y = 3968
-        elif object.physics.location.x < -2944 and object.physics.location.y > 3968:
-            object.physics.location.x = -2944
-            object.physics.location.y = 3968
-        elif object.physics.location.x > 2944 and object.physics.location.y < -3968:
-            object.physics.location.x = 2944
-            object.physics.location.y = -3968
-        elif object.physics.location.x < -2944 and object.physics.location.y < -3968:
-            object.physics.location.x = -2944
-            object.physics.location.y = -3968
+        object.physics.location.x, object.physics.location.y = sanity_check_xy(object.physics.location.x, object.physics.location.y, margin)
+
+def sanity_check_xy(x, y, margin=0):
+    '''Get the x, y location moved to the nearest point at least margin inside the map if it is outside of it'''
+    # The goal is part of the map, past the back wall between the posts
+    in_goal = abs(x) < GOAL_WIDTH - margin
+    x = min(max(x, -(SIDE_WALL - margin)), SIDE_WALL - margin)
+    y_limit = -BACK_WALL + GOAL_DEPTH - margin if in_goal else -BACK_WALL - margin
+    y = min(max(y, -y_limit), y_limit)
+
+    # Corners cut across where |x| + |y| reaches 8064, 1152 units in from both walls
+    # Project onto the corner plane by taking half the excess off each axis
+    excess = abs(x) + abs(y) - (CORNER_DISTANCE - margin * SQRT_2)
+    if excess > 0 and not in_goal:
+        x -= math.copysign(excess / 2, x)
+        y -= math.copysign(excess / 2, y)
+    return x, y
+
+def sanity_check_locations(locations, margin=0):
+    '''Vectorized sanity_check_xy for an (N, 3) array of locations, which is modified in place'''
+    x = locations[:, 0]
+    y = locations[:, 1]
+    in_goal = np.abs(x) < GOAL_WIDTH - margin
+    np.clip(x, -(SIDE_WALL - margin), SIDE_WALL - margin, out=x)
+    y_limit = np.where(in_goal, -BACK_WALL + GOAL_DEPTH - margin, -BACK_WALL - margin)
+    np.clip(y, -y_limit, y_limit, out=y)
+
+    excess = np.where(in_goal, 0, np.abs(x) + np.abs(y) - (CORNER_DISTANCE - margin * SQRT_2))
+    in_corner = excess > 0
+    x[in_corner] -= np.copysign(excess[in_corner] / 2, x[in_corner])
+    y[in_corner] -= np.copysign(excess[in_corner] / 2, y[in_corner])
+
+def in_field_xy(x, y, margin=0.0, allow_goal=False):
+    '''Check that an x, y location is at least margin inside the walls, optionally counting the goals'''
+    abs_x = abs(x)
+    abs_y = abs(y)
+    if abs_x <= SIDE_WALL - margin and abs_y <= -BACK_WALL - margin and abs_x + abs_y <= CORNER_DISTANCE - margin * SQRT_2:
+        return True
+    return allow_goal and abs_x <= GOAL_WIDTH - margin and abs_y <= -BACK_WALL + GOAL_DEPTH - margin
+
+def in_field(x, y, margin=0.0, allow_goal=False):
+    '''Vectorized check that x, y locations are at least margin inside the walls, optionally counting the goals'''
+    abs_x = np.abs(x)
+    abs_y = np.abs(y)
+    inside = ((abs_x <= SIDE_WALL - margin) & (abs_y <= -BACK_WALL - margin)
+              & (abs_x + abs_y <= CORNER_DISTANCE - margin * SQRT_2))
+    if allow_goal:
+        inside |= (abs_x <= GOAL_WIDTH - margin) & (abs_y <= -BACK_WALL + GOAL_DEPTH - margin)
+    return inside